@@ -1,90 +1,312 @@
+import logging
+import time
+
 from migen import *
 from litex.gen import LiteXModule
 from litex.soc.interconnect import stream
 
 from gateware.LimeDFB.Resampler.half_band_complex import (
     ComplexSSRDecimator, ComplexSSRInterpolator,
-    ComplexStandardDecimator, ComplexStandardInterpolator
+    ComplexStandardDecimator, ComplexStandardInterpolator,
+    SSR_FACTORS, ssr_layout, share_coefficients
 )
 from gateware.LimeDFB.Resampler.half_band_config import HalfBandConfig
+from gateware.LimeDFB.Resampler.half_band_folded import FoldedComplexDecimator
 
 class ResamplerNew(LiteXModule):
-    def __init__(self, sample_width=16, tap_width=16, stages=1, direction="up", filter_mode="short", ssr_mode=False, auto_scale=False):
+    def __init__(self, sample_width=16, tap_width=16, stages=1, direction="up", filter_mode="short", ssr_mode=False, auto_scale=False, folded=False, coeff_slots=None, csd=False, register_every=1, rounding="truncate", saturate=False):
+        start = time.perf_counter()
+
         # 1. Signature check
         assert direction in ["up", "down"], "Direction must be 'up' or 'down'"
         assert stages > 0, "ResamplerNew requires at least 1 stage. Use external routing for bypass."
+        # folded: stages 2..N share one time-multiplexed I/Q core pair (decimation only)
+        assert not (folded and direction == "up"), "Folded mode is only available for decimation"
+        # coeff_slots: runtime-loadable coefficients shared by all stages (see half_band_coeff.py)
+        assert not (folded and coeff_slots is not None), "Folded mode does not support reloadable coefficients"
+        # csd: multiplier-less shift-add taps (saves DSP blocks, see HalfBandConfig.csd_adders)
+        # register_every: register every N adder levels, latency follows automatically
+        # rounding/saturate: output stage of every core ("truncate", "half_up", "convergent")
+        # ssr_mode: samples per clock at the high-rate side, True = 2, or 4 / 8 (P-wide lanes)
+        if ssr_mode is True:
+            ssr = 2
+        elif not ssr_mode:
+            ssr = 1
+        else:
+            ssr = ssr_mode
+        assert ssr == 1 or ssr in SSR_FACTORS, f"ssr_mode must be False, True or one of {SSR_FACTORS}"
+        assert not (folded and ssr > 2), "Folded mode supports at most 2 samples per clock"
+        self.ssr = ssr
 
         # 2. Top-Level Stream Endpoints
         self.mux_sel = Signal(4)
-        std_layout = [("i", sample_width), ("q", sample_width)]
-        ssr_layout = [
-            ("i_even", sample_width), ("q_even", sample_width),
-            ("i_odd", sample_width),  ("q_odd", sample_width)
-        ]
-
-        if ssr_mode:
-            if direction == "down":
-                sink_layout = ssr_layout
-                source_layout = std_layout
-            else: # up
-                sink_layout = std_layout
-                source_layout = ssr_layout
-        else:
-            sink_layout = std_layout
-            source_layout = std_layout
+        if direction == "down":
+            sink_layout   = ssr_layout(sample_width, ssr)
+            source_layout = ssr_layout(sample_width, max(ssr // 2, 1))
+        else: # up
+            sink_layout   = ssr_layout(sample_width, max(ssr // 2, 1))
+            source_layout = ssr_layout(sample_width, ssr)
 
         self.sink   = stream.Endpoint(sink_layout)
         self.source = stream.Endpoint(source_layout)
 
-        # 3. Filter Instantiation
+        # Rate change status (see 4.)
+        self.rate_change_done = Signal()   # mux_sel is in effect and the new stages are primed
+        self.discarded        = Signal(32) # Output samples dropped by rate changes (wraps)
+
+        # 3. Filter Configuration
         if direction == "down":
-            config = HalfBandConfig(mode=filter_mode, data_width=sample_width, tap_width=tap_width, auto_scale=auto_scale)
+            config = HalfBandConfig(mode=filter_mode, data_width=sample_width, tap_width=tap_width, auto_scale=auto_scale, coeff_slots=coeff_slots, csd=csd, register_every=register_every, rounding=rounding, saturate=saturate)
         else:
             if filter_mode == "short":
-                config = HalfBandConfig(mode="short_doubled", data_width=sample_width, tap_width=tap_width, auto_scale=auto_scale)
+                config = HalfBandConfig(mode="short_doubled", data_width=sample_width, tap_width=tap_width, auto_scale=auto_scale, coeff_slots=coeff_slots, csd=csd, register_every=register_every, rounding=rounding, saturate=saturate)
             elif filter_mode == "long":
-                config = HalfBandConfig(mode="long_doubled", data_width=sample_width, tap_width=tap_width, auto_scale=auto_scale)
+                config = HalfBandConfig(mode="long_doubled", data_width=sample_width, tap_width=tap_width, auto_scale=auto_scale, coeff_slots=coeff_slots, csd=csd, register_every=register_every, rounding=rounding, saturate=saturate)
             else:
                 raise ValueError("Invalid filter mode for upsampling")
+        self.config = config
+
+        # 4. Rate Change Sequence
+        # The routing runs from active_stages and the internal sink/source endpoints below. When
+        # mux_sel selects another stage count while samples are in flight, the sequence is:
+        #   DRAIN : stall the sink and step the pipelines with zero-valued samples (the filters
+        #           only move on input beats) until the output samples still owed for the
+        #           accepted input have been delivered; the zero-derived tail is not delivered,
+        #   FLUSH : reset the filter state (delay lines, valid chains, lane converters; loaded
+        #           coefficients are kept) and switch active_stages,
+        #   PRIME : drop the output samples computed from the flushed delay lines.
+        # Before the first sample after reset or a flush the stage count switches directly.
+        # discarded counts the output samples lost at the flush (an owed partial source beat, or
+        # everything still owed if the drain times out) and while priming.
+        sink_lanes   = len(sink_layout) // 2
+        source_lanes = len(source_layout) // 2
+        sink   = stream.Endpoint(sink_layout)
+        source = stream.Endpoint(source_layout)
+
+        self.active_stages = active_stages = Signal(4, reset=1)
+        requested_stages = Signal(4)
+        flush     = Signal()
+        drain     = Signal()
+        deliver   = Signal()
+        accept    = Signal()
+        prime     = Signal()
+        accepted  = Signal()
+        delivered = Signal()
+        dirty     = Signal()            # Samples accepted since reset or the last flush
+        in_flight = Signal((24, True))  # Input (down) or output (up) samples not delivered yet
+        owed      = Signal((24, True))  # Output samples in flight
+
+        # Drain timeout in zero-valued input beats: decimating, stage k waits 2^(k+1) input
+        # samples per core step, so emptying every stage takes < 2 * core_latency << stages.
+        drain_cycles = (2*config.core_latency + 4) << stages
+        drain_count  = Signal(max=drain_cycles + 1)
+        prime_count  = Signal(16)
+        prime_beats  = Signal(16)
+
+        # Output samples of a cascade of `count` stages that still depend on flushed delay line
+        # state: a decimator refills its H0 delay line after the first clean input pair, an
+        # interpolator after the first clean input sample and doubles the rate.
+        def settle_samples(count):
+            clean = 0
+            for _ in range(count):
+                if direction == "down":
+                    clean = (clean + 1) // 2 + len(config.h0_taps)
+                else:
+                    clean = 2 * (clean + len(config.h0_taps))
+            return clean
+
+        # Out-of-range mux_sel values select 1 stage, like the routing Case default
+        stage_cases = {mux_val: [
+            requested_stages.eq(mux_val),
+            prime_beats.eq((settle_samples(mux_val) + source_lanes - 1) // source_lanes)
+        ] for mux_val in range(1, stages + 1)}
+        stage_cases["default"] = stage_cases[1]
+
+        if direction == "down":
+            growth, shrink = C(sink_lanes), C(source_lanes) << active_stages
+        else:
+            growth, shrink = C(sink_lanes) << active_stages, C(source_lanes)
+
+        self.comb += [
+            Case(self.mux_sel, stage_cases),
+            # Top-level endpoints. The payload is zeroed while the sink is stalled, as the standard
+            # interpolator shifts its input into the delay line on every pipeline step, and
+            # during DRAIN zero-valued beats step the pipelines. While draining, only whole
+            # source beats of owed output samples are delivered.
+            [getattr(sink, name).eq(Mux(accept, getattr(self.sink, name), 0)) for name, _ in sink_layout],
+            sink.valid.eq((self.sink.valid & accept) | drain),
+            self.sink.ready.eq(sink.ready & accept),
+            deliver.eq(~drain | (owed >= source_lanes)),
+            source.connect(self.source, omit={"valid", "ready"}),
+            self.source.valid.eq(source.valid & deliver & ~prime & ~flush),
+            source.ready.eq(((self.source.ready & deliver) | prime) & ~flush),
+            accepted.eq(self.sink.valid & self.sink.ready),
+            delivered.eq(source.valid & source.ready),
+            owed.eq(in_flight >> active_stages if direction == "down" else in_flight)
+        ]
+        self.sync += If(flush,
+            in_flight.eq(0),
+            dirty.eq(0)
+        ).Else(
+            in_flight.eq(in_flight + Mux(accepted, growth, 0) - Mux(delivered, shrink, 0)),
+            If(accepted, dirty.eq(1))
+        )
+
+        self.fsm = fsm = FSM(reset_state="RUN")
+        fsm.act("RUN",
+            accept.eq(active_stages == requested_stages),
+            self.rate_change_done.eq(active_stages == requested_stages),
+            If(active_stages != requested_stages,
+                If(dirty,
+                    NextValue(drain_count, drain_cycles),
+                    NextState("DRAIN")
+                ).Else(
+                    NextValue(active_stages, requested_stages)
+                )
+            )
+        )
+        fsm.act("DRAIN",
+            drain.eq(1),
+            If(sink.ready, NextValue(drain_count, drain_count - 1)),
+            If(~deliver | (drain_count == 0), NextState("FLUSH"))
+        )
+        fsm.act("FLUSH",
+            flush.eq(1),
+            If(owed > 0, NextValue(self.discarded, self.discarded + owed)),
+            NextValue(active_stages, requested_stages),
+            NextValue(prime_count, prime_beats),
+            NextState("PRIME")
+        )
+        fsm.act("PRIME",
+            accept.eq(1),
+            prime.eq(1),
+            If(delivered,
+                NextValue(prime_count, prime_count - 1),
+                NextValue(self.discarded, self.discarded + source_lanes),
+                If(prime_count == 1, NextState("RUN"))
+            )
+        )
+
+        # Data routing helpers
+        def connect_data(src, dst):
+            # Copies the lane fields present in both endpoints
+            return [getattr(dst, name).eq(getattr(src, name))
+                for name, _ in dst.description.payload_layout if hasattr(src, name)]
+
+        def lane_bits(ep):
+            return Cat(*[getattr(ep, name) for name, _ in ep.description.payload_layout])
+
+        # Stages with fewer lanes than the top-level endpoints (ssr_mode 4/8) get a stream
+        # Converter; samples keep their order (first sample in the lowest lanes).
+        def output_tap(fltr):
+            if len(lane_bits(fltr.source)) == len(lane_bits(source)):
+                return [
+                    source.valid.eq(fltr.source.valid),
+                    fltr.source.ready.eq(source.ready)
+                ] + connect_data(fltr.source, source)
+            converter = ResetInserter()(stream.Converter(len(lane_bits(fltr.source)), len(lane_bits(source))))
+            self.submodules += converter
+            self.comb += converter.reset.eq(flush)
+            self.comb += converter.sink.data.eq(lane_bits(fltr.source))
+            return [
+                converter.sink.valid.eq(fltr.source.valid),
+                fltr.source.ready.eq(converter.sink.ready),
+                source.valid.eq(converter.source.valid),
+                converter.source.ready.eq(source.ready),
+                lane_bits(source).eq(converter.source.data)
+            ]
+
+        def input_tap(fltr):
+            if len(lane_bits(fltr.sink)) == len(lane_bits(sink)):
+                return [
+                    fltr.sink.valid.eq(sink.valid),
+                    sink.ready.eq(fltr.sink.ready)
+                ] + connect_data(sink, fltr.sink)
+            converter = ResetInserter()(stream.Converter(len(lane_bits(sink)), len(lane_bits(fltr.sink))))
+            self.submodules += converter
+            self.comb += converter.reset.eq(flush)
+            self.comb += converter.sink.data.eq(lane_bits(sink))
+            return [
+                converter.sink.valid.eq(sink.valid),
+                sink.ready.eq(converter.sink.ready),
+                fltr.sink.valid.eq(converter.source.valid),
+                converter.source.ready.eq(fltr.sink.ready),
+                lane_bits(fltr.sink).eq(converter.source.data)
+            ]
+
+        # 5. Filter Instantiation
         self.filters = []
 
+        if folded and stages > 1:
+            self.filter_0 = fltr = ResetInserter()(ComplexSSRDecimator(config) if ssr_mode else ComplexStandardDecimator(config))
+            self.filters.append(fltr)
+            self.folded_decimator = folded_decimator = ResetInserter()(FoldedComplexDecimator(config, stages - 1))
+            self.comb += [fltr.reset.eq(flush), folded_decimator.reset.eq(flush)]
+
+            # Input Injection: sink is permanently connected to filter 0, filter 0 to the folded stages
+            self.comb += [
+                fltr.sink.valid.eq(sink.valid),
+                sink.ready.eq(fltr.sink.ready),
+                connect_data(sink, fltr.sink),
+                connect_data(fltr.source, folded_decimator.sink),
+                connect_data(fltr.source, source), # Default data
+                folded_decimator.active_stages.eq(active_stages - 1),
+            ]
+
+            # Output & Backpressure MUX
+            cases = {1: [
+                source.valid.eq(fltr.source.valid),
+                fltr.source.ready.eq(source.ready),
+            ]}
+            for mux_val in range(2, stages + 1):
+                cases[mux_val] = [
+                    folded_decimator.sink.valid.eq(fltr.source.valid),
+                    fltr.source.ready.eq(folded_decimator.sink.ready),
+                    source.valid.eq(folded_decimator.source.valid),
+                    folded_decimator.source.ready.eq(source.ready),
+                ] + connect_data(folded_decimator.source, source)
+            cases["default"] = cases[1]
+            self.comb += Case(active_stages, cases)
+            # Elaboration report (7.) of the folded engine
+            self.elaboration_time = time.perf_counter() - start
+            logging.getLogger("ResamplerNew").info(
+                f"{direction} x{1 << stages} (folded, {filter_mode}): elaborated in {self.elaboration_time * 1e3:.1f} ms")
+            return
+
         for i in range(stages):
+            # Samples per clock at the high-rate side of this stage: SSR wrappers while that is
+            # 2 or more, standard (one sample every other clock) wrappers after that.
             if direction == "down":
-                if ssr_mode and i == 0:
-                    fltr = ComplexSSRDecimator(config)
+                stage_ssr = ssr >> i
+                if stage_ssr >= 2:
+                    fltr = ComplexSSRDecimator(config, ssr=stage_ssr)
                 else:
                     fltr = ComplexStandardDecimator(config)
             else: # up
-                if ssr_mode and i == stages - 1:
-                    fltr = ComplexSSRInterpolator(config)
+                stage_ssr = ssr >> (stages - 1 - i)
+                if stage_ssr >= 2:
+                    fltr = ComplexSSRInterpolator(config, ssr=stage_ssr)
                 else:
                     fltr = ComplexStandardInterpolator(config)
             
+            # Flushed by the rate change sequence
+            fltr = ResetInserter()(fltr)
+            self.comb += fltr.reset.eq(flush)
+
             # Use setattr to register as submodule
             setattr(self, f"filter_{i}", fltr)
             self.filters.append(fltr)
 
-        # 4. Routing Logic
-        def connect_data(src, dst):
-            if hasattr(src, "i_even") and hasattr(dst, "i_even"):
-                return [
-                    dst.i_even.eq(src.i_even),
-                    dst.q_even.eq(src.q_even),
-                    dst.i_odd.eq(src.i_odd),
-                    dst.q_odd.eq(src.q_odd),
-                ]
-            else:
-                return [
-                    dst.i.eq(src.i),
-                    dst.q.eq(src.q),
-                ]
+        # Reloadable coefficients: one coeff_taps/coeff_swap port shared by all stages
+        share_coefficients(self, config, self.filters)
 
+        # 6. Routing Logic
         if direction == "down":
             # Input Injection: sink is permanently connected to filter 0
             self.comb += [
-                self.filters[0].sink.valid.eq(self.sink.valid),
-                self.sink.ready.eq(self.filters[0].sink.ready),
-                connect_data(self.sink, self.filters[0].sink)
+                self.filters[0].sink.valid.eq(sink.valid),
+                sink.ready.eq(self.filters[0].sink.ready),
+                connect_data(sink, self.filters[0].sink)
             ]
 
             # Cascading data connections (static)
@@ -93,20 +315,17 @@ class ResamplerNew(LiteXModule):
 
             # Output & Backpressure MUX
             # Default values to avoid latches/loops
-            self.comb += self.source.valid.eq(0)
+            self.comb += source.valid.eq(0)
             for fltr in self.filters:
                 self.comb += fltr.source.ready.eq(0)
             for i in range(1, stages):
                 self.comb += self.filters[i].sink.valid.eq(0)
-            self.comb += connect_data(self.filters[0].source, self.source) # Default data
+            self.comb += connect_data(self.filters[0].source, source) # Default data
 
             cases = {}
             for i in range(stages):
                 mux_val = i + 1
-                case_logic = [
-                    self.source.valid.eq(self.filters[i].source.valid),
-                    self.filters[i].source.ready.eq(self.source.ready)
-                ] + connect_data(self.filters[i].source, self.source)
+                case_logic = output_tap(self.filters[i])
                 # Cascading for active stages
                 for k in range(i):
                     case_logic += [
@@ -119,14 +338,14 @@ class ResamplerNew(LiteXModule):
                 cases[mux_val] = case_logic
 
             cases["default"] = cases[1]
-            self.comb += Case(self.mux_sel, cases)
+            self.comb += Case(active_stages, cases)
 
         else: # direction == "up"
-            # Output Tap: self.source is permanently connected to the last stage
+            # Output Tap: source is permanently connected to the last stage
             self.comb += [
-                self.source.valid.eq(self.filters[-1].source.valid),
-                self.filters[-1].source.ready.eq(self.source.ready),
-                connect_data(self.filters[-1].source, self.source)
+                source.valid.eq(self.filters[-1].source.valid),
+                self.filters[-1].source.ready.eq(source.ready),
+                connect_data(self.filters[-1].source, source)
             ]
 
             # Cascading data connections (static)
@@ -135,21 +354,18 @@ class ResamplerNew(LiteXModule):
 
             # Input MUX
             # Default values
-            self.comb += self.sink.ready.eq(0)
+            self.comb += sink.ready.eq(0)
             for fltr in self.filters:
                 self.comb += fltr.sink.valid.eq(0)
             for i in range(stages - 1):
                 self.comb += self.filters[i].source.ready.eq(0)
-            self.comb += connect_data(self.sink, self.filters[0].sink) # Default data injection
+            self.comb += connect_data(sink, self.filters[0].sink) # Default data injection
 
             cases = {}
             for i in range(stages):
                 mux_val = i + 1
                 inject_idx = stages - mux_val
-                case_logic = [
-                    self.filters[inject_idx].sink.valid.eq(self.sink.valid),
-                    self.sink.ready.eq(self.filters[inject_idx].sink.ready)
-                ] + connect_data(self.sink, self.filters[inject_idx].sink)
+                case_logic = input_tap(self.filters[inject_idx])
                 # Cascading for active stages
                 for k in range(inject_idx, stages - 1):
                     case_logic += [
@@ -159,4 +375,11 @@ class ResamplerNew(LiteXModule):
                 cases[mux_val] = case_logic
 
             cases["default"] = cases[1]
-            self.comb += Case(self.mux_sel, cases)
+            self.comb += Case(active_stages, cases)
+
+        # 7. Elaboration Report
+        # Python construction time of this instance (configs, cores and routing), see also the
+        # tap cache in half_band_config.py. Logged at INFO level, summed by the SoC wrappers.
+        self.elaboration_time = time.perf_counter() - start
+        logging.getLogger("ResamplerNew").info(
+            f"{direction} x{1 << stages} ({filter_mode}, {ssr} samples/clk): elaborated in {self.elaboration_time * 1e3:.1f} ms")
@@ -0,0 +1,186 @@
+import argparse
+import csv
+import itertools
+import json
+import sys
+import time
+import numpy as np
+from gateware.LimeDFB.Resampler.half_band_model import ResamplerNewModel
+
+# Benchmark of the ResamplerNew configuration space, evaluated on the bit-exact NumPy model
+# (half_band_model.py) instead of the Migen simulator.
+#
+# Per configuration it reports:
+#   - snr_db / sfdr_db      : measured on a coherent passband tone through the bit-exact model
+#   - dc_offset_lsb         : mean output value of the tone run (truncation bias)
+#   - passband_ripple_db    : peak-to-peak ripple of the quantized cascade response
+#   - stopband_atten_db     : worst-case rejection of the alias (down) / image (up) band
+#   - gain_db               : DC gain of the quantized cascade (auto_scale lowers it)
+#   - group_delay           : linear-phase group delay in samples at the high sample rate
+#   - clipped_tone/comb     : samples that overflowed (and wrapped, or saturated with
+#                             --saturate) for the tone and for a full-scale frequency comb
+#                             (as in simulate_resampler_*.py)
+#   - samples_per_clock     : samples per beat at the high-rate side (ssr_mode 2/4/8)
+#   - multipliers           : hardware multipliers of one ResamplerNew instance (SSR stages
+#                             duplicate them for each of their P/2 core lanes)
+#   - folded_multipliers    : the same with folded=True (stages 2..N share one core pair)
+#   - csd_adders            : adders replacing all multipliers with csd=True (no DSP blocks)
+#   - csd_latency           : extra core latency of the csd=True shift-add trees
+
+FIELDS = [
+    "direction", "stages", "filter_mode", "ssr_mode", "tap_width", "auto_scale", "rounding", "saturate",
+    "samples_per_clock", "multipliers", "folded_multipliers", "csd_adders", "csd_latency",
+    "snr_db", "sfdr_db", "dc_offset_lsb", "passband_ripple_db", "stopband_atten_db",
+    "gain_db", "group_delay", "clipped_tone", "clipped_comb", "runtime_ms",
+]
+
+# 1. Stimulus Generation
+def tone(n_samples, freq, amplitude):
+    """Complex tone at freq cycles/sample, rounded to integers."""
+    t = np.arange(n_samples)
+    return np.rint(amplitude * np.exp(1j * 2 * np.pi * freq * t))
+
+def comb(n_samples, amplitude, num_tones=20):
+    """Frequency comb of coherent tones spanning the whole band, scaled to amplitude."""
+    t = np.arange(n_samples)
+    cycles = np.linspace(n_samples // 80, n_samples // 2 - n_samples // 80, num_tones).astype(int)
+    signal = np.zeros(n_samples, dtype=complex)
+    for m in cycles:
+        signal += np.exp(1j * 2 * np.pi * m * t / n_samples)
+    signal *= amplitude / np.max(np.abs([signal.real, signal.imag]))
+    return np.rint(signal.real) + 1j * np.rint(signal.imag)
+
+# 2. Metrics
+def cascade_taps(config, stages):
+    """Equivalent single-rate impulse response of the cascade (noble identities), normalized."""
+    taps = np.asarray(config.quantized_taps, dtype=float) / (1 << (config.tap_width - 1))
+    if "doubled" in config.mode:
+        taps = taps / 2
+    h = np.array([1.0])
+    for k in range(stages):
+        up = np.zeros((len(taps) - 1) * (1 << k) + 1)
+        up[::1 << k] = taps
+        h = np.convolve(h, up)
+    return h
+
+def frequency_metrics(config, stages, passband, nfft=1 << 16):
+    h = cascade_taps(config, stages)
+    mag = np.abs(np.fft.fft(h, nfft))[:nfft // 2 + 1]
+    f = np.arange(len(mag)) / nfft
+    low_rate = 1.0 / (1 << stages)
+    f_pass = passband * low_rate / 2
+    mag_db = 20 * np.log10(mag + 1e-20)
+    pb = mag_db[f <= f_pass]
+    sb = mag_db[f >= low_rate - f_pass]
+    return {
+        "passband_ripple_db": float(np.max(pb) - np.min(pb)),
+        "stopband_atten_db":  float(mag_db[0] - np.max(sb)),
+        "gain_db":            float(mag_db[0]),
+        "group_delay":        (len(h) - 1) / 2,
+    }
+
+def spectrum_metrics(y, signal_bin):
+    spectrum = np.abs(np.fft.fft(y / len(y)))**2
+    signal = spectrum[signal_bin]
+    others = spectrum.copy()
+    others[[0, signal_bin]] = 0
+    return {
+        "snr_db":        float(10 * np.log10(signal / max(np.sum(others), 1e-30))),
+        "sfdr_db":       float(10 * np.log10(signal / max(np.max(others), 1e-30))),
+        "dc_offset_lsb": float(np.abs(np.mean(y))),
+    }
+
+# 3. Benchmark
+def run_config(direction, stages, filter_mode, ssr_mode, tap_width, auto_scale, rounding, args):
+    kwargs = dict(sample_width=args.sample_width, tap_width=tap_width, stages=stages,
+                  direction=direction, filter_mode=filter_mode, ssr_mode=ssr_mode, auto_scale=auto_scale,
+                  rounding=rounding, saturate=args.saturate)
+    start = time.perf_counter()
+
+    ratio = 1 << stages
+    settle = 512  # output samples dropped while the cascade fills
+    max_val = (1 << (args.sample_width - 1)) - 1
+    amplitude = max_val * 10**(args.tone_dbfs / 20)
+
+    # The tone sits at ~tone_freq of the low-rate Nyquist band, on an odd bin of the n_out point
+    # output FFT, so it is coherent and needs no window.
+    n_out = args.fft_size
+    if direction == "down":
+        signal_bin = int(args.tone_freq * n_out / 2) | 1
+        n_in = (n_out + settle + 16) * ratio
+        stim = tone(n_in, signal_bin / n_out / ratio, amplitude)
+    else:
+        signal_bin = int(args.tone_freq * n_out / 2 / ratio) | 1
+        n_in = (n_out + settle) // ratio + 16
+        stim = tone(n_in, signal_bin * ratio / n_out, amplitude)
+
+    model = ResamplerNewModel(**kwargs)
+    y = model.process(stim)[settle:settle + n_out]
+    result = spectrum_metrics(y, signal_bin)
+    result["clipped_tone"] = model.overflows
+
+    model = ResamplerNewModel(**kwargs)
+    model.process(comb(n_in, max_val * 0.90))
+    result["clipped_comb"] = model.overflows
+
+    result.update(frequency_metrics(model.config, stages, args.passband))
+
+    config = model.config
+    # Each stage has an I and a Q core: one multiplier per unique H0 tap plus the centre tap,
+    # per core lane. Stage k from the high-rate side runs ssr >> k samples per clock.
+    ssr = ssr_mode or 1
+    lanes = sum(max((ssr >> k) // 2, 1) for k in range(stages))
+    result["multipliers"] = lanes * 2 * (len(config.h0_taps) // 2 + 1)
+    # Folding (decimation only) keeps the first stage and one shared core pair for the rest.
+    folded_stages = min(stages, 2) if direction == "down" else stages
+    result["folded_multipliers"] = folded_stages * 2 * (len(config.h0_taps) // 2 + 1)
+    result["csd_adders"]  = lanes * 2 * config.csd_adders
+    result["csd_latency"] = config.csd_latency - 1
+    result["samples_per_clock"] = ssr
+    result["runtime_ms"] = (time.perf_counter() - start) * 1e3
+    result.update(direction=direction, stages=stages, filter_mode=filter_mode,
+                  ssr_mode=ssr_mode, tap_width=tap_width, auto_scale=auto_scale,
+                  rounding=rounding, saturate=args.saturate)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Spectral benchmark of the ResamplerNew configuration space.")
+    parser.add_argument("--directions",   nargs="+", default=["down", "up"])
+    parser.add_argument("--stages",       nargs="+", type=int, default=[1, 2, 3, 4])
+    parser.add_argument("--filter-modes", nargs="+", default=["short", "long"])
+    parser.add_argument("--ssr-modes",    nargs="+", type=int, default=[1, 2], help="Samples per clock (1 = no SSR, 2, 4, 8)")
+    parser.add_argument("--tap-widths",   nargs="+", type=int, default=[16, 18, 25])
+    parser.add_argument("--rounding-modes", nargs="+", default=["truncate", "half_up", "convergent"])
+    parser.add_argument("--saturate",     action="store_true", help="Saturate instead of wrapping on overflow")
+    parser.add_argument("--sample-width", type=int,   default=16)
+    parser.add_argument("--fft-size",     type=int,   default=8192,  help="Output samples per tone measurement")
+    parser.add_argument("--tone-dbfs",    type=float, default=-1.0,  help="Test tone amplitude")
+    parser.add_argument("--tone-freq",    type=float, default=0.3,   help="Test tone frequency as a fraction of the low-rate Nyquist")
+    parser.add_argument("--passband",     type=float, default=0.5,   help="Passband edge as a fraction of the low-rate Nyquist")
+    parser.add_argument("--format",       choices=["csv", "json"], default="csv")
+    parser.add_argument("--output",       default="-", help="Output file ('-' for stdout)")
+    args = parser.parse_args()
+
+    ssr_modes = [ssr if ssr > 1 else False for ssr in args.ssr_modes]
+    sweep = itertools.product(args.directions, args.stages, args.filter_modes, ssr_modes,
+                              args.tap_widths, [False, True], args.rounding_modes)
+    rows = []
+    for direction, stages, filter_mode, ssr_mode, tap_width, auto_scale, rounding in sweep:
+        rows.append(run_config(direction, stages, filter_mode, ssr_mode, tap_width, auto_scale, rounding, args))
+        print(f"{direction:<4} stages={stages} {filter_mode:<5} ssr={ssr_mode!s:<5} tap_width={tap_width} "
+              f"auto_scale={auto_scale!s:<5} {rounding:<10}: SNR {rows[-1]['snr_db']:6.1f} dB, "
+              f"DC {rows[-1]['dc_offset_lsb']:5.2f} LSB, clipped {rows[-1]['clipped_comb']}", file=sys.stderr)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    if args.format == "csv":
+        writer = csv.DictWriter(out, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: (f"{v:.3f}" if isinstance(v, float) else v) for k, v in row.items()})
+    else:
+        json.dump(rows, out, indent=2)
+    if out is not sys.stdout:
+        out.close()
+
+if __name__ == "__main__":
+    main()
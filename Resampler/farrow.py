@@ -0,0 +1,171 @@
+from migen import *
+from litex.gen import LiteXModule
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.csr import CSRStorage
+from gateware.LimeDFB.Resampler.half_band_core import clip
+
+# Farrow fractional resampler (arbitrary ratio), meant to follow the power-of-two half-band
+# cascade (ResamplerNew) on the same i/q stream layout.
+#
+# The ratio CSR holds the step between output samples in input samples, as an unsigned fixed
+# point number with ratio_frac_bits fractional bits:
+#   ratio = round(f_in / f_out * 2**ratio_frac_bits)
+# 1.0 passes the stream through, < 1.0 interpolates and > 1.0 decimates. The interpolator is
+# a cubic Lagrange Farrow structure: four FIR branches with fixed coefficients whose outputs
+# are combined by a Horner polynomial in the fractional delay mu. It adds no anti-alias
+# filtering, so keep the ratio within [0.5, 2.0] and let the half-band stages do the rest.
+#
+# Throughput: one input and one output sample per clock (whichever side is faster runs at
+# full rate). A new ratio applies from the next output sample.
+
+# Cubic Lagrange interpolation between x[1] (mu = 0) and x[2] (mu = 1), history x[0..3]
+# (oldest first). Row m holds the branch producing the coefficient of mu**m.
+LAGRANGE_CUBIC = [
+    [    0,    1,    0,    0],
+    [-1/3, -1/2,    1, -1/6],
+    [ 1/2,   -1,  1/2,    0],
+    [-1/6,  1/2, -1/2,  1/6],
+]
+
+def farrow_coefficients(tap_width=18):
+    """LAGRANGE_CUBIC quantized to tap_width-bit integers, scaled by 2**(tap_width - 2)."""
+    scale = 1 << (tap_width - 2)
+    return [[int(round(c * scale)) for c in row] for row in LAGRANGE_CUBIC]
+
+class FarrowResampler(LiteXModule):
+    def __init__(self, data_width=16, tap_width=18, ratio=1.0, ratio_width=32, ratio_frac_bits=24, mu_bits=16):
+        assert ratio_width - ratio_frac_bits >= 2, "The ratio needs at least 2 integer bits"
+        assert mu_bits <= ratio_frac_bits, "mu_bits must not exceed ratio_frac_bits"
+        self.data_width      = data_width
+        self.tap_width       = tap_width
+        self.ratio_frac_bits = ratio_frac_bits
+        self.mu_bits         = mu_bits
+        self.coeff_frac      = tap_width - 2
+        self.coefficients    = farrow_coefficients(tap_width)
+        # Branch products + branch sums + 3 Horner steps + output saturation
+        self.latency         = 6
+
+        layout = [("i", data_width), ("q", data_width)]
+        self.sink   = stream.Endpoint(layout)
+        self.source = stream.Endpoint(layout)
+
+        # CSRs
+        self.ratio = CSRStorage(ratio_width, reset=int(round(ratio * (1 << ratio_frac_bits))), name="ratio",
+            description=f"Input samples per output sample, unsigned fixed point with {ratio_frac_bits} fractional bits."
+        )
+
+        # # #
+
+        one = 1 << ratio_frac_bits
+
+        # Position of the next output sample relative to history[1], in input samples. Starts at
+        # 3.0 so the history fills first and the first output is the first input sample.
+        position     = Signal(ratio_width + 1, reset=3 * one)
+        position_new = Signal(ratio_width + 1)
+        consume      = Signal()
+        emit         = Signal()
+        enable       = Signal()
+
+        history_i = [Signal((data_width, True)) for _ in range(4)]
+        history_q = [Signal((data_width, True)) for _ in range(4)]
+        window_i  = [Signal((data_width, True)) for _ in range(4)]
+        window_q  = [Signal((data_width, True)) for _ in range(4)]
+        mu        = Signal((mu_bits + 1, True))
+
+        # Input Side: take a sample whenever the output position has moved past history[1]
+        self.comb += [
+            self.sink.ready.eq(position[ratio_frac_bits:] != 0),
+            consume.eq(self.sink.valid & self.sink.ready),
+            If(consume,
+                position_new.eq(position - one),
+                [window_i[k].eq(history_i[k + 1]) for k in range(3)],
+                [window_q[k].eq(history_q[k + 1]) for k in range(3)],
+                window_i[3].eq(self.sink.i),
+                window_q[3].eq(self.sink.q)
+            ).Else(
+                position_new.eq(position),
+                [window_i[k].eq(history_i[k]) for k in range(4)],
+                [window_q[k].eq(history_q[k]) for k in range(4)]
+            ),
+            # Output Side: interpolate once the position lies between history[1] and history[2]
+            emit.eq((position_new[ratio_frac_bits:] == 0) & self.source.ready),
+            mu.eq(position_new[ratio_frac_bits - mu_bits:ratio_frac_bits]),
+            enable.eq(self.source.ready)
+        ]
+        self.sync += [
+            If(consume,
+                [history_i[k].eq(window_i[k]) for k in range(4)],
+                [history_q[k].eq(window_q[k]) for k in range(4)]
+            ),
+            If(emit,
+                position.eq(position_new + self.ratio.storage)
+            ).Else(
+                position.eq(position_new)
+            )
+        ]
+
+        # Datapath
+        self.comb += [
+            self.source.i.eq(self.interpolate(window_i, mu, enable)),
+            self.source.q.eq(self.interpolate(window_q, mu, enable))
+        ]
+
+        # Valid Signal Delay
+        valid_delay = [Signal() for _ in range(self.latency)]
+        self.sync += If(enable,
+            valid_delay[0].eq(emit),
+            [valid_delay[i].eq(valid_delay[i-1]) for i in range(1, self.latency)]
+        )
+        self.comb += self.source.valid.eq(valid_delay[-1])
+
+    def interpolate(self, window, mu, enable):
+        """Pipelined Farrow interpolation of window (oldest first) at fractional delay mu."""
+        data_width = self.data_width
+
+        # 1. Branch Products
+        products = []
+        for row in self.coefficients:
+            branch = []
+            for tap, x in zip(row, window):
+                if tap == 0:
+                    continue
+                product = Signal((data_width + self.tap_width, True))
+                self.sync += If(enable, product.eq(x * tap))
+                branch.append(product)
+            products.append(branch)
+        mu_1 = Signal.like(mu)
+        self.sync += If(enable, mu_1.eq(mu))
+
+        # 2. Branch Sums (|row| sums to at most 2.34, so 3 extra bits)
+        branches = []
+        for branch in products:
+            value = Signal((data_width + 3, True))
+            self.sync += If(enable, value.eq(sum(branch) >> self.coeff_frac))
+            branches.append(value)
+        mu_2 = Signal.like(mu)
+        self.sync += If(enable, mu_2.eq(mu_1))
+
+        # 3. Horner Steps: v = (v * mu) >> mu_bits + branch, from the mu**3 branch down. Every
+        # step adds one register, so the lower branches are delayed to line up with it.
+        value, mu_k = branches[3], mu_2
+        for m in [2, 1, 0]:
+            branch = branches[m]
+            for _ in range(2 - m):
+                delayed = Signal.like(branch)
+                self.sync += If(enable, delayed.eq(branch))
+                branch = delayed
+            step = Signal((data_width + 4, True))
+            self.sync += If(enable, step.eq(((value * mu_k) >> self.mu_bits) + branch))
+            mu_next = Signal.like(mu)
+            self.sync += If(enable, mu_next.eq(mu_k))
+            value, mu_k = step, mu_next
+
+        # 4. Output Saturation
+        out = Signal((data_width, True))
+        self.sync += If(enable, out.eq(clip(self, value, data_width)))
+        return out
+
+
+if __name__ == "__main__":
+    for tap_width in [16, 18, 25]:
+        print(f"tap_width={tap_width}: {farrow_coefficients(tap_width)}")
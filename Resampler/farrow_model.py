@@ -0,0 +1,57 @@
+"""Bit-exact NumPy reference model of the Farrow fractional resampler (``farrow.py``).
+
+Output sample ``k`` sits ``k * ratio`` input samples after the first input sample: with
+``n`` the integer and ``mu`` the top ``mu_bits`` of the fractional part of that position, it
+interpolates the window ``x[n-1], x[n], x[n+1], x[n+2]`` (``x[-1]`` is the zero reset value of
+the history) exactly like the RTL pipeline:
+  - Branches: ``sum(coefficient * x) >> (tap_width - 2)`` per row of ``farrow_coefficients``.
+  - Horner: ``v = ((v * mu) >> mu_bits) + branch``, from the ``mu**3`` branch down.
+  - Output: signed saturation to ``data_width`` bits.
+
+The result holds every output the RTL transfers once the whole input has been consumed
+(the ratio is constant for the model).
+"""
+import numpy as np
+
+from gateware.LimeDFB.Resampler.farrow import farrow_coefficients
+from gateware.LimeDFB.Resampler.half_band_model import overflow_count, saturate, to_iq
+
+
+class FarrowResamplerModel:
+    """Reference model of ``FarrowResampler``. Takes the same arguments."""
+    def __init__(self, data_width=16, tap_width=18, ratio=1.0, ratio_width=32, ratio_frac_bits=24, mu_bits=16):
+        self.data_width      = data_width
+        self.tap_width       = tap_width
+        self.ratio_frac_bits = ratio_frac_bits
+        self.mu_bits         = mu_bits
+        self.step            = int(round(ratio * (1 << ratio_frac_bits)))
+        self.coefficients    = farrow_coefficients(tap_width)
+        self.overflows       = 0
+
+    def positions(self, n_in):
+        """(n, mu) of every output sample the RTL produces from n_in input samples."""
+        # The output at position p needs input n + 2 with n = p >> ratio_frac_bits, so p < n_in - 2
+        n_out = (((n_in - 2) << self.ratio_frac_bits) - 1) // self.step + 1 if n_in >= 3 else 0
+        position = np.arange(n_out, dtype=np.int64) * self.step
+        n  = position >> self.ratio_frac_bits
+        mu = (position & ((1 << self.ratio_frac_bits) - 1)) >> (self.ratio_frac_bits - self.mu_bits)
+        return n, mu
+
+    def process_iq(self, i, q):
+        n, mu = self.positions(len(i))
+        result = []
+        for x in (i, q):
+            x = np.concatenate([[0], np.asarray(x, dtype=np.int64)])
+            window = [x[n + k] for k in range(4)]  # x[n-1 .. n+2], shifted by the leading zero
+            branches = [sum(tap * w for tap, w in zip(row, window)) >> (self.tap_width - 2)
+                        for row in self.coefficients]
+            value = branches[3]
+            for m in [2, 1, 0]:
+                value = ((value * mu) >> self.mu_bits) + branches[m]
+            self.overflows += overflow_count(value, self.data_width)
+            result.append(saturate(value, self.data_width))
+        return result[0], result[1]
+
+    def process(self, x):
+        i, q = self.process_iq(*to_iq(x))
+        return i + 1j * q
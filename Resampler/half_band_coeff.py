@@ -0,0 +1,110 @@
+from migen import *
+from migen.genlib.cdc import PulseSynchronizer
+from litex.gen import LiteXModule
+from litex.soc.interconnect.csr import CSRStatus, CSRStorage, CSRField
+from gateware.LimeDFB.Resampler.half_band_config import HalfBandConfig
+
+# CSR coefficient bank for reloadable half-band filters (HalfBandConfig(coeff_slots=...)).
+#
+# Software loads a new image into the shadow registers and then requests a swap:
+#   image = HalfBandConfig(mode="long", tap_width=18, coeff_slots=8).load_image(as_words=True)
+#   for addr, word in enumerate(image):
+#       coeff_addr = addr
+#       coeff_data = word
+#   coeff_ctrl.swap = 1
+#   while coeff_status.pending: pass
+# The filters copy the new coefficients into their active registers on the next sample they
+# process, so they apply from one output sample to the next without a rebuild. Shorter
+# profiles load into larger cores (e.g. "short" into coeff_slots=8), padded with zeros.
+#
+# The shadow registers live in the sys domain. A swap request is passed to the filter clock
+# domain by a PulseSynchronizer and copies them there into a stable register set, which the
+# filters read; the copy is acknowledged back to sys, clearing coeff_status.pending. Do not
+# write the shadow registers while a swap is pending (they are only sampled by that copy).
+
+
+class HalfBandCoefficientBank(LiteXModule):
+    """Shadow coefficient registers and load/swap CSRs for a reloadable half-band filter.
+
+    Connect ``taps`` and ``swap`` to the ``coeff_taps``/``coeff_swap`` port of a
+    ``HalfBandCore``, a ``Complex*`` wrapper or a ``ResamplerNew`` built with the same
+    ``config``. ``taps`` is the stable copy and ``swap`` a single-cycle pulse following its
+    update, both in ``clock_domain``.
+    """
+    def __init__(self, config: HalfBandConfig, clock_domain="sys"):
+        assert config.reloadable, "HalfBandCoefficientBank requires a config with coeff_slots set"
+
+        image = config.load_image()
+        self.taps = [Signal((config.tap_width, True), reset=tap) for tap in image]
+        self.swap = Signal()
+
+        shadow = [Signal((config.tap_width, True), reset=tap) for tap in image]
+
+        # CSRs
+        self.coeff_addr = CSRStorage(bits_for(len(image) - 1), name="coeff_addr",
+            description="Coefficient address: 0 to coeff_slots-1 are the unique H0 taps (outermost first), coeff_slots is the H1 centre tap."
+        )
+        self.coeff_data = CSRStorage(config.tap_width, name="coeff_data",
+            description="Coefficient value (two's complement). Writing stores it in the shadow register selected by coeff_addr."
+        )
+        self.coeff_ctrl = CSRStorage(name="coeff_ctrl", fields=[
+            CSRField("swap", size=1, offset=0, pulse=True,
+                description="Write 1 to apply the shadow registers on the next processed sample."),
+        ])
+        self.coeff_status = CSRStatus(name="coeff_status", fields=[
+            CSRField("pending", size=1, offset=0,
+                description="Swap requested and shadow registers not copied to the filter clock domain yet."),
+        ])
+        self.coeff_info = CSRStatus(name="coeff_info", fields=[
+            CSRField("slots", size=8, offset=0, reset=config.coeff_slots,
+                description="Number of unique H0 coefficient slots (image length is slots + 1)."),
+            CSRField("tap_width", size=8, offset=8, reset=config.tap_width,
+                description="Coefficient width in bits."),
+        ])
+
+        # # #
+
+        # Shadow Registers
+        for addr, tap in enumerate(shadow):
+            self.sync += If(self.coeff_data.re & (self.coeff_addr.storage == addr),
+                tap.eq(self.coeff_data.storage)
+            )
+
+        # Swap Request (copy pulse in clock_domain, acknowledge in sys)
+        copy = Signal()
+        if clock_domain == "sys":
+            self.comb += copy.eq(self.coeff_ctrl.fields.swap)
+        else:
+            self.ps_swap = PulseSynchronizer("sys", clock_domain)
+            self.ps_ack  = PulseSynchronizer(clock_domain, "sys")
+            self.comb += [
+                self.ps_swap.i.eq(self.coeff_ctrl.fields.swap),
+                copy.eq(self.ps_swap.o),
+                self.ps_ack.i.eq(copy),
+            ]
+            self.sync += If(self.coeff_ctrl.fields.swap,
+                self.coeff_status.fields.pending.eq(1)
+            ).Elif(self.ps_ack.o,
+                self.coeff_status.fields.pending.eq(0)
+            )
+
+        # Stable Copy: the shadow registers are static while pending, the filters get the swap
+        # once the copy is registered.
+        sync = getattr(self.sync, clock_domain)
+        sync += [
+            If(copy, [tap.eq(shadow_tap) for tap, shadow_tap in zip(self.taps, shadow)]),
+            self.swap.eq(copy),
+        ]
+
+    def connect(self, target):
+        """Statements driving the coefficient port of ``target`` from this bank."""
+        return [
+            [target.coeff_taps[i].eq(tap) for i, tap in enumerate(self.taps)],
+            target.coeff_swap.eq(self.swap),
+        ]
+
+
+if __name__ == "__main__":
+    for mode in ["short", "long"]:
+        config = HalfBandConfig(mode=mode, tap_width=18, coeff_slots=8)
+        print(f"{mode:<5}: {[hex(word) for word in config.load_image(as_words=True)]}")
@@ -1,112 +1,170 @@
 from migen import *
 from litex.soc.interconnect import stream
 from gateware.LimeDFB.Resampler.half_band_config import HalfBandConfig
-from gateware.LimeDFB.Resampler.half_band_core import HalfBandCore
+from gateware.LimeDFB.Resampler.half_band_core import HalfBandCore, clip
+
+SSR_FACTORS = [2, 4, 8]
+
+def lane_fields(lanes):
+    """(i, q) field names of each lane, in sample order, for a stream carrying `lanes` samples per beat."""
+    if lanes == 1:
+        return [("i", "q")]
+    if lanes == 2:
+        return [("i_even", "q_even"), ("i_odd", "q_odd")]
+    return [(f"i_{k}", f"q_{k}") for k in range(lanes)]
+
+def ssr_layout(data_width, lanes):
+    """Stream layout with `lanes` complex samples per beat (1: i/q, 2: even/odd, 4/8: i_k/q_k)."""
+    return [(name, data_width) for fields in lane_fields(lanes) for name in fields]
+
+def polyphase_sum(module, config, core, lane=0):
+    """Decimator output out_0 + out_1: wraps to data_width, or saturates with config.saturate."""
+    value = core.out_0_lanes[lane] + core.out_1_lanes[lane]
+    if config.saturate:
+        return clip(module, value, config.data_width)
+    return value
+
+def share_coefficients(module, config, cores):
+    """
+    Reloadable configs: create one coefficient port (coeff_taps, coeff_swap) on the module
+    and fan it out to all of its cores, so I and Q always swap on the same core step.
+    """
+    if not config.reloadable:
+        return
+    module.coeff_taps = [Signal((config.tap_width, True), reset=tap) for tap in config.load_image()]
+    module.coeff_swap = Signal()
+    for core in cores:
+        module.comb += [
+            [core.coeff_taps[i].eq(tap) for i, tap in enumerate(module.coeff_taps)],
+            core.coeff_swap.eq(module.coeff_swap)
+        ]
 
 class ComplexSSRDecimator(Module):
-    def __init__(self, config: HalfBandConfig):
+    def __init__(self, config: HalfBandConfig, ssr: int = 2):
+        assert ssr in SSR_FACTORS, f"SSR factor must be one of {SSR_FACTORS}"
         self.config = config
-        # Layouts
-        sink_layout = [
-            ("i_even", config.data_width),
-            ("q_even", config.data_width),
-            ("i_odd", config.data_width),
-            ("q_odd", config.data_width)
-        ]
-        source_layout = [
-            ("i", config.data_width),
-            ("q", config.data_width)
-        ]
+        # Layouts (ssr samples per beat in, ssr/2 out)
+        lanes = ssr // 2
+        sink_layout   = ssr_layout(config.data_width, ssr)
+        source_layout = ssr_layout(config.data_width, lanes)
 
         # Interface
         self.sink = stream.Endpoint(sink_layout)
         self.source = stream.Endpoint(source_layout)
 
         # Instantiation
-        self.submodules.core_i = core_i = HalfBandCore(config, is_decimator=True)
-        self.submodules.core_q = core_q = HalfBandCore(config, is_decimator=True)
+        self.submodules.core_i = core_i = HalfBandCore(config, is_decimator=True, lanes=lanes)
+        self.submodules.core_q = core_q = HalfBandCore(config, is_decimator=True, lanes=lanes)
+        share_coefficients(self, config, [core_i, core_q])
 
+        # The pipeline steps on an input beat while the output is free or being transferred
+        # (source.valid never waits for source.ready, see Valid Signal Delay).
         core_enable = Signal()
-        self.comb += core_enable.eq(self.sink.valid & self.source.ready)
+        self.comb += core_enable.eq(self.sink.valid & (self.source.ready | ~self.source.valid))
 
-        # Routing (Sink to Cores)
+        # Routing (Sink to Cores: even samples to in_0, odd samples to in_1)
         self.comb += [
             core_i.enable.eq(core_enable),
             core_q.enable.eq(core_enable),
-            core_i.in_0.eq(self.sink.i_even),
-            core_i.in_1.eq(self.sink.i_odd),
-            core_q.in_0.eq(self.sink.q_even),
-            core_q.in_1.eq(self.sink.q_odd),
-            self.sink.ready.eq(self.source.ready)
+            self.sink.ready.eq(self.source.ready | ~self.source.valid)
         ]
+        sink_lanes = lane_fields(ssr)
+        for lane in range(lanes):
+            (i_even, q_even), (i_odd, q_odd) = sink_lanes[2*lane], sink_lanes[2*lane + 1]
+            self.comb += [
+                core_i.in_0_lanes[lane].eq(getattr(self.sink, i_even)),
+                core_i.in_1_lanes[lane].eq(getattr(self.sink, i_odd)),
+                core_q.in_0_lanes[lane].eq(getattr(self.sink, q_even)),
+                core_q.in_1_lanes[lane].eq(getattr(self.sink, q_odd)),
+            ]
 
         # Output Math (Cores to Source)
-        self.comb += [
-            self.source.i.eq(core_i.out_0 + core_i.out_1),
-            self.source.q.eq(core_q.out_0 + core_q.out_1)
-        ]
+        for lane, (i, q) in enumerate(lane_fields(lanes)):
+            self.comb += [
+                getattr(self.source, i).eq(polyphase_sum(self, config, core_i, lane)),
+                getattr(self.source, q).eq(polyphase_sum(self, config, core_q, lane))
+            ]
 
         # Valid Signal Delay
-        valid_delay = [Signal() for _ in range(config.core_latency)]
+        valid_delay = [Signal() for _ in range(core_i.latency)]
         self.sync += If(core_enable,
             valid_delay[0].eq(self.sink.valid),
-            [valid_delay[i].eq(valid_delay[i-1]) for i in range(1, config.core_latency)]
+            [valid_delay[i].eq(valid_delay[i-1]) for i in range(1, core_i.latency)]
+        )
+        # The last output sample stays valid until it is transferred (taken), so a stalled sink
+        # neither repeats nor withholds it.
+        taken = Signal()
+        self.sync += If(core_enable,
+            taken.eq(0)
+        ).Elif(self.source.valid & self.source.ready,
+            taken.eq(1)
         )
-        self.comb += self.source.valid.eq(valid_delay[-1])
+        self.comb += self.source.valid.eq(valid_delay[-1] & ~taken)
 
 
 class ComplexSSRInterpolator(Module):
-    def __init__(self, config: HalfBandConfig):
+    def __init__(self, config: HalfBandConfig, ssr: int = 2):
+        assert ssr in SSR_FACTORS, f"SSR factor must be one of {SSR_FACTORS}"
         self.config = config
-        # Layouts
-        sink_layout = [
-            ("i", config.data_width),
-            ("q", config.data_width)
-        ]
-        source_layout = [
-            ("i_even", config.data_width),
-            ("q_even", config.data_width),
-            ("i_odd", config.data_width),
-            ("q_odd", config.data_width)
-        ]
+        # Layouts (ssr/2 samples per beat in, ssr out)
+        lanes = ssr // 2
+        sink_layout   = ssr_layout(config.data_width, lanes)
+        source_layout = ssr_layout(config.data_width, ssr)
 
         # Interface
         self.sink = stream.Endpoint(sink_layout)
         self.source = stream.Endpoint(source_layout)
 
         # Instantiation
-        self.submodules.core_i = core_i = HalfBandCore(config, is_decimator=False)
-        self.submodules.core_q = core_q = HalfBandCore(config, is_decimator=False)
+        self.submodules.core_i = core_i = HalfBandCore(config, is_decimator=False, lanes=lanes)
+        self.submodules.core_q = core_q = HalfBandCore(config, is_decimator=False, lanes=lanes)
+        share_coefficients(self, config, [core_i, core_q])
 
+        # The pipeline steps on an input beat while the output is free or being transferred
+        # (source.valid never waits for source.ready, see Valid Signal Delay).
         core_enable = Signal()
-        self.comb += core_enable.eq(self.sink.valid & self.source.ready)
+        self.comb += core_enable.eq(self.sink.valid & (self.source.ready | ~self.source.valid))
 
         # Routing (Sink to Cores - Fan-out)
         self.comb += [
             core_i.enable.eq(core_enable),
             core_q.enable.eq(core_enable),
-            core_i.in_0.eq(self.sink.i),
-            core_i.in_1.eq(self.sink.i),
-            core_q.in_0.eq(self.sink.q),
-            core_q.in_1.eq(self.sink.q),
-            self.sink.ready.eq(self.source.ready)
-        ]
-
-        # Output Math (Cores to Source)
-        self.comb += [
-            self.source.i_even.eq(core_i.out_0),
-            self.source.i_odd.eq(core_i.out_1),
-            self.source.q_even.eq(core_q.out_0),
-            self.source.q_odd.eq(core_q.out_1)
+            self.sink.ready.eq(self.source.ready | ~self.source.valid)
         ]
+        for lane, (i, q) in enumerate(lane_fields(lanes)):
+            self.comb += [
+                core_i.in_0_lanes[lane].eq(getattr(self.sink, i)),
+                core_i.in_1_lanes[lane].eq(getattr(self.sink, i)),
+                core_q.in_0_lanes[lane].eq(getattr(self.sink, q)),
+                core_q.in_1_lanes[lane].eq(getattr(self.sink, q)),
+            ]
+
+        # Output Math (Cores to Source: out_0 is the even, out_1 the odd output sample)
+        source_lanes = lane_fields(ssr)
+        for lane in range(lanes):
+            (i_even, q_even), (i_odd, q_odd) = source_lanes[2*lane], source_lanes[2*lane + 1]
+            self.comb += [
+                getattr(self.source, i_even).eq(core_i.out_0_lanes[lane]),
+                getattr(self.source, i_odd).eq(core_i.out_1_lanes[lane]),
+                getattr(self.source, q_even).eq(core_q.out_0_lanes[lane]),
+                getattr(self.source, q_odd).eq(core_q.out_1_lanes[lane])
+            ]
 
         # Valid Signal Delay
-        valid_delay = [Signal() for _ in range(config.core_latency)]
+        valid_delay = [Signal() for _ in range(core_i.latency)]
         self.sync += If(core_enable,
             valid_delay[0].eq(self.sink.valid),
-            [valid_delay[i].eq(valid_delay[i-1]) for i in range(1, config.core_latency)]
+            [valid_delay[i].eq(valid_delay[i-1]) for i in range(1, core_i.latency)]
+        )
+        # The last output sample stays valid until it is transferred (taken), so a stalled sink
+        # neither repeats nor withholds it.
+        taken = Signal()
+        self.sync += If(core_enable,
+            taken.eq(0)
+        ).Elif(self.source.valid & self.source.ready,
+            taken.eq(1)
         )
-        self.comb += self.source.valid.eq(valid_delay[-1])
+        self.comb += self.source.valid.eq(valid_delay[-1] & ~taken)
 
 class ComplexStandardDecimator(Module):
     def __init__(self, config: HalfBandConfig):
@@ -124,6 +182,7 @@ class ComplexStandardDecimator(Module):
         # Submodules
         self.submodules.core_i = core_i = HalfBandCore(config, is_decimator=True)
         self.submodules.core_q = core_q = HalfBandCore(config, is_decimator=True)
+        share_coefficients(self, config, [core_i, core_q])
 
         # Logic (The Commutator)
         phase = Signal()
@@ -151,7 +210,7 @@ class ComplexStandardDecimator(Module):
         ]
 
         # Valid Tracking
-        latency = config.core_latency
+        latency = core_i.latency
         valid_delay = [Signal() for _ in range(latency)]
         self.sync += If(core_enable,
             valid_delay[0].eq(self.sink.valid),
@@ -161,8 +220,8 @@ class ComplexStandardDecimator(Module):
         # Output
         self.comb += [
             self.source.valid.eq(valid_delay[-1] & core_enable),
-            self.source.i.eq(core_i.out_0 + core_i.out_1),
-            self.source.q.eq(core_q.out_0 + core_q.out_1)
+            self.source.i.eq(polyphase_sum(self, config, core_i)),
+            self.source.q.eq(polyphase_sum(self, config, core_q))
         ]
 
 
@@ -182,6 +241,7 @@ class ComplexStandardInterpolator(Module):
         # Submodules
         self.submodules.core_i = core_i = HalfBandCore(config, is_decimator=False)
         self.submodules.core_q = core_q = HalfBandCore(config, is_decimator=False)
+        share_coefficients(self, config, [core_i, core_q])
 
         # Serialization (Continuous)
         i_odd_held = Signal((config.data_width, True))
@@ -205,7 +265,7 @@ class ComplexStandardInterpolator(Module):
         ]
 
         # Valid Tracking
-        latency = config.core_latency
+        latency = core_i.latency
         valid_delay = [Signal() for _ in range(latency)]
         self.sync += If(pipeline_enable,
             valid_delay[0].eq(self.sink.valid),
@@ -1,4 +1,75 @@
+import hashlib
+import json
 import math
+import os
+import tempfile
+
+def csd_digits(value):
+    """
+    Canonical signed digit recoding of an integer: list of (shift, sign) pairs with
+    value == sum(sign << shift). No two non-zero digits are adjacent.
+    """
+    digits = []
+    shift = 0
+    while value != 0:
+        if value & 1:
+            sign = 2 - (value & 3)  # +1 or -1
+            digits.append((shift, sign))
+            value -= sign
+        value >>= 1
+        shift += 1
+    return digits
+
+def adder_tree_levels(num_inputs):
+    """Adder levels of the balanced tree summing num_inputs terms."""
+    return math.ceil(math.log2(num_inputs)) if num_inputs > 1 else 0
+
+def registered_levels(num_inputs, register_every=1):
+    """Pipeline registers of that tree when every register_every-th (and the last) level is registered."""
+    return math.ceil(adder_tree_levels(num_inputs) / register_every)
+
+# Quantized tap sets are memoized per process and on disk, keyed by mode, tap width and a digest
+# of the prototype taps (the search does not depend on the data width). LIMEDFB_TAP_CACHE sets
+# the cache file, an empty value disables the disk cache. Bump TAP_SEARCH_VERSION when
+# _get_safe_quantized_taps changes so stale entries are not reused.
+TAP_SEARCH_VERSION = 1
+TAP_CACHE_FILE = os.environ.get("LIMEDFB_TAP_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "limedfb", "half_band_taps.json"))
+_tap_cache = None
+
+def tap_cache():
+    """Memoized quantized tap sets, loaded from TAP_CACHE_FILE on first use."""
+    global _tap_cache
+    if _tap_cache is None:
+        _tap_cache = {}
+        if TAP_CACHE_FILE:
+            try:
+                with open(TAP_CACHE_FILE) as f:
+                    _tap_cache = json.load(f)
+            except (OSError, ValueError):
+                pass
+    return _tap_cache
+
+def cached_taps(key, search):
+    """Return the tap set cached under key, or run search() and store its result."""
+    cache = tap_cache()
+    if key not in cache:
+        cache[key] = search()
+        if TAP_CACHE_FILE:
+            # Unique temporary file, so concurrent processes (e.g. sweep workers) never write
+            # the same file; the last os.replace wins with a complete cache.
+            directory = os.path.dirname(TAP_CACHE_FILE) or "."
+            tmp = None
+            try:
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+                with os.fdopen(fd, "w") as f:
+                    json.dump(cache, f)
+                os.replace(tmp, TAP_CACHE_FILE)
+            except OSError:
+                # Read-only checkout or home, keep the in-process cache only
+                if tmp is not None and os.path.exists(tmp):
+                    os.remove(tmp)
+    return list(cache[key])
 
 class HalfBandConfig:
     # Hardcoded text-book half-band taps
@@ -19,24 +90,36 @@ class HalfBandConfig:
     TAPS_SHORT_DOUBLED = [x * 2 for x in TAPS_SHORT]
     TAPS_LONG_DOUBLED = [x * 2 for x in TAPS_LONG]
 
-    def __init__(self, mode="short", data_width=16, tap_width=18, auto_scale=True):
+    def __init__(self, mode="short", data_width=16, tap_width=18, auto_scale=True, coeff_slots=None, csd=False, register_every=1, rounding="truncate", saturate=False):
             self.mode = mode
             self.data_width = data_width
             self.tap_width = tap_width
+            # csd: replace the tap multipliers with pipelined shift-add trees (no DSP blocks).
+            self.csd = csd
+            # coeff_slots: build the core with runtime-loadable coefficients (see
+            # half_band_coeff.py) and room for this many unique H0 taps. None = constant taps.
+            self.reloadable = coeff_slots is not None
+            # register_every: register every N adder levels (1 = every level, highest fmax).
+            # Larger values trade fmax for latency and flip-flops in slower clock domains.
+            assert register_every >= 1, "register_every must be at least 1"
+            self.register_every = register_every
+            # rounding/saturate: output stage of the cores. "truncate" drops the LSBs (DC bias of
+            # -0.5 LSB per core), "half_up" adds half an LSB first, "convergent" rounds ties to
+            # even (no bias). saturate clips out of range results instead of wrapping them.
+            if rounding not in ["truncate", "half_up", "convergent"]:
+                raise ValueError("Rounding must be 'truncate', 'half_up' or 'convergent'.")
+            self.rounding = rounding
+            self.saturate = saturate
 
             # 1. Select the locked profile
             if mode == "short":
                 raw_taps = self.TAPS_SHORT
-                self.core_latency = 4
             elif mode == "long":
                 raw_taps = self.TAPS_LONG
-                self.core_latency = 5
             elif mode == "short_doubled":
                 raw_taps = self.TAPS_SHORT_DOUBLED
-                self.core_latency = 4
             elif mode == "long_doubled":
                 raw_taps = self.TAPS_LONG_DOUBLED
-                self.core_latency = 5
             else:
                 raise ValueError("Mode must be 'short', 'long', 'short_doubled', or 'long_doubled'.")
 
@@ -44,7 +127,9 @@ class HalfBandConfig:
 
             # 2. Quantize to fixed-point integers (with Auto-Scaling to prevent overflow)
             if auto_scale:
-                quantized_taps = self._get_safe_quantized_taps(raw_taps, tap_width)
+                digest = hashlib.sha1(repr(raw_taps).encode()).hexdigest()[:12]
+                quantized_taps = cached_taps(f"v{TAP_SEARCH_VERSION}/{mode}/{tap_width}/{digest}",
+                                             lambda: self._get_safe_quantized_taps(raw_taps, tap_width))
             else:
                 scale_factor = (1 << (tap_width - 1)) - 1
                 quantized_taps = [int(round(t * scale_factor)) for t in raw_taps]
@@ -65,6 +150,50 @@ class HalfBandConfig:
                     else:
                         assert tap == 0, f"Odd tap at index {i} must be 0 in a half-band filter."
 
+            # 4. Coefficient Slots (reloadable cores)
+            # A shorter profile is centred in the larger core by zero-padding the outer H0 taps,
+            # which only adds delay.
+            num_unique = len(self.h0_taps) // 2
+            self.coeff_slots = num_unique if coeff_slots is None else coeff_slots
+            if self.coeff_slots < num_unique:
+                raise ValueError(f"'{mode}' needs at least {num_unique} coefficient slots, got {self.coeff_slots}.")
+            pad = self.coeff_slots - num_unique
+            if pad:
+                self.h0_taps = [0] * pad + self.h0_taps + [0] * pad
+                self.quantized_taps = [0] * (2 * pad) + self.quantized_taps + [0] * (2 * pad)
+
+            # 5. Multiplier Implementation
+            # CSD costs (reported for every config): adders per core for the unique H0 taps and
+            # the centre tap, and the registered levels of the deepest shift-add tree. All
+            # multipliers of a core share that latency so both paths stay aligned.
+            taps = self.h0_taps[:self.coeff_slots] + [self.h1_center_tap]
+            self.csd_adders  = sum(max(len(csd_digits(tap)) - 1, 0) for tap in taps)
+            self.csd_latency = max(1, max(registered_levels(len(csd_digits(tap)), register_every) for tap in taps))
+            if csd and self.reloadable:
+                raise ValueError("CSD shift-add multipliers need constant taps, they cannot be combined with coeff_slots.")
+            self.multiplier_latency = self.csd_latency if csd else 1
+
+
+            # 6. Pipeline Latency
+            # Pre-adder + multiplier + adder tree over the unique taps + output stage (registered
+            # when it rounds or saturates). This is the depth the core is expected to build;
+            # HalfBandCore derives its own latency from the registers it actually creates
+            # (core.latency, used by the wrappers) and checks it against this.
+            self.output_latency = 0 if (rounding == "truncate" and not saturate) else 1
+            self.core_latency = (1 + self.multiplier_latency + registered_levels(self.coeff_slots, register_every)
+                + self.output_latency)
+
+    def load_image(self, as_words=False):
+            """
+            Coefficient load image for a reloadable core: the unique H0 taps (outermost first)
+            followed by the H1 centre tap, one entry per coefficient address. as_words=True
+            returns the two's complement tap_width-bit words to write to the coeff_data CSR.
+            """
+            image = self.h0_taps[:self.coeff_slots] + [self.h1_center_tap]
+            if as_words:
+                image = [tap & ((1 << self.tap_width) - 1) for tap in image]
+            return image
+
     def _get_safe_quantized_taps(self, raw_taps, tap_width):
             """
             Dynamically finds the highest scale factor that guarantees the passband
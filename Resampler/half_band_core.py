@@ -1,16 +1,123 @@
 from migen import *
-from gateware.LimeDFB.Resampler.half_band_config import HalfBandConfig
+from gateware.LimeDFB.Resampler.half_band_config import HalfBandConfig, csd_digits
 import math
 
+def build_adder_tree(module, inputs, register_every=1, enable=1, level=0):
+    """
+    Pipelined adder tree summing inputs. Every register_every-th level and the last level are
+    registered, the others are combinational. Returns (sum, registered levels).
+    """
+    if len(inputs) == 1:
+        return inputs[0], 0
+
+    registered = ((level + 1) % register_every == 0) or len(inputs) <= 2
+    next_stage_inputs = []
+    for i in range(0, len(inputs) - 1, 2):
+        # Calculate bit growth for this stage
+        res = Signal((max(len(inputs[i]), len(inputs[i+1])) + 1, True))
+        next_stage_inputs.append((res, inputs[i] + inputs[i+1]))
+
+    # If odd number of inputs, pass the last one to the next stage
+    if len(inputs) % 2 == 1:
+        res = Signal((len(inputs[-1]), True))
+        next_stage_inputs.append((res, inputs[-1]))
+
+    for res, value in next_stage_inputs:
+        if registered:
+            module.sync += If(enable, res.eq(value))
+        else:
+            module.comb += res.eq(value)
+
+    res_signal, depth = build_adder_tree(module, [res for res, _ in next_stage_inputs], register_every, enable, level + 1)
+    return res_signal, depth + registered
+
+def constant_multiply(module, x, tap, config: HalfBandConfig, width, enable=1):
+    """
+    Registered x * tap with a latency of config.multiplier_latency cycles. Uses a hardware
+    multiplier, or with config.csd a pipelined tree adding the shifted CSD terms of tap.
+    """
+    out = Signal((width, True))
+    if not config.csd:
+        module.sync += If(enable, out.eq(x * tap))
+        return out
+
+    terms = [(x << shift) if sign > 0 else -(x << shift) for shift, sign in csd_digits(tap)]
+    if not terms:
+        module.sync += If(enable, out.eq(0))
+        return out
+
+    # Shift-add tree, then pad up to the common multiplier latency
+    res, depth = build_adder_tree(module, terms, config.register_every, enable)
+    for _ in range(depth, config.multiplier_latency):
+        reg = Signal((width, True))
+        module.sync += If(enable, reg.eq(res))
+        res = reg
+    return res
+
+def clip(module, value, width):
+    """Signed saturation of value to width bits (same scheme as the lane clipping in decimate4ch.py)."""
+    value_sig = Signal((len(value), True))
+    upper     = value_sig[width - 1:]
+    sign      = value_sig[-1]
+    overflow  = Signal()
+    clipped   = Signal((width, True))
+
+    # If the upper bits disagree with the sign bit => overflow => saturate
+    module.comb += [
+        value_sig.eq(value),
+        overflow.eq((upper != 0) & (upper != (1 << len(upper)) - 1)),
+        If(overflow,
+            If(sign == 0,
+                clipped.eq((1 << (width - 1)) - 1)  # max positive
+            ).Else(
+                clipped.eq(-(1 << (width - 1)))     # max negative
+            )
+        ).Else(
+            clipped.eq(value_sig[:width])
+        )
+    ]
+    return clipped
+
+def output_stage(module, raw, config: HalfBandConfig, enable=1):
+    """
+    Scale raw back to data_width (shift right by tap_width - 1). Plain truncation and wrap is
+    combinational; rounding and/or saturation add one register (config.output_latency).
+    """
+    shift = config.tap_width - 1
+    if config.output_latency == 0:
+        return (raw >> shift)[:config.data_width]
+
+    rounded = Signal((len(raw) + 1, True))
+    if config.rounding == "half_up":
+        module.comb += rounded.eq(raw + (1 << (shift - 1)))
+    elif config.rounding == "convergent":
+        # Ties go to the even neighbour: add half an LSB minus one, plus the kept LSB
+        module.comb += rounded.eq(raw + ((1 << (shift - 1)) - 1) + raw[shift])
+    else:
+        module.comb += rounded.eq(raw)
+
+    shifted = Signal((len(rounded) - shift, True))
+    module.comb += shifted.eq(rounded >> shift)
+
+    out = Signal((config.data_width, True))
+    value = clip(module, shifted, config.data_width) if config.saturate else shifted[:config.data_width]
+    module.sync += If(enable, out.eq(value))
+    return out
+
 class HalfBandCore(Module):
-    def __init__(self, config: HalfBandConfig, is_decimator: bool = False):
+    def __init__(self, config: HalfBandConfig, is_decimator: bool = False, lanes: int = 1):
         # Inputs and Outputs (Migen Signals)
+        # Lane k of a clock is core step k: with lanes > 1 the core performs that many
+        # consecutive steps per clock (super sample rate). in_0/in_1/out_0/out_1 are lane 0.
         self.enable = Signal(reset=1)
-        self.in_0 = Signal((config.data_width, True))
-        self.in_1 = Signal((config.data_width, True))
+        self.in_0_lanes = [Signal((config.data_width, True)) for _ in range(lanes)]
+        self.in_1_lanes = [Signal((config.data_width, True)) for _ in range(lanes)]
+
+        self.out_0_lanes = [Signal((config.data_width, True)) for _ in range(lanes)]
+        self.out_1_lanes = [Signal((config.data_width, True)) for _ in range(lanes)]
 
-        self.out_0 = Signal((config.data_width, True))
-        self.out_1 = Signal((config.data_width, True))
+        self.in_0,  self.in_1  = self.in_0_lanes[0],  self.in_1_lanes[0]
+        self.out_0, self.out_1 = self.out_0_lanes[0], self.out_1_lanes[0]
 
         # --- Path 0 (H0 - The Symmetric FIR) ---
         # h0_taps are the even-indexed taps.
@@ -22,66 +129,53 @@ class HalfBandCore(Module):
         num_h0_taps = len(config.h0_taps)
         unique_taps = config.h0_taps[:num_h0_taps // 2]
         num_unique = len(unique_taps)
+        h1_center_tap = config.h1_center_tap
+
+        # Runtime-loadable coefficients
+        # coeff_taps is the shadow bank (load image order, see HalfBandConfig.load_image) and
+        # is normally driven by a HalfBandCoefficientBank. A coeff_swap pulse copies it to the
+        # active registers on the next core step. The centre tap is multiplied one step before
+        # the H0 taps of the same output sample, so the H0 taps follow one step later and no
+        # output sample mixes old and new coefficients.
+        if config.reloadable:
+            image = config.load_image()
+            self.coeff_taps = [Signal((config.tap_width, True), reset=tap) for tap in image]
+            self.coeff_swap = Signal()
+
+            # The active registers are reset_less so that a pipeline flush (ResetInserter, see the
+            # ResamplerNew rate change sequence) keeps the loaded coefficients.
+            swap_pending  = Signal()
+            swap_h0       = Signal()
+            h0_latched    = [Signal((config.tap_width, True), reset=tap, reset_less=True) for tap in image[:-1]]
+            unique_taps   = [Signal((config.tap_width, True), reset=tap, reset_less=True) for tap in image[:-1]]
+            h1_center_tap = Signal((config.tap_width, True), reset=image[-1], reset_less=True)
+
+            self.sync += [
+                If(self.enable & swap_h0,
+                    swap_h0.eq(0),
+                    [unique_taps[i].eq(h0_latched[i]) for i in range(num_unique)]
+                ),
+                If(self.enable & swap_pending,
+                    swap_pending.eq(0),
+                    swap_h0.eq(1),
+                    h1_center_tap.eq(self.coeff_taps[-1]),
+                    [h0_latched[i].eq(self.coeff_taps[i]) for i in range(num_unique)]
+                ),
+                If(self.coeff_swap, swap_pending.eq(1))
+            ]
         
+        # Sample `offset` steps after lane 0 of the current clock: a lane input, or for negative
+        # offsets an entry of a delay line holding the newest samples of previous clocks.
+        def sample(lane_inputs, history, offset):
+            return lane_inputs[offset] if offset >= 0 else history[-offset - 1]
+
         # Delay line for Path 0
         # We need enough samples for all h0 taps.
         delay_line = [Signal((config.data_width, True)) for _ in range(num_h0_taps)]
         self.sync += If(self.enable,
-            delay_line[0].eq(self.in_0),
-            [delay_line[i].eq(delay_line[i-1]) for i in range(1, num_h0_taps)]
+            [delay_line[i].eq(sample(self.in_0_lanes, delay_line, lanes - 1 - i)) for i in range(num_h0_taps)]
         )
 
-        # Symmetric Pre-Adders (x[n] + x[N-1-n])
-        # Register the output of every pre-adder.
-        # Width should grow by 1 bit to accommodate the sum.
-        pre_adder_outputs = [Signal((config.data_width + 1, True)) for _ in range(num_unique)]
-        for i in range(num_unique):
-            # i matches the first half, (num_h0_taps - 1 - i) matches the second half
-            self.sync += If(self.enable, pre_adder_outputs[i].eq(delay_line[i] + delay_line[num_h0_taps - 1 - i]))
-
-        # Multipliers
-        # Multiply each registered pre-adder output by its corresponding fixed-point tap.
-        # Register the output of every multiplier.
-        # Width: (data_width + 1) + tap_width
-        multiplier_outputs = [Signal((config.data_width + 1 + config.tap_width, True)) for _ in range(num_unique)]
-        for i in range(num_unique):
-            self.sync += If(self.enable, multiplier_outputs[i].eq(pre_adder_outputs[i] * unique_taps[i]))
-
-        # Adder Tree
-        # Sum all the registered multiplier outputs using a pipelined adder tree.
-        # Register the result of each addition stage.
-        
-        def build_adder_tree(inputs):
-            if len(inputs) == 1:
-                return inputs[0], 0
-            
-            next_stage_inputs = []
-            num_pairs = len(inputs) // 2
-            for i in range(num_pairs):
-                # Calculate bit growth for this stage
-                res_width = inputs[2*i].nbits + 1
-                res = Signal((res_width, True))
-                self.sync += If(self.enable, res.eq(inputs[2*i] + inputs[2*i+1]))
-                next_stage_inputs.append(res)
-            
-            # If odd number of inputs, pass the last one to the next stage through a register
-            if len(inputs) % 2 == 1:
-                res_width = inputs[-1].nbits
-                res = Signal((res_width, True))
-                self.sync += If(self.enable, res.eq(inputs[-1]))
-                next_stage_inputs.append(res)
-            
-            res_signal, depth = build_adder_tree(next_stage_inputs)
-            return res_signal, depth + 1
-
-        raw_out_0, adder_tree_depth = build_adder_tree(multiplier_outputs)
-        
-        # Pipeline delay calculation for Path 0:
-        # Stage 1: Pre-adder (1 clock)
-        # Stage 2: Multiplier (1 clock)
-        # Stage 3...: Adder Tree (adder_tree_depth clocks)
-        path0_latency = 1 + 1 + adder_tree_depth
-        
         # --- Path 1 (H1 - The Center Tap) ---
 
         # 1. ALGORITHMIC DELAY: Align in_1 with the center of the H0 window
@@ -94,40 +188,72 @@ class HalfBandCore(Module):
         in_1_delay = [Signal((config.data_width, True)) for _ in range(h1_algorithmic_delay)]
 
         self.sync += If(self.enable,
-            in_1_delay[0].eq(self.in_1),
-            [in_1_delay[i].eq(in_1_delay[i-1]) for i in range(1, h1_algorithmic_delay)]
+            [in_1_delay[i].eq(sample(self.in_1_lanes, in_1_delay, lanes - 1 - i)) for i in range(h1_algorithmic_delay)]
         )
 
-        # 2. MULTIPLIER
-        # Multiply the DELAYED in_1 by config.h1_center_tap.
-        h1_multiplier_output = Signal((config.data_width + config.tap_width, True))
-        self.sync += If(self.enable, h1_multiplier_output.eq(in_1_delay[-1] * config.h1_center_tap))
+        for lane in range(lanes):
+            # Window of this lane's step: the samples before its own in_0
+            window = [sample(self.in_0_lanes, delay_line, lane - 1 - i) for i in range(num_h0_taps)]
 
-        # 3. COMPUTATIONAL PADDING (Junie's original padding logic)
-        num_padding_regs = path0_latency - 1
-        
-        path1_pipeline = [h1_multiplier_output]
-        for i in range(num_padding_regs):
-            reg = Signal((config.data_width + config.tap_width, True))
-            self.sync += If(self.enable, reg.eq(path1_pipeline[-1]))
-            path1_pipeline.append(reg)
-        
-        raw_out_1 = path1_pipeline[-1]
-        
-        # --- Bit Truncation (Final Stage) ---
-        # Shift both raw signals right by config.tap_width - 1
-        # Truncate/slice them back to config.data_width bits.
-        
-        shift_amount = config.tap_width - 1
-        
-        # Combined shifted and sliced signals
-        # Use + True to indicate signed slice if necessary, but Signal(..., True) handles it.
-        # Shift right (arithmetic shift)
-        
-        self.comb += [
-            self.out_0.eq((raw_out_0 >> shift_amount)[:config.data_width]),
-            self.out_1.eq((raw_out_1 >> shift_amount)[:config.data_width])
-        ]
+            # Symmetric Pre-Adders (x[n] + x[N-1-n])
+            # Register the output of every pre-adder.
+            # Width should grow by 1 bit to accommodate the sum.
+            pre_adder_outputs = [Signal((config.data_width + 1, True)) for _ in range(num_unique)]
+            for i in range(num_unique):
+                # i matches the first half, (num_h0_taps - 1 - i) matches the second half
+                self.sync += If(self.enable, pre_adder_outputs[i].eq(window[i] + window[num_h0_taps - 1 - i]))
+
+            # Multipliers
+            # Multiply each registered pre-adder output by its corresponding fixed-point tap.
+            # Register the output of every multiplier (config.multiplier_latency cycles).
+            # Width: (data_width + 1) + tap_width
+            multiplier_outputs = [
+                constant_multiply(self, pre_adder_outputs[i], unique_taps[i], config,
+                    config.data_width + 1 + config.tap_width, self.enable)
+                for i in range(num_unique)
+            ]
+
+            # Adder Tree
+            # Sum all the registered multiplier outputs using a pipelined adder tree.
+            # Register the result of every config.register_every-th addition stage (and the last).
+            raw_out_0, adder_tree_depth = build_adder_tree(self, multiplier_outputs, config.register_every, self.enable)
+
+            # Pipeline delay calculation for Path 0:
+            # Stage 1: Pre-adder (1 clock)
+            # Stage 2: Multiplier (1 clock, or the CSD shift-add tree depth)
+            # Stage 3...: Adder Tree (adder_tree_depth clocks)
+            path0_latency = 1 + config.multiplier_latency + adder_tree_depth
+
+            # 2. MULTIPLIER
+            # Multiply the DELAYED in_1 by config.h1_center_tap.
+            h1_multiplier_output = constant_multiply(self, sample(self.in_1_lanes, in_1_delay, lane - h1_algorithmic_delay),
+                h1_center_tap, config, config.data_width + config.tap_width, self.enable)
+
+            # 3. COMPUTATIONAL PADDING (Junie's original padding logic)
+            num_padding_regs = path0_latency - config.multiplier_latency
+
+            path1_pipeline = [h1_multiplier_output]
+            for i in range(num_padding_regs):
+                reg = Signal((config.data_width + config.tap_width, True))
+                self.sync += If(self.enable, reg.eq(path1_pipeline[-1]))
+                path1_pipeline.append(reg)
+
+            raw_out_1 = path1_pipeline[-1]
+
+            # --- Bit Truncation (Final Stage) ---
+            # Shift both raw signals right by config.tap_width - 1
+            # Truncate/slice them back to config.data_width bits, or round and/or saturate them
+            # (config.rounding, config.saturate).
+            self.comb += [
+                self.out_0_lanes[lane].eq(output_stage(self, raw_out_0, config, self.enable)),
+                self.out_1_lanes[lane].eq(output_stage(self, raw_out_1, config, self.enable))
+            ]
+
+        # Exported pipeline depth (including the output stage): the wrappers align their
+        # valid signals with it.
+        self.latency = path0_latency + config.output_latency
+        assert self.latency == config.core_latency, \
+            f"HalfBandCore built {self.latency} pipeline stages, HalfBandConfig expects {config.core_latency}"
 
         # Comments explicitly stating the pipeline delay
         # Calculated Path 0 latency: {} clock cycles.
@@ -138,13 +264,14 @@ class HalfBandCore(Module):
         self.latency_info = f"""
         Path 0 Latency Breakdown:
           - Pre-adder stage: 1 cycle
-          - Multiplier stage: 1 cycle
-          - Adder tree: {adder_tree_depth} cycles
+          - Multiplier stage: {config.multiplier_latency} cycle(s){" (CSD shift-add, %d adders per core)" % config.csd_adders if config.csd else ""}
+          - Adder tree: {adder_tree_depth} cycles (registered every {config.register_every} level(s))
           - Total Path 0 Latency: {path0_latency} cycles
         Path 1 Alignment:
-          - Multiplier stage: 1 cycle
+          - Multiplier stage: {config.multiplier_latency} cycle(s)
           - Padding registers: {num_padding_regs} cycles
-          - Total Path 1 Latency: {1 + num_padding_regs} cycles
+          - Total Path 1 Latency: {config.multiplier_latency + num_padding_regs} cycles
+        Output Stage ({config.rounding}{", saturate" if config.saturate else ""}): {config.output_latency} cycle(s)
         """
 
 if __name__ == "__main__":
@@ -0,0 +1,234 @@
+from migen import *
+from litex.gen import *
+from litex.soc.interconnect import stream
+from gateware.LimeDFB.Resampler.half_band_config import HalfBandConfig
+from gateware.LimeDFB.Resampler.half_band_complex import polyphase_sum
+from gateware.LimeDFB.Resampler.half_band_core import build_adder_tree, constant_multiply, output_stage
+
+# Folded (time-multiplexed) half-band decimation.
+#
+# After the first decimation stage every further stage only needs a core step every other
+# clock at most: stage k of the folded chain (k = 0 is the second ResamplerNew stage) receives
+# at most one input pair every 2^(k+1) clocks. One fully pipelined core can therefore serve all
+# of them as long as each stage keeps its own delay lines and the pre-adder/multiplier/adder
+# tree pipeline is shared.
+#
+# Issue slots are assigned statically from a free-running counter (a "binary ruler"):
+#   stage 0: slot % 2  == 0
+#   stage 1: slot % 4  == 1
+#   stage 2: slot % 8  == 3
+#   stage k: slot % 2^(k+1) == 2^k - 1
+# Each stage gets exactly its worst-case duty cycle and the slots never collide. A pair that
+# misses its slot waits less than 2^(k+1) clocks, which is always before the next pair of the
+# same stage can complete, so a single pair register per stage is enough.
+
+
+class FoldedHalfBandCore(Module):
+    """Time-multiplexed equivalent of ``HalfBandCore`` (decimator mode) for ``num_stages`` stages.
+
+    Every cycle with ``issue`` set performs one core step for stage ``issue_sel``. The result
+    appears on ``out_0``/``out_1`` with ``out_valid``/``out_sel`` set ``latency`` cycles later.
+    The computed values match the outputs the ``Complex*Decimator`` wrappers stream for
+    ``HalfBandCore`` sample for sample.
+    """
+    def __init__(self, config: HalfBandConfig, num_stages: int):
+        assert not config.reloadable, "FoldedHalfBandCore only supports constant coefficients"
+
+        # Inputs and Outputs (Migen Signals)
+        self.issue     = Signal()
+        self.issue_sel = Signal(max=max(num_stages, 2))
+        self.in_0      = Signal((config.data_width, True))
+        self.in_1      = Signal((config.data_width, True))
+
+        self.out_valid = Signal()
+        self.out_sel   = Signal(max=max(num_stages, 2))
+        self.out_0     = Signal((config.data_width, True))
+        self.out_1     = Signal((config.data_width, True))
+        # Single lane, same port names as HalfBandCore(lanes=1)
+        self.out_0_lanes, self.out_1_lanes = [self.out_0], [self.out_1]
+
+        num_h0_taps = len(config.h0_taps)
+        unique_taps = config.h0_taps[:num_h0_taps // 2]
+        num_unique  = len(unique_taps)
+        h1_algorithmic_delay = (num_h0_taps // 2) + 1
+
+        # --- Per-stage state (delay lines only, no arithmetic) ---
+        delay_lines = [[Signal((config.data_width, True)) for _ in range(num_h0_taps)]
+                       for _ in range(num_stages)]
+        in_1_delays = [[Signal((config.data_width, True)) for _ in range(h1_algorithmic_delay)]
+                       for _ in range(num_stages)]
+
+        for s in range(num_stages):
+            self.sync += If(self.issue & (self.issue_sel == s),
+                delay_lines[s][0].eq(self.in_0),
+                [delay_lines[s][i].eq(delay_lines[s][i-1]) for i in range(1, num_h0_taps)],
+                in_1_delays[s][0].eq(self.in_1),
+                [in_1_delays[s][i].eq(in_1_delays[s][i-1]) for i in range(1, h1_algorithmic_delay)]
+            )
+
+        # Select the issued stage's state. Like HalfBandCore, the pipeline samples the delay
+        # lines before the new pair is shifted in.
+        sel_taps = [Array(delay_lines[s][i] for s in range(num_stages))[self.issue_sel]
+                    for i in range(num_h0_taps)]
+        sel_in_1 = Array(in_1_delays[s][-1] for s in range(num_stages))[self.issue_sel]
+
+        # --- Shared Path 0 (H0 - The Symmetric FIR) ---
+        pre_adder_outputs = [Signal((config.data_width + 1, True)) for _ in range(num_unique)]
+        for i in range(num_unique):
+            self.sync += pre_adder_outputs[i].eq(sel_taps[i] + sel_taps[num_h0_taps - 1 - i])
+
+        multiplier_outputs = [
+            constant_multiply(self, pre_adder_outputs[i], unique_taps[i], config,
+                config.data_width + 1 + config.tap_width)
+            for i in range(num_unique)
+        ]
+
+        raw_out_0, adder_tree_depth = build_adder_tree(self, multiplier_outputs, config.register_every)
+        path0_latency = 1 + config.multiplier_latency + adder_tree_depth
+        self.latency = path0_latency + config.output_latency
+        assert self.latency == config.core_latency
+
+        # --- Shared Path 1 (H1 - The Center Tap) ---
+        h1_multiplier_output = constant_multiply(self, sel_in_1, config.h1_center_tap, config,
+            config.data_width + config.tap_width)
+
+        path1_pipeline = [h1_multiplier_output]
+        for i in range(path0_latency - config.multiplier_latency):
+            reg = Signal((config.data_width + config.tap_width, True))
+            self.sync += reg.eq(path1_pipeline[-1])
+            path1_pipeline.append(reg)
+        raw_out_1 = path1_pipeline[-1]
+
+        # --- Stage tags travel alongside the data ---
+        valid_pipeline = [Signal() for _ in range(self.latency)]
+        sel_pipeline   = [Signal(max=max(num_stages, 2)) for _ in range(self.latency)]
+        self.sync += [
+            valid_pipeline[0].eq(self.issue),
+            sel_pipeline[0].eq(self.issue_sel),
+            [valid_pipeline[i].eq(valid_pipeline[i-1]) for i in range(1, self.latency)],
+            [sel_pipeline[i].eq(sel_pipeline[i-1]) for i in range(1, self.latency)],
+        ]
+
+        # --- Bit Truncation / Rounding (Final Stage) ---
+        self.comb += [
+            self.out_valid.eq(valid_pipeline[-1]),
+            self.out_sel.eq(sel_pipeline[-1]),
+            self.out_0.eq(output_stage(self, raw_out_0, config)),
+            self.out_1.eq(output_stage(self, raw_out_1, config)),
+        ]
+
+
+class FoldedComplexDecimator(Module):
+    """Cascade of ``num_stages`` complex half-band decimators sharing one I and one Q core.
+
+    Produces the same sample stream as ``num_stages`` chained ``ComplexStandardDecimator``
+    instances while accepting up to one input sample per clock. ``active_stages`` (1 to
+    ``num_stages``) selects how many stages of the cascade feed ``source``.
+    """
+    def __init__(self, config: HalfBandConfig, num_stages: int):
+        self.config = config
+        # Layouts
+        layout = [
+            ("i", config.data_width),
+            ("q", config.data_width)
+        ]
+
+        # Interface
+        self.sink          = stream.Endpoint(layout)
+        self.source        = stream.Endpoint(layout)
+        self.active_stages = Signal(max=num_stages + 1, reset=num_stages)
+
+        # Submodules
+        self.submodules.core_i = core_i = FoldedHalfBandCore(config, num_stages)
+        self.submodules.core_q = core_q = FoldedHalfBandCore(config, num_stages)
+
+        # Output buffer. The shared pipeline cannot be stalled, so input is throttled early
+        # enough that everything still in flight fits once source backpressure starts.
+        margin = 2 * num_stages + core_i.latency + 2
+        self.submodules.out_fifo = out_fifo = stream.SyncFIFO(layout, 2 * margin)
+        self.comb += [
+            self.sink.ready.eq(out_fifo.level < margin),
+            out_fifo.source.connect(self.source),
+        ]
+
+        # Core results (out_0 + out_1, wrapped or saturated to data_width as in the Complex wrappers)
+        res_i = Signal((config.data_width, True))
+        res_q = Signal((config.data_width, True))
+        self.comb += [
+            res_i.eq(polyphase_sum(self, config, core_i)),
+            res_q.eq(polyphase_sum(self, config, core_q)),
+        ]
+
+        # Issue slot counter
+        slot = Signal(num_stages)
+        self.sync += slot.eq(slot + 1)
+
+        issue_requests = []
+        for s in range(num_stages):
+            # Input of this stage: the module sink or the previous stage's result
+            if s == 0:
+                in_valid = self.sink.valid & self.sink.ready
+                in_i, in_q = self.sink.i, self.sink.q
+            else:
+                in_valid = core_i.out_valid & (core_i.out_sel == s - 1) & (self.active_stages > s)
+                in_i, in_q = res_i, res_q
+
+            # Commutator (even sample held, odd sample completes the pair)
+            phase  = Signal()
+            i_held = Signal((config.data_width, True))
+            q_held = Signal((config.data_width, True))
+            pair_valid = Signal()
+            pair = [Signal((config.data_width, True)) for _ in range(4)]  # i_even, i_odd, q_even, q_odd
+
+            slot_match = Signal()
+            self.comb += slot_match.eq(slot[:s + 1] == (2**s - 1))
+            issue_requests.append(slot_match & pair_valid)
+
+            self.sync += [
+                If(in_valid,
+                    phase.eq(~phase),
+                    If(phase == 0,
+                        i_held.eq(in_i),
+                        q_held.eq(in_q)
+                    )
+                ),
+                If(in_valid & (phase == 1),
+                    pair[0].eq(i_held),
+                    pair[1].eq(in_i),
+                    pair[2].eq(q_held),
+                    pair[3].eq(in_q),
+                    pair_valid.eq(1)
+                ).Elif(slot_match,
+                    pair_valid.eq(0)
+                )
+            ]
+
+            # Slots never overlap, so at most one stage drives the cores per cycle
+            self.comb += If(slot_match,
+                core_i.issue_sel.eq(s),
+                core_q.issue_sel.eq(s),
+                core_i.in_0.eq(pair[0]),
+                core_i.in_1.eq(pair[1]),
+                core_q.in_0.eq(pair[2]),
+                core_q.in_1.eq(pair[3]),
+            )
+
+        issue = Signal()
+        self.comb += [
+            issue.eq(Reduce("OR", issue_requests)),
+            core_i.issue.eq(issue),
+            core_q.issue.eq(issue),
+        ]
+
+        # Last active stage feeds the output buffer
+        self.comb += [
+            out_fifo.sink.valid.eq(core_i.out_valid & (core_i.out_sel == self.active_stages - 1)),
+            out_fifo.sink.i.eq(res_i),
+            out_fifo.sink.q.eq(res_q),
+        ]
+
+
+if __name__ == "__main__":
+    config = HalfBandConfig(mode="short")
+    decimator = FoldedComplexDecimator(config, num_stages=3)
+    print(f"Folded core latency: {decimator.core_i.latency} cycles")
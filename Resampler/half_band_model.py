@@ -0,0 +1,271 @@
+"""Bit-exact NumPy reference model of the half-band filter gateware.
+
+The classes in this file reproduce ``HalfBandCore`` and the ``Complex*`` wrappers from
+``half_band_complex.py`` sample for sample, so large stimulus sets can be checked without
+running the Migen simulator.
+
+The model follows the RTL arithmetic exactly:
+  - Path 0: symmetric pre-adders, constant multipliers and a pipelined adder tree. All of
+    these grow by enough bits that no intermediate result can overflow, so the full sum is
+    computed with 64-bit integers.
+  - Path 1: delayed centre-tap multiplication, padded to the path 0 latency.
+  - Final stage: arithmetic shift right by ``tap_width - 1`` (truncating, or rounding half
+    up / convergent) and two's complement wrap or saturation to ``data_width`` bits.
+  - Wrappers: ``out_0 + out_1`` wrapped (or saturated) to ``data_width`` and the
+    ``core_latency`` valid alignment.
+
+Stream semantics: the wrapper models return the samples the RTL transfers on its source
+endpoint when the sink is fed continuously (no input bubbles). Sample ``k`` of the result is
+the value the RTL presents after core step ``k + core_latency - 1``. Pad the input with zeros
+to flush the filter tail.
+"""
+import numpy as np
+
+from gateware.LimeDFB.Resampler.half_band_config import HalfBandConfig
+
+
+def wrap(x, width):
+    """Two's complement wrap of an integer array to ``width`` bits."""
+    half = 1 << (width - 1)
+    return ((np.asarray(x, dtype=np.int64) + half) & ((1 << width) - 1)) - half
+
+
+def overflow_count(x, width):
+    """Number of samples in ``x`` that do not fit in ``width`` signed bits (and would wrap)."""
+    half = 1 << (width - 1)
+    return int(np.count_nonzero((x < -half) | (x >= half)))
+
+
+def saturate(x, width):
+    """Signed saturation of an integer array to ``width`` bits."""
+    half = 1 << (width - 1)
+    return np.clip(x, -half, half - 1)
+
+
+def limit(x, width, clip=False):
+    """Fit ``x`` into ``width`` bits: two's complement wrap, or saturation with ``clip``."""
+    return saturate(x, width) if clip else wrap(x, width)
+
+
+def round_shift(x, shift, rounding="truncate"):
+    """Arithmetic shift right by ``shift`` bits with the given ``HalfBandConfig`` rounding."""
+    if rounding == "half_up":
+        x = x + (1 << (shift - 1))
+    elif rounding == "convergent":
+        x = x + ((1 << (shift - 1)) - 1) + ((x >> shift) & 1)
+    return x >> shift
+
+
+def delay(x, n):
+    """Delay an array by ``n`` samples, shifting in zeros (register reset values)."""
+    out = np.zeros_like(x)
+    if n < len(x):
+        out[n:] = x[:len(x) - n]
+    return out
+
+
+def to_iq(x):
+    """Split a complex integer-valued array into int64 I and Q arrays."""
+    x = np.asarray(x)
+    return np.rint(x.real).astype(np.int64), np.rint(x.imag).astype(np.int64)
+
+
+class HalfBandCoreModel:
+    """Reference model of ``HalfBandCore``.
+
+    ``run()`` returns the values of ``out_0``/``out_1`` after every enabled clock cycle.
+    ``overflows`` accumulates the number of output samples that wrapped (or saturated).
+    """
+    def __init__(self, config: HalfBandConfig, is_decimator: bool = False):
+        self.config = config
+
+        num_h0_taps = len(config.h0_taps)
+        self.unique_taps = config.h0_taps[:num_h0_taps // 2]
+        self.num_h0_taps = num_h0_taps
+
+        # Pre-adder + multiplier (or CSD shift-add tree) + adder tree, as derived by the config
+        self.path0_latency = config.core_latency
+
+        if is_decimator:
+            self.h1_algorithmic_delay = (num_h0_taps // 2) + 1
+        else:
+            self.h1_algorithmic_delay = (num_h0_taps // 2)
+        # Algorithmic delay line + multiplier + (path0_latency - 1) padding registers. The
+        # first delay register captures the sample, so the chain delays by one less.
+        self.path1_latency = self.h1_algorithmic_delay + self.path0_latency - 1
+
+        self.shift_amount = config.tap_width - 1
+        self.overflows    = 0
+
+    def run(self, in_0, in_1):
+        in_0 = np.asarray(in_0, dtype=np.int64)
+        in_1 = np.asarray(in_1, dtype=np.int64)
+        n = len(in_0)
+
+        # Path 0: (x[k] + x[N-1-k]) * tap[k], summed over the unique taps. The accumulator is
+        # already offset by the pipeline latency, so each tap is a single in-place slice add.
+        raw_out_0 = np.zeros(n, dtype=np.int64)
+        for k, tap in enumerate(self.unique_taps):
+            if tap == 0:
+                continue
+            for d in (k, self.num_h0_taps - 1 - k):
+                d += self.path0_latency
+                if d < n:
+                    raw_out_0[d:] += tap * in_0[:n - d]
+
+        # Path 1: centre tap
+        raw_out_1 = delay(in_1 * self.config.h1_center_tap, self.path1_latency)
+
+        out_0 = round_shift(raw_out_0, self.shift_amount, self.config.rounding)
+        out_1 = round_shift(raw_out_1, self.shift_amount, self.config.rounding)
+        self.overflows += overflow_count(out_0, self.config.data_width)
+        self.overflows += overflow_count(out_1, self.config.data_width)
+        return (limit(out_0, self.config.data_width, self.config.saturate),
+                limit(out_1, self.config.data_width, self.config.saturate))
+
+
+class ComplexDecimatorModel:
+    """Reference model of ``ComplexSSRDecimator`` and ``ComplexStandardDecimator``.
+
+    Both wrappers feed the cores with (even, odd) input pairs, so they produce the same
+    output sequence. The standard decimator needs one more input pair before it transfers
+    its last output sample.
+    """
+    def __init__(self, config: HalfBandConfig):
+        self.config = config
+        self.core = HalfBandCoreModel(config, is_decimator=True)
+        self.sum_overflows = 0
+
+    @property
+    def overflows(self):
+        return self.core.overflows + self.sum_overflows
+
+    def process_iq(self, i, q):
+        i = np.asarray(i, dtype=np.int64)
+        q = np.asarray(q, dtype=np.int64)
+        n = len(i) - (len(i) % 2)
+        result = []
+        for x in (i, q):
+            out_0, out_1 = self.core.run(x[0:n:2], x[1:n:2])
+            y = out_0 + out_1
+            self.sum_overflows += overflow_count(y, self.config.data_width)
+            result.append(limit(y, self.config.data_width, self.config.saturate)[self.config.core_latency - 1:])
+        return result[0], result[1]
+
+    def process(self, x):
+        i, q = self.process_iq(*to_iq(x))
+        return i + 1j * q
+
+
+class ComplexInterpolatorModel:
+    """Reference model of ``ComplexSSRInterpolator`` and ``ComplexStandardInterpolator``.
+
+    The output is serialized (even, odd, even, odd, ...), which is the order the standard
+    interpolator transmits and the order the SSR interpolator presents per beat.
+    """
+    def __init__(self, config: HalfBandConfig):
+        self.config = config
+        self.core = HalfBandCoreModel(config, is_decimator=False)
+
+    @property
+    def overflows(self):
+        return self.core.overflows
+
+    def process_iq(self, i, q):
+        result = []
+        for x in (i, q):
+            x = np.asarray(x, dtype=np.int64)
+            out_0, out_1 = self.core.run(x, x)
+            start = self.config.core_latency - 1
+            y = np.empty(2 * max(len(x) - start, 0), dtype=np.int64)
+            y[0::2] = out_0[start:]
+            y[1::2] = out_1[start:]
+            result.append(y)
+        return result[0], result[1]
+
+    def process(self, x):
+        i, q = self.process_iq(*to_iq(x))
+        return i + 1j * q
+
+
+class ResamplerNewModel:
+    """Reference model of ``ResamplerNew``.
+
+    Takes the same arguments as ``ResamplerNew``. ``process()`` runs the stream through the
+    number of stages ``mux_sel`` would activate (0 and out-of-range values select 1 stage,
+    like the RTL ``Case`` default). SSR and standard wrappers compute identical sample
+    sequences, so ``ssr_mode`` (False, True, 2, 4 or 8 samples per clock) only documents the
+    lane layout of the modelled instance. The folded decimator computes the same samples as
+    the chained one, so ``folded`` is accepted for the same reason. ``coeff_slots`` models the
+    zero-padded structure of a reloadable instance running the coefficients it was elaborated
+    with, ``csd`` and ``register_every`` the resulting pipeline latency, ``rounding`` and
+    ``saturate`` the output stage.
+    """
+    def __init__(self, sample_width=16, tap_width=16, stages=1, direction="up", filter_mode="short", ssr_mode=False, auto_scale=False, folded=False, coeff_slots=None, csd=False, register_every=1, rounding="truncate", saturate=False):
+        assert direction in ["up", "down"], "Direction must be 'up' or 'down'"
+        assert stages > 0, "ResamplerNew requires at least 1 stage. Use external routing for bypass."
+
+        self.stages    = stages
+        self.direction = direction
+        self.ssr_mode  = ssr_mode
+        self.folded    = folded
+
+        if direction == "down":
+            mode = filter_mode
+        elif filter_mode in ["short", "long"]:
+            mode = f"{filter_mode}_doubled"
+        else:
+            raise ValueError("Invalid filter mode for upsampling")
+        self.config = HalfBandConfig(mode=mode, data_width=sample_width, tap_width=tap_width, auto_scale=auto_scale, coeff_slots=coeff_slots, csd=csd, register_every=register_every,
+                                     rounding=rounding, saturate=saturate)
+
+        model_cls = ComplexDecimatorModel if direction == "down" else ComplexInterpolatorModel
+        self.filters = [model_cls(self.config) for _ in range(stages)]
+
+    @property
+    def overflows(self):
+        return sum(fltr.overflows for fltr in self.filters)
+
+    def active_filters(self, mux_sel=None):
+        if mux_sel is None:
+            mux_sel = self.stages
+        if not 1 <= mux_sel <= self.stages:
+            mux_sel = 1
+        if self.direction == "down":
+            return self.filters[:mux_sel]
+        return self.filters[self.stages - mux_sel:]
+
+    def process_iq(self, i, q, mux_sel=None):
+        for fltr in self.active_filters(mux_sel):
+            i, q = fltr.process_iq(i, q)
+        return i, q
+
+    def process(self, x, mux_sel=None):
+        i, q = self.process_iq(*to_iq(x), mux_sel=mux_sel)
+        return i + 1j * q
+
+
+ComplexSSRDecimatorModel         = ComplexDecimatorModel
+ComplexStandardDecimatorModel    = ComplexDecimatorModel
+ComplexSSRInterpolatorModel      = ComplexInterpolatorModel
+ComplexStandardInterpolatorModel = ComplexInterpolatorModel
+
+
+if __name__ == "__main__":
+    import time
+
+    for mode in ["short", "long", "short_doubled", "long_doubled"]:
+        config = HalfBandConfig(mode=mode, tap_width=18, auto_scale=True)
+        if "doubled" in mode:
+            model = ComplexInterpolatorModel(config)
+        else:
+            model = ComplexDecimatorModel(config)
+
+        rng = np.random.default_rng(0)
+        max_val = (1 << (config.data_width - 1)) - 1
+        stim = rng.integers(-max_val, max_val, 1 << 22) + 1j * rng.integers(-max_val, max_val, 1 << 22)
+
+        start = time.perf_counter()
+        out = model.process(stim)
+        elapsed = time.perf_counter() - start
+        print(f"{mode:<14}: {len(stim)} samples in {elapsed * 1e3:.1f} ms -> {len(out)} output samples")
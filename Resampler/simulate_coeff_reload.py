@@ -0,0 +1,129 @@
+import argparse
+import time
+import numpy as np
+from migen import *
+from gateware.LimeDFB.Resampler.ResamplerNew import ResamplerNew
+from gateware.LimeDFB.Resampler.half_band_coeff import HalfBandCoefficientBank
+from gateware.LimeDFB.Resampler.half_band_config import HalfBandConfig
+from gateware.LimeDFB.Resampler.half_band_model import ResamplerNewModel
+from gateware.LimeDFB.Resampler.simulate_half_band_model import generate_stimulus
+from gateware.LimeDFB.sim.stream_sim import StreamDriver, StreamMonitor, beats_to_iq, iq_to_beats
+
+# Runtime coefficient reload of ResamplerNew through HalfBandCoefficientBank.
+#
+# The resampler runs the "long" profile (coeff_slots=8), in sys or its own clock domain, while the
+# host, in sys, loads the "short" profile into the shadow registers and requests a swap.
+# Once coeff_status.pending clears, it writes a third image into the shadow registers
+# without swapping, which must not reach the filters.
+# The output must follow the model of the long profile up to some sample k and the model of
+# the short profile from k on: each output sample is computed with one coefficient set, the
+# swap happens once and the later shadow writes are not seen. This holds for one stage; in a
+# cascade the later stages still hold samples filtered with the old taps for a few outputs.
+
+SLOTS = 8
+
+# 1. Bench
+class ReloadBench(Module):
+    def __init__(self, direction, stages, ssr_mode, clock_domain):
+        kwargs = dict(sample_width=16, tap_width=18, stages=stages, direction=direction, ssr_mode=ssr_mode,
+                      auto_scale=True, coeff_slots=SLOTS)
+        self.models = {mode: ResamplerNewModel(filter_mode=mode, **kwargs) for mode in ["long", "short"]}
+
+        resampler = ResamplerNew(filter_mode="long", **kwargs)
+        if clock_domain != "sys":
+            resampler = ClockDomainsRenamer(clock_domain)(resampler)
+        self.submodules.resampler = resampler
+        self.submodules.bank = bank = HalfBandCoefficientBank(resampler.config, clock_domain=clock_domain)
+        self.comb += bank.connect(resampler)
+
+def image(mode, direction):
+    """Load image words of a profile for the bank."""
+    mode = mode if direction == "down" else f"{mode}_doubled"
+    return HalfBandConfig(mode=mode, tap_width=18, auto_scale=True, coeff_slots=SLOTS).load_image(as_words=True)
+
+def host(bench, direction, record):
+    bank = bench.bank
+
+    def write_image(words):
+        for addr, word in enumerate(words):
+            yield bank.coeff_addr.storage.eq(addr)
+            yield bank.coeff_data.storage.eq(word)
+            yield bank.coeff_data.re.eq(1)
+            yield
+            yield bank.coeff_data.re.eq(0)
+            yield
+
+    for _ in range(64):
+        yield
+    yield from write_image(image("short", direction))
+    yield bank.coeff_ctrl.fields.swap.eq(1)
+    yield
+    yield bank.coeff_ctrl.fields.swap.eq(0)
+    yield
+    # Swap acknowledged from the filter clock domain
+    cycles = 0
+    while (yield bank.coeff_status.fields.pending):
+        yield
+        cycles += 1
+    record["pending_cycles"] = cycles
+    # Shadow writes after the copy: must not reach the filters
+    words = image("long", direction)
+    yield from write_image([word ^ 0x155 for word in words])
+
+# 2. Run
+def run(direction, stages, ssr_mode, clock_domain, samples):
+    bench = ReloadBench(direction, stages, ssr_mode, clock_domain)
+    resampler = bench.resampler
+    stim = generate_stimulus(samples)
+    driver  = StreamDriver(resampler.sink, iq_to_beats(stim, resampler.sink), flush=64 << stages)
+    monitor = StreamMonitor(resampler.source)
+    record  = {}
+
+    def select_stages():
+        yield resampler.mux_sel.eq(stages)
+        yield
+
+    filter_gens = [driver.generator(), monitor.generator(), select_stages()]
+    if clock_domain == "sys":
+        run_simulation(bench, filter_gens + [host(bench, direction, record)])
+    else:
+        run_simulation(bench, {"sys": [host(bench, direction, record)], clock_domain: filter_gens},
+                       clocks={"sys": 10, clock_domain: 7})
+    output = beats_to_iq(monitor.data, resampler.source)
+
+    before = bench.models["long"].process(stim, mux_sel=stages)
+    after  = bench.models["short"].process(stim, mux_sel=stages)
+    n = min(len(output), len(before))
+    differs = np.nonzero(output[:n] != before[:n])[0]
+    k = int(differs[0]) if len(differs) else n
+    mismatches = int(np.count_nonzero(output[k:n] != after[k:n]))
+    return n, k, mismatches, record.get("pending_cycles")
+
+# 3. Main
+def main():
+    parser = argparse.ArgumentParser(description="Check a runtime coefficient swap of ResamplerNew against the NumPy model.")
+    parser.add_argument("--directions", nargs="+", default=["down", "up"])
+    parser.add_argument("--stages",     type=int, default=1)
+    parser.add_argument("--ssr-modes",  nargs="+", type=int, default=[1, 2], help="Samples per clock (1 = no SSR, 2, 4, 8)")
+    parser.add_argument("--samples",    type=int, default=1024, help="Input samples per run")
+    args = parser.parse_args()
+
+    failures = 0
+    for direction in args.directions:
+        for ssr in args.ssr_modes:
+            for clock_domain in ["sys", "filter"]:
+                start = time.perf_counter()
+                n, k, mismatches, pending = run(direction, args.stages, ssr if ssr > 1 else False, clock_domain, args.samples)
+                elapsed = time.perf_counter() - start
+                # The swap must land inside the stream, with the pending flag cleared
+                ok = 0 < k < n and mismatches == 0 and pending is not None
+                failures += not ok
+                print(f"{direction:<4} ssr={ssr} {clock_domain:<6}: swap at output sample {k:4d} of {n:4d}, "
+                      f"{mismatches} mismatches after it, pending for {pending} cycles "
+                      f"({elapsed * 1e3:7.1f} ms){'' if ok else ' FAIL'}")
+
+    print("PASS" if failures == 0 else f"FAIL ({failures} runs failed)")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,55 @@
+import argparse
+import time
+import numpy as np
+from migen import *
+from migen.sim import run_simulation
+from gateware.LimeDFB.Resampler.farrow import FarrowResampler
+from gateware.LimeDFB.Resampler.farrow_model import FarrowResamplerModel
+from gateware.LimeDFB.Resampler.simulate_half_band_model import generate_stimulus, sender, receiver
+
+# Compares the FarrowResampler RTL against the NumPy model for a set of ratios and reports
+# the throughput (input and output samples per clock) with a free-running sink and source.
+
+def clock_counter(status, cycles):
+    while not status["done"]:
+        yield
+        cycles[0] += 1
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the FarrowResampler RTL against the NumPy reference model.")
+    parser.add_argument("--data-width", type=int,   default=16,  help="Data width in bits")
+    parser.add_argument("--tap-width",  type=int,   default=18,  help="Coefficient width in bits")
+    parser.add_argument("--samples",    type=int,   default=512, help="Number of input samples per run")
+    parser.add_argument("--ratios",     type=float, nargs="+", default=[0.5, 0.75, 1.0, 1.2288, 1.6, 2.0],
+                        help="Input samples per output sample")
+    args = parser.parse_args()
+
+    failures = 0
+    for ratio in args.ratios:
+        kwargs = dict(data_width=args.data_width, tap_width=args.tap_width, ratio=ratio)
+        # Half scale keeps the cubic overshoot of random data away from the saturation limits
+        stim = generate_stimulus(args.samples, data_width=args.data_width - 1)
+
+        dut = FarrowResampler(**kwargs)
+        rtl_out = []
+        status = {"done": False}
+        cycles = [0]
+        start = time.perf_counter()
+        run_simulation(dut, [sender(dut, stim, status), receiver(dut, rtl_out, status, data_width=args.data_width), clock_counter(status, cycles)])
+        rtl_time = time.perf_counter() - start
+
+        model_out = FarrowResamplerModel(**kwargs).process(stim)
+
+        n = min(len(rtl_out), len(model_out))
+        mismatches = int(np.count_nonzero(np.asarray(rtl_out[:n]) != model_out[:n]))
+        if mismatches or n == 0:
+            failures += 1
+        print(f"ratio {ratio:7.4f}: compared {n:5d} samples, {mismatches} mismatches, "
+              f"{args.samples / cycles[0]:4.2f} in/clk, {len(rtl_out) / cycles[0]:4.2f} out/clk "
+              f"(RTL {rtl_time * 1e3:8.1f} ms)")
+
+    print("PASS" if failures == 0 else f"FAIL ({failures} ratios mismatched)")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,165 @@
+import argparse
+import time
+import numpy as np
+from migen import *
+from gateware.LimeDFB.Resampler.ResamplerNew import ResamplerNew
+from gateware.LimeDFB.Resampler.half_band_model import ResamplerNewModel
+from gateware.LimeDFB.Resampler.simulate_half_band_model import generate_stimulus
+from gateware.LimeDFB.sim.stream_sim import StreamDriver, StreamMonitor, beats_to_iq, iq_fields, iq_to_beats, random_pattern
+
+# Mid-stream stage count changes of ResamplerNew against the NumPy model.
+#
+# The stream runs with source backpressure (and random sink bubbles when decimating) while mux_sel walks
+# through a list of stage counts. Every switch goes through the DRAIN/FLUSH/PRIME sequence
+# (see ResamplerNew, 4.), so the output is the concatenation of independent segments:
+#   - segment k is the input accepted between switches k and k + 1, filtered from a zero
+#     (flushed) state with the stage count of mux_sel k,
+#   - its output samples owed at the switch are drained (the model gets zero padding for the
+#     zero-valued DRAIN steps), less the partial source beat discarded at the flush,
+#   - the first samples after a switch are dropped while priming.
+# The bench records the accepted input per segment and the discarded counter at the flush
+# and at the end of PRIME, rebuilds the expected output from the model and checks it bit
+# exact, together with discarded and rate_change_done.
+
+# 1. Bench
+class RateChangeBench:
+    def __init__(self, direction, stages, ssr_mode, filter_mode, mux_sels, samples, ready_probability, seed):
+        self.kwargs = dict(sample_width=16, tap_width=18, stages=stages, direction=direction,
+                           filter_mode=filter_mode, ssr_mode=ssr_mode, auto_scale=True)
+        self.direction = direction
+        self.dut       = dut = ResamplerNew(**self.kwargs)
+        self.priming   = dut.fsm.ongoing("PRIME")
+        self.stim      = generate_stimulus(samples, seed=seed)
+
+        # Each mux_sel runs for a random number of clocks once in effect, about half of the
+        # input beats in total (the rest goes to draining and priming); the last one to the end.
+        rng  = np.random.default_rng(seed)
+        gap  = max(len(self.stim) // len(iq_fields(dut.sink)) // (2*len(mux_sels)), 2)
+        self.schedule = [(mux_sel, int(rng.integers(gap // 2, gap))) for mux_sel in mux_sels]
+
+        # Sink bubbles only when decimating: the standard interpolator steps on every cycle and
+        # takes a bubble as a zero-valued sample (its input is expected at a continuous rate).
+        valid_pattern = random_pattern(0.8, seed=seed) if direction == "down" else (1,)
+        self.driver  = StreamDriver(dut.sink, iq_to_beats(self.stim, dut.sink),
+                                    valid_pattern=valid_pattern, flush=64 << stages)
+        self.monitor = StreamMonitor(dut.source, ready_pattern=random_pattern(ready_probability, seed=seed + 1))
+
+        self.segments      = [] # (mux_sel, accepted sink beats)
+        self.flush_discard = [] # Samples discarded at each flush
+        self.prime_discard = [] # Samples dropped while priming after each flush
+        self.completed     = 0  # Switches that reached rate_change_done
+        self.discarded     = 0  # Final discarded counter
+
+    def control(self):
+        dut = self.dut
+        reads = [dut.sink.valid, dut.sink.ready, dut.rate_change_done, self.priming, dut.discarded]
+        for index, (mux_sel, clocks) in enumerate(self.schedule):
+            yield dut.mux_sel.eq(mux_sel)
+            self.segments.append([mux_sel, 0])
+            # Switch: wait until the new setting is in effect, recording the flush
+            before, primed = None, None
+            while True:
+                yield
+                valid, ready, done, priming, discarded = yield reads
+                self.segments[-1][1] += valid & ready
+                if before is None:
+                    before = discarded
+                if priming and primed is None:
+                    primed = discarded
+                if done or self.driver.done:
+                    break
+            if not done:
+                break
+            if primed is not None:
+                self.flush_discard.append(primed - before)
+                self.prime_discard.append(discarded - primed)
+                self.completed += 1
+            elif len(self.segments) > 1:
+                # Switched before any input was accepted (no flush)
+                self.flush_discard.append(0)
+                self.prime_discard.append(0)
+                self.completed += 1
+            # Run (the last setting until the end of the stream)
+            run = 0
+            while (run < clocks or index == len(self.schedule) - 1) and not self.driver.done:
+                yield
+                valid, ready = yield reads[:2]
+                self.segments[-1][1] += valid & ready
+                run += 1
+            if self.driver.done:
+                break
+        self.discarded = (yield dut.discarded)
+
+    def run(self):
+        run_simulation(self.dut, [self.driver.generator(), self.monitor.generator(), self.control()])
+        return beats_to_iq(self.monitor.data, self.dut.source)
+
+    def expected(self):
+        """Expected output and the samples compared for each segment."""
+        sink_lanes = len(iq_fields(self.dut.sink))
+        pad = np.zeros(64 << self.kwargs["stages"])
+        out, pos = [], 0
+        for k, (mux_sel, beats) in enumerate(self.segments):
+            segment = self.stim[pos:pos + beats * sink_lanes]
+            pos += len(segment)
+            # Zero padding: the DRAIN steps after the last accepted beat
+            model = ResamplerNewModel(**self.kwargs).process(np.concatenate([segment, pad]), mux_sel=mux_sel)
+            owed = len(segment) >> mux_sel if self.direction == "down" else len(segment) << mux_sel
+            start = self.prime_discard[k - 1] if k else 0
+            stop  = owed - (self.flush_discard[k] if k < len(self.flush_discard) else 0)
+            out.append(model[start:max(stop, start)])
+        return np.concatenate(out)
+
+# 2. Main
+def main():
+    parser = argparse.ArgumentParser(description="Check ResamplerNew stage count changes under traffic against the NumPy model.")
+    parser.add_argument("--directions",  nargs="+", default=["down", "up"])
+    parser.add_argument("--stages",      type=int, default=3, help="Elaborated stages")
+    parser.add_argument("--ssr-modes",   nargs="+", type=int, default=[1, 2, 4], help="Samples per clock (1 = no SSR, 2, 4, 8)")
+    parser.add_argument("--filter-mode", default="short")
+    parser.add_argument("--ready-probabilities", nargs="+", type=float, default=[1.0, 0.5],
+                        help="Probability of source ready per cycle (1.0 = no backpressure)")
+    parser.add_argument("--samples",     type=int, default=1024, help="Input samples per run")
+    parser.add_argument("--switches",    type=int, default=4,    help="Stage count changes per run")
+    parser.add_argument("--seed",        type=int, default=0)
+    args = parser.parse_args()
+
+    failures = 0
+    for direction in args.directions:
+        for ssr in args.ssr_modes:
+            for ready_probability in args.ready_probabilities:
+                # Random walk over the stage counts
+                rng = np.random.default_rng(args.seed)
+                mux = [int(rng.integers(1, args.stages + 1))]
+                while len(mux) <= args.switches:
+                    mux.append(int(rng.choice([m for m in range(1, args.stages + 1) if m != mux[-1]])))
+                bench = RateChangeBench(direction, args.stages, ssr if ssr > 1 else False, args.filter_mode,
+                                        mux, args.samples, ready_probability, args.seed)
+                schedule = bench.schedule
+                start = time.perf_counter()
+                output = bench.run()
+                elapsed = time.perf_counter() - start
+                expected = bench.expected()
+
+                n = min(len(output), len(expected))
+                mismatches = int(np.count_nonzero(output[:n] != expected[:n]))
+                source_lanes = len(iq_fields(bench.dut.source))
+                errors = []
+                if mismatches or n == 0 or len(output) > len(expected):
+                    errors.append(f"{mismatches} mismatches, {len(output)} samples out for {len(expected)} expected")
+                if bench.completed != len(schedule) - 1:
+                    errors.append(f"{bench.completed}/{len(schedule) - 1} switches completed")
+                if any(d >= source_lanes for d in bench.flush_discard):
+                    errors.append(f"owed samples lost at the flush: {bench.flush_discard}")
+                if bench.discarded != sum(bench.flush_discard) + sum(bench.prime_discard):
+                    errors.append(f"discarded {bench.discarded}, {sum(bench.flush_discard) + sum(bench.prime_discard)} recorded")
+                failures += bool(errors)
+                print(f"{direction:<4} ssr={ssr} ready={ready_probability:.2f} mux_sel {[m for m, _ in schedule]}: "
+                      f"compared {n:5d} samples, discarded {bench.flush_discard} at flush / {bench.prime_discard} priming "
+                      f"({elapsed * 1e3:7.1f} ms)" + ("" if not errors else " FAIL: " + "; ".join(errors)))
+
+    print("PASS" if failures == 0 else f"FAIL ({failures} runs failed)")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,6 +3,7 @@ import matplotlib.pyplot as plt
 from migen import *
 from migen.sim import *
 from gateware.LimeDFB.Resampler.ResamplerNew import ResamplerNew
+from gateware.LimeDFB.sim.stream_sim import simulate_stream, iq_to_beats, beats_to_iq
 
 # 1. Stimulus Generation
 def generate_stimulus(n_samples=8192, data_width=16):
@@ -33,63 +34,7 @@ def generate_stimulus(n_samples=8192, data_width=16):
 
     return signal.real.astype(np.int64) + 1j * signal.imag.astype(np.int64)
 
-# 2. Sender Generator
-def sender(dut, stim, status):
-    idx = 0
-    while idx < len(stim):
-        # Since the input to an interpolator is always Standard mode (1 sample per cycle)
-        yield dut.sink.i.eq(int(stim[idx].real))
-        yield dut.sink.q.eq(int(stim[idx].imag))
-        yield dut.sink.valid.eq(1)
-        yield
-        if (yield dut.sink.ready) == 1:
-            idx += 1
-                
-    yield dut.sink.valid.eq(0)
-    # Flush the pipeline
-    for _ in range(200):
-        yield
-    # Signal completion
-    status["done"] = True
-    return
-
-# 3. Receiver Generator
-def receiver(dut, output_list, status):
-    while not status["done"]:
-        yield dut.source.ready.eq(1)
-        yield
-        if (yield dut.source.valid) == 1:
-            # Check if hasattr(dut.source, "i_even") to determine if the output is SSR or Standard.
-            if hasattr(dut.source, "i_even"):
-                # SSR: read i_even, q_even, i_odd, q_odd, sign extend all four, 
-                # and append two complex numbers sequentially to output_list (Even first, then Odd).
-                i_even = (yield dut.source.i_even)
-                q_even = (yield dut.source.q_even)
-                i_odd = (yield dut.source.i_odd)
-                q_odd = (yield dut.source.q_odd)
-                
-                # Sign extension (assuming 16-bit for ResamplerNew default)
-                data_width = 16
-                if i_even >= 2**(data_width - 1): i_even -= 2**data_width
-                if q_even >= 2**(data_width - 1): q_even -= 2**data_width
-                if i_odd >= 2**(data_width - 1): i_odd -= 2**data_width
-                if q_odd >= 2**(data_width - 1): q_odd -= 2**data_width
-                
-                output_list.append(complex(i_even, q_even))
-                output_list.append(complex(i_odd, q_odd))
-            else:
-                # Standard: read i and q, sign extend, and append one complex number to output_list.
-                i_out = (yield dut.source.i)
-                q_out = (yield dut.source.q)
-                
-                # Sign extension
-                data_width = 16
-                if i_out >= 2**(data_width - 1): i_out -= 2**data_width
-                if q_out >= 2**(data_width - 1): q_out -= 2**data_width
-                
-                output_list.append(complex(i_out, q_out))
-
-# 4. Main
+# 2. Main
 def main():
     stages_sweep = [1, 2, 3]
     ssr_modes = [False, True]
@@ -104,12 +49,10 @@ def main():
             
             dut = ResamplerNew(stages=stages, direction="up", ssr_mode=ssr_mode, filter_mode="long")
             stim = generate_stimulus(n_samples=2048)
-            output = []
-            status = {"done": False}
-            
-            run_simulation(dut, [sender(dut, stim, status), receiver(dut, output, status)])
+            beats = simulate_stream(dut, iq_to_beats(stim, dut.sink), flush=200)
+            output = beats_to_iq(beats, dut.source)
             
-            if not output:
+            if not len(output):
                 print(f"Warning: No output for stages={stages}, ssr_mode={ssr_mode}")
                 ax.set_title(f"Stages={stages}, SSR={ssr_mode} - NO OUTPUT")
                 continue
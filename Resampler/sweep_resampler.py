@@ -0,0 +1,162 @@
+import argparse
+import csv
+import functools
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from migen import *
+from gateware.LimeDFB.Resampler.ResamplerNew import ResamplerNew
+from gateware.LimeDFB.Resampler.half_band_model import ResamplerNewModel
+from gateware.LimeDFB.Resampler.simulate_half_band_model import generate_stimulus
+from gateware.LimeDFB.sim.stream_sim import beats_to_iq, iq_to_beats, random_pattern, simulate_stream
+
+# Parallel bit-exactness regression of ResamplerNew against the NumPy model
+# (half_band_model.py) over the direction x stages x filter_mode x ssr_mode x tap_width
+# matrix, optionally crossed with the folded, csd, register_every, rounding and saturate
+# options (folded cases are only built for decimation with ssr_mode <= 2). Every
+# configuration is an independent simulation, run in a process pool, so the sweep takes
+# about the time of the slowest case instead of the sum.
+#
+# Elaboration is cached per worker process, keyed by the configuration:
+#   - migen     : the golden model output (Migen modules can only be simulated once, and
+#                 building a ResamplerNew takes a few ms, so the RTL is rebuilt per run)
+#   - verilator : additionally the compiled simulator library, cached on disk by design hash
+#                 by VerilatorSimulator, so repeated sweeps skip the Verilator builds
+#
+# The report lists one row per configuration. The exit status is 1 if any configuration
+# mismatched the model or produced no output.
+
+FIELDS = [
+    "direction", "stages", "filter_mode", "ssr_mode", "tap_width", "folded", "csd", "register_every",
+    "rounding", "saturate", "ready_probability", "compared", "mismatches", "cycles", "runtime_ms", "status",
+]
+
+# 1. Cases
+CASE_FIELDS = FIELDS[:11]
+
+def resampler_kwargs(direction, stages, filter_mode, ssr_mode, tap_width, folded, csd, register_every,
+                     rounding, saturate, sample_width):
+    return dict(sample_width=sample_width, tap_width=tap_width, stages=stages, direction=direction,
+                filter_mode=filter_mode, ssr_mode=ssr_mode, auto_scale=True, folded=folded, csd=csd,
+                register_every=register_every, rounding=rounding, saturate=saturate)
+
+def valid_case(direction, stages, filter_mode, ssr_mode, tap_width, folded, *options):
+    # Folded mode: decimation only, stage 1 standard or 2-lane SSR (see ResamplerNew)
+    return not folded or (direction == "down" and ssr_mode in (False, 2))
+
+def options(row):
+    """Options of a report row that differ from the defaults, for the progress line."""
+    flags = [name for name in ("folded", "csd", "saturate") if row[name]]
+    if row["register_every"] != 1:
+        flags.append(f"register_every={row['register_every']}")
+    if row["rounding"] != "truncate":
+        flags.append(row["rounding"])
+    return "".join(" " + flag for flag in flags)
+
+@functools.lru_cache(maxsize=None)
+def golden(config, sample_width, samples):
+    """Model output of a configuration (cached per worker process)."""
+    kwargs = resampler_kwargs(*config, sample_width)
+    stages = kwargs["stages"]
+    stim = generate_stimulus(samples, data_width=sample_width)
+    return stim, ResamplerNewModel(**kwargs).process(stim, mux_sel=stages)
+
+def select_stages(dut, stages):
+    yield dut.mux_sel.eq(stages)
+    for _ in range(16):
+        yield
+
+# 2. Worker
+def run_case(case, args):
+    config, ready_probability = case[:-1], case[-1]
+    stages = config[1]
+    start = time.perf_counter()
+    stim, expected = golden(config, args.sample_width, args.samples)
+
+    dut = ResamplerNew(**resampler_kwargs(*config, args.sample_width))
+    ready_pattern = (1,) if ready_probability >= 1 else random_pattern(ready_probability, seed=stages)
+    flush = 64 << stages
+    if args.backend == "verilator":
+        from gateware.LimeDFB.sim.verilator_sim import VerilatorSimulator
+        simulator = VerilatorSimulator(dut)
+        beats = simulate_stream(dut, iq_to_beats(stim, dut.sink), flush=flush, ready_pattern=ready_pattern,
+                                generators=[select_stages(dut, stages)], simulator=simulator)
+        cycles = simulator.cycles
+    else:
+        beats = simulate_stream(dut, iq_to_beats(stim, dut.sink), flush=flush, ready_pattern=ready_pattern,
+                                generators=[select_stages(dut, stages)])
+        cycles = None
+    output = beats_to_iq(beats, dut.source)
+
+    n = min(len(output), len(expected))
+    mismatches = int(np.count_nonzero(output[:n] != expected[:n]))
+    return dict(zip(CASE_FIELDS, case), compared=n, mismatches=mismatches, cycles=cycles,
+                runtime_ms=(time.perf_counter() - start) * 1e3, status="PASS" if n and not mismatches else "FAIL")
+
+# 3. Main
+def main():
+    parser = argparse.ArgumentParser(description="Parallel RTL vs model regression over the ResamplerNew configuration matrix.")
+    parser.add_argument("--directions",   nargs="+", default=["down", "up"])
+    parser.add_argument("--stages",       nargs="+", type=int, default=[1, 2, 3, 4])
+    parser.add_argument("--filter-modes", nargs="+", default=["short", "long"])
+    parser.add_argument("--ssr-modes",    nargs="+", type=int, default=[1, 2], help="Samples per clock (1 = no SSR, 2, 4, 8)")
+    parser.add_argument("--tap-widths",   nargs="+", type=int, default=[16, 18])
+    parser.add_argument("--folded",       nargs="+", type=int, default=[0], help="Folded stages 2..N (0, 1)")
+    parser.add_argument("--csd",          nargs="+", type=int, default=[0], help="Shift-add taps (0, 1)")
+    parser.add_argument("--register-every", nargs="+", type=int, default=[1], help="Adder levels per register")
+    parser.add_argument("--roundings",    nargs="+", default=["truncate"], help="truncate, half_up, convergent")
+    parser.add_argument("--saturate",     nargs="+", type=int, default=[0], help="Saturating output stage (0, 1)")
+    parser.add_argument("--ready-probabilities", nargs="+", type=float, default=[1.0],
+                        help="Probability of source ready per cycle (1.0 = no backpressure)")
+    parser.add_argument("--sample-width", type=int, default=16)
+    parser.add_argument("--samples",      type=int, default=512, help="Input samples per configuration")
+    parser.add_argument("--jobs",         type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--backend",      choices=["migen", "verilator"], default="migen")
+    parser.add_argument("--format",       choices=["csv", "json"], default="csv")
+    parser.add_argument("--output",       default="-", help="Report file ('-' for stdout)")
+    args = parser.parse_args()
+
+    ssr_modes = [ssr if ssr > 1 else False for ssr in args.ssr_modes]
+    cases = [case for case in itertools.product(args.directions, args.stages, args.filter_modes, ssr_modes,
+                                                args.tap_widths, map(bool, args.folded), map(bool, args.csd),
+                                                args.register_every, args.roundings, map(bool, args.saturate),
+                                                args.ready_probabilities)
+             if valid_case(*case)]
+
+    start = time.perf_counter()
+    rows = []
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {pool.submit(run_case, case, args): case for case in cases}
+        for future in as_completed(futures):
+            row = future.result()
+            rows.append(row)
+            print(f"[{len(rows):3d}/{len(cases)}] {row['direction']:<4} stages={row['stages']} {row['filter_mode']:<5} "
+                  f"ssr={row['ssr_mode']!s:<5} tap_width={row['tap_width']}{options(row)} ready={row['ready_probability']:.2f}: "
+                  f"{row['compared']:5d} samples, {row['mismatches']} mismatches ({row['runtime_ms']:8.1f} ms)",
+                  file=sys.stderr)
+    wall_time = time.perf_counter() - start
+
+    rows.sort(key=lambda row: cases.index(tuple(row[k] for k in CASE_FIELDS)))
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    if args.format == "csv":
+        writer = csv.DictWriter(out, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: (f"{v:.3f}" if isinstance(v, float) else v) for k, v in row.items()})
+    else:
+        json.dump(rows, out, indent=2)
+    if out is not sys.stdout:
+        out.close()
+
+    failures = [row for row in rows if row["status"] != "PASS"]
+    serial_time = sum(row["runtime_ms"] for row in rows) / 1e3
+    print(f"{len(rows)} configurations in {wall_time:.1f} s ({serial_time:.1f} s serial, {args.jobs} jobs): "
+          + ("PASS" if not failures else f"FAIL ({len(failures)} configurations mismatched)"), file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
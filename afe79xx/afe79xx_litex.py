@@ -1,13 +1,16 @@
 #!/usr/bin/env python3
 from litex.soc.interconnect.stream import Endpoint, BufferizeEndpoints, DIR_SOURCE, DIR_SINK
 from types import SimpleNamespace
+import logging
+from functools import reduce
+from operator import add, and_
 from migen import *
 from litex.soc.interconnect.axi import *
 from litex.soc.interconnect.csr import *
 
 
 from litescope import LiteScopeAnalyzer
-from migen.genlib.cdc import MultiReg
+from migen.genlib.cdc import MultiReg, BusSynchronizer
 
 from gateware.LimeDFB.Resampler.ResamplerNew import ResamplerNew
 from litex.soc.interconnect import stream
@@ -675,9 +678,48 @@ class afe79xx(LiteXModule):
             for i in range(4):
                 self.comb += tx_resamplers[i].source.ready.eq(tx_mux.sink1.ready)
 
+            elaboration_time = sum(res.elaboration_time for res in rx_resamplers + tx_resamplers)
+            logging.getLogger("ResamplerNew").info(
+                f"{len(rx_resamplers + tx_resamplers)} resamplers elaborated in {elaboration_time * 1e3:.1f} ms")
+
             self.Resampler_max_value = CSRStatus(size=4, description="Maximum divider value for resampling")
             self.comb += self.Resampler_max_value.status.eq(resampling_stages)
 
+            # Rate change status of the resamplers (done when all channels of a direction have
+            # switched, discarded samples summed over the channels), synchronized from fpga_1pps to sys
+            self.resampler_status = CSRStatus(name="resampler_status", fields=[
+                CSRField("rx_rate_change_done", size=1, offset=0, description="RX resamplers run the rx_out_mux setting."),
+                CSRField("tx_rate_change_done", size=1, offset=1, description="TX resamplers run the tx_out_mux setting."),
+            ])
+            self.rx_resampler_discarded = CSRStatus(32, name="rx_resampler_discarded",
+                description="Output samples discarded by RX rate changes, sum of all channels (wraps)."
+            )
+            self.tx_resampler_discarded = CSRStatus(32, name="tx_resampler_discarded",
+                description="Output samples discarded by TX rate changes, sum of all channels (wraps)."
+            )
+            rx_discarded   = Signal(32)
+            tx_discarded   = Signal(32)
+            rx_change_done = Signal()
+            tx_change_done = Signal()
+            self.sync.fpga_1pps += [
+                rx_discarded.eq(reduce(add, [res.discarded for res in rx_resamplers])),
+                tx_discarded.eq(reduce(add, [res.discarded for res in tx_resamplers])),
+                rx_change_done.eq(reduce(and_, [res.rate_change_done for res in rx_resamplers])),
+                tx_change_done.eq(reduce(and_, [res.rate_change_done for res in tx_resamplers])),
+            ]
+            self.rx_discarded_sync = BusSynchronizer(32, "fpga_1pps", "sys")
+            self.tx_discarded_sync = BusSynchronizer(32, "fpga_1pps", "sys")
+            self.specials += [
+                MultiReg(rx_change_done, self.resampler_status.fields.rx_rate_change_done, "sys"),
+                MultiReg(tx_change_done, self.resampler_status.fields.tx_rate_change_done, "sys"),
+            ]
+            self.comb += [
+                self.rx_discarded_sync.i.eq(rx_discarded),
+                self.rx_resampler_discarded.status.eq(self.rx_discarded_sync.o),
+                self.tx_discarded_sync.i.eq(tx_discarded),
+                self.tx_resampler_discarded.status.eq(self.tx_discarded_sync.o),
+            ]
+
             tx_conv = stream.Converter(nbits_from=128, nbits_to=256)
             tx_conv = ClockDomainsRenamer(double_clk_domain.name)(tx_conv)
             self.tx_conv = tx_conv
@@ -0,0 +1,140 @@
+#
+# This file is part of LimeSDR_GW.
+#
+# Copyright (c) 2024-2025 Lime Microsystems.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+from migen import *
+
+from migen.genlib.cdc import PulseSynchronizer, BusSynchronizer
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import CSRStatus, CSRStorage, CSRField
+
+# Stream Performance Counters ----------------------------------------------------------------------
+
+class StreamPerfCounters(LiteXModule):
+    """
+    Per-boundary flow control counters for stream pipelines.
+
+    Every probe added with ``add_probe`` counts, in its own clock domain:
+        - beats  : valid & ready cycles (transfers).
+        - stalls : valid & ~ready cycles (backpressure from downstream).
+        - idle   : ~valid cycles (starvation from upstream).
+        - level  : maximum FIFO level seen (optional).
+
+    beats + stalls + idle is the number of cycles counted, so the host computes the utilization
+    of a boundary as beats / (beats + stalls + idle) without a separate cycle counter.
+
+    Usage (host):
+        control = 0b11 # snapshot the running counters and clear them.
+        ... wait for the measurement interval ...
+        control = 0b11
+        read <probe>_beats, <probe>_stalls, <probe>_idle, <probe>_level
+
+    The snapshot registers are written in the probe clock domain and moved to sys by a
+    BusSynchronizer (request/acknowledge handshake) per register, so the status registers follow
+    a snapshot a few probe and sys clock cycles after the request; read them after that.
+    Counters wrap at 2**width cycles (~17 s at 250 MHz with the default width).
+    """
+    def __init__(self, width=32):
+        self.width   = width
+        self.probes  = []
+
+        self.control = CSRStorage(name="control", fields=[
+            CSRField("snapshot", size=1, offset=0, pulse=True,
+                description="Write 1 to copy the running counters to the status registers."),
+            CSRField("clear",    size=1, offset=1, pulse=True,
+                description="Write 1 to clear the running counters (after the snapshot when both are set)."),
+        ])
+
+        # # #
+
+        self._controls = {}
+
+    def _control(self, clock_domain):
+        # Snapshot/Clear pulses in clock_domain (one synchronizer pair per domain).
+        if clock_domain not in self._controls:
+            if clock_domain == "sys":
+                self._controls[clock_domain] = (self.control.fields.snapshot, self.control.fields.clear)
+            else:
+                ps_snapshot = PulseSynchronizer("sys", clock_domain)
+                ps_clear    = PulseSynchronizer("sys", clock_domain)
+                setattr(self, f"ps_snapshot_{clock_domain}", ps_snapshot)
+                setattr(self, f"ps_clear_{clock_domain}",    ps_clear)
+                self.comb += [
+                    ps_snapshot.i.eq(self.control.fields.snapshot),
+                    ps_clear.i.eq(   self.control.fields.clear),
+                ]
+                self._controls[clock_domain] = (ps_snapshot.o, ps_clear.o)
+        return self._controls[clock_domain]
+
+    def _status(self, name, value, clock_domain, description):
+        # CSRStatus of a snapshot register of clock_domain, synchronized to sys.
+        csr = CSRStatus(len(value), name=name, description=description)
+        setattr(self, name, csr)
+        if clock_domain == "sys":
+            self.comb += csr.status.eq(value)
+        else:
+            bus_sync = BusSynchronizer(len(value), clock_domain, "sys")
+            setattr(self, f"{name}_sync", bus_sync)
+            self.comb += [
+                bus_sync.i.eq(value),
+                csr.status.eq(bus_sync.o),
+            ]
+
+    def add_probe(self, name, valid, ready, level=None, clock_domain="sys"):
+        """Count the valid/ready handshake (and optionally the max of level) of a stream boundary."""
+        snapshot, clear = self._control(clock_domain)
+
+        beats  = Signal(self.width)
+        stalls = Signal(self.width)
+        idle   = Signal(self.width)
+
+        # Snapshot registers (clock_domain).
+        snap_beats  = Signal(self.width)
+        snap_stalls = Signal(self.width)
+        snap_idle   = Signal(self.width)
+
+        self._status(f"{name}_beats",  snap_beats,  clock_domain, f"{name}: valid & ready cycles.")
+        self._status(f"{name}_stalls", snap_stalls, clock_domain, f"{name}: valid & ~ready cycles.")
+        self._status(f"{name}_idle",   snap_idle,   clock_domain, f"{name}: ~valid cycles.")
+
+        sync = getattr(self.sync, clock_domain)
+        sync += [
+            If(snapshot,
+                snap_beats.eq( beats),
+                snap_stalls.eq(stalls),
+                snap_idle.eq(  idle),
+            ),
+            If(clear,
+                beats.eq( 0),
+                stalls.eq(0),
+                idle.eq(  0),
+            ).Elif(valid & ready,
+                beats.eq(beats + 1),
+            ).Elif(valid,
+                stalls.eq(stalls + 1),
+            ).Else(
+                idle.eq(idle + 1),
+            ),
+        ]
+
+        if level is not None:
+            max_level  = Signal(len(level))
+            snap_level = Signal(len(level))
+            self._status(f"{name}_level", snap_level, clock_domain, f"{name}: maximum FIFO level.")
+            sync += [
+                If(snapshot,
+                    snap_level.eq(max_level),
+                ),
+                If(clear,
+                    max_level.eq(0),
+                ).Elif(level > max_level,
+                    max_level.eq(level),
+                ),
+            ]
+
+        self.probes.append(name)
@@ -0,0 +1,161 @@
+#
+# This file is part of LimeSDR_GW.
+#
+# Copyright (c) 2024-2025 Lime Microsystems.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+from migen import *
+
+from migen.genlib.cdc import MultiReg
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import CSRStatus, CSRStorage, CSRField
+from litex.soc.interconnect     import stream
+
+# Timed Stream Gate --------------------------------------------------------------------------------
+
+class TimedStreamGate(LiteXModule):
+    """
+    Opens a stream for scheduled bursts.
+
+    Software queues bursts as (timestamp, length) entries. The gate takes the next entry, stays
+    closed until ``time`` reaches its timestamp, then passes ``length`` beats (0: until disabled)
+    and takes the next entry. Bursts whose timestamp already passed start immediately.
+
+    While closed, the sink is either dropped (drop=True, e.g. RX samples that cannot be held)
+    or held (drop=False, e.g. TX samples waiting in the packet buffers). With control.enable=0
+    the gate is transparent and the queue is discarded.
+
+    Usage (host):
+        control.enable = 1
+        timestamp      = N
+        length         = M
+        control.push   = 1  # Queue the burst (repeat for more, up to queue_depth entries).
+
+    ``start`` pulses (in clock_domain) on the first cycle of each burst, with the burst
+    timestamp on ``start_time``.
+    """
+    def __init__(self, layout, clock_domain="sys", time_width=64, length_width=32, queue_depth=16, drop=False):
+        self.sink       = stream.Endpoint(layout)
+        self.source     = stream.Endpoint(layout)
+
+        self.time       = Signal(time_width)
+        self.start      = Signal()
+        self.start_time = Signal(time_width)
+
+        self.control = CSRStorage(name="control", fields=[
+            CSRField("enable", size=1, offset=0,
+                description="Gate the stream with the queued bursts (0: transparent, queue discarded)."),
+            CSRField("push",   size=1, offset=1, pulse=True,
+                description="Write 1 to queue a burst with the timestamp/length registers."),
+        ])
+        self.timestamp = CSRStorage(time_width, name="timestamp",
+            description="Burst start time (sample number)."
+        )
+        self.length = CSRStorage(length_width, name="length",
+            description="Burst length in beats (0: until the gate is disabled)."
+        )
+        self.status = CSRStatus(name="status", fields=[
+            CSRField("running", size=1, offset=0, description="A burst is being passed."),
+            CSRField("full",    size=1, offset=1, description="The burst queue is full, pushes are lost."),
+        ])
+
+        # # #
+
+        # Burst Queue (sys -> clock_domain).
+        queue_layout = [("timestamp", time_width), ("length", length_width)]
+        if clock_domain == "sys":
+            self.queue = queue = stream.SyncFIFO(queue_layout, queue_depth)
+        else:
+            self.queue = queue = stream.ClockDomainCrossing(queue_layout,
+                cd_from = "sys",
+                cd_to   = clock_domain,
+                depth   = queue_depth,
+            )
+        self.comb += [
+            queue.sink.valid.eq(    self.control.fields.push),
+            queue.sink.timestamp.eq(self.timestamp.storage),
+            queue.sink.length.eq(   self.length.storage),
+            self.status.fields.full.eq(~queue.sink.ready),
+        ]
+
+        # Control/Status CDC.
+        enable  = Signal()
+        running = Signal()
+        if clock_domain == "sys":
+            self.comb += [
+                enable.eq(self.control.fields.enable),
+                self.status.fields.running.eq(running),
+            ]
+        else:
+            self.specials += [
+                MultiReg(self.control.fields.enable, enable, odomain=clock_domain),
+                MultiReg(running, self.status.fields.running, odomain="sys"),
+            ]
+
+        # Burst FSM.
+        timestamp = Signal(time_width)
+        length    = Signal(length_width)
+        remaining = Signal(length_width)
+        fire      = Signal()
+        opened    = Signal()
+        beat      = Signal()
+        done      = Signal()
+
+        self.comb += [
+            fire.eq(self.time >= timestamp),
+            beat.eq(self.source.valid & self.source.ready),
+            done.eq(beat & (length != 0) & (remaining == 1)),
+            self.start_time.eq(timestamp),
+        ]
+
+        fsm = ResetInserter()(FSM(reset_state="IDLE"))
+        fsm = ClockDomainsRenamer(clock_domain)(fsm)
+        self.fsm = fsm
+        self.comb += fsm.reset.eq(~enable)
+        fsm.act("IDLE",
+            queue.source.ready.eq(1),
+            If(queue.source.valid,
+                NextValue(timestamp, queue.source.timestamp),
+                NextValue(length,    queue.source.length),
+                NextValue(remaining, queue.source.length),
+                NextState("WAIT"),
+            )
+        )
+        fsm.act("WAIT",
+            # Open in the cycle time reaches timestamp, so the burst starts at that sample.
+            If(fire,
+                opened.eq(1),
+                self.start.eq(1),
+                If(done,
+                    NextState("IDLE"),
+                ).Else(
+                    NextState("RUN"),
+                )
+            )
+        )
+        fsm.act("RUN",
+            opened.eq(1),
+            running.eq(1),
+            If(done,
+                NextState("IDLE"),
+            )
+        )
+        self.comb += If(~enable, queue.source.ready.eq(1))
+
+        sync = getattr(self.sync, clock_domain)
+        sync += If(beat & ~fsm.ongoing("IDLE"), remaining.eq(remaining - 1))
+
+        # Gating.
+        self.comb += [
+            self.sink.connect(self.source, omit=["valid", "ready"]),
+            If(~enable | opened,
+                self.source.valid.eq(self.sink.valid),
+                self.sink.ready.eq(self.source.ready),
+            ).Else(
+                self.source.valid.eq(0),
+                self.sink.ready.eq(int(drop)),
+            )
+        ]
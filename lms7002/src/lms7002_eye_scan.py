@@ -0,0 +1,224 @@
+#
+# This file is part of LimeSDR_GW.
+#
+# Copyright (c) 2024-2025 Lime Microsystems.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+from migen import *
+from migen.genlib.cdc import MultiReg
+
+from litex.gen import *
+
+from litex.soc.interconnect.csr import *
+
+# LMS7002 Eye Scan ---------------------------------------------------------------------------------
+
+class LMS7002EyeScan(LiteXModule):
+    """
+    On-chip eye scan and delay calibration of the LMS7002DDIN input delays (DELAYF).
+
+    On a rising edge of control.start the engine loads the default delay (loadn) and, for each
+    of the `taps` delay taps, runs one smpl_cmp compare (cmp_en low then high, wait cmp_done)
+    before moving one tap up (move pulse, direction 0). The pass (1) / fail (0) result of each
+    tap is stored in the eye map RAM, 32 taps per word (tap 32*k + i in bit i of word k), and
+    the longest run of passing taps is tracked on the fly. At the end of the sweep the delay is
+    loaded again and moved to the centre of that window; without any passing tap the default
+    delay is kept and status.error is set.
+
+    The loadn/move pulses and the wait after them last `pulse_cycles` clocks, as in delayf_ctrl.
+    The engine runs in clk_domain (the smpl_cmp/DELAYF clock domain), the CSRs and the eye map
+    read port in sys; while status.busy is set the owner must give the engine control of the
+    delays and of smpl_cmp.
+    """
+    def __init__(self, taps=128, pulse_cycles=16, clk_domain="lms_rx"):
+        assert taps % 32 == 0 and taps < 256
+
+        # Delay control.
+        self.loadn     = Signal(reset=1)
+        self.move      = Signal()
+        self.direction = Signal()
+
+        # Sample compare.
+        self.cmp_en    = Signal()
+        self.cmp_done  = Signal()
+        self.cmp_error = Signal()
+
+        self.busy      = Signal()
+
+        # CSR --------------------------------------------------------------------------------------
+        self.control = CSRStorage(name="control", fields=[
+            CSRField("start", size=1, offset=0, description="0 to 1 transition: start the eye scan."),
+        ])
+        self.status = CSRStatus(name="status", fields=[
+            CSRField("busy",  size=1, offset=0, description="Eye scan in progress."),
+            CSRField("done",  size=1, offset=1, description="Eye scan done (cleared on start)."),
+            CSRField("error", size=1, offset=2, description="No passing tap, default delay kept."),
+        ])
+        self.window = CSRStatus(name="window", fields=[
+            CSRField("start",  size=8, offset=0,  description="First tap of the widest passing window."),
+            CSRField("width",  size=8, offset=8,  description="Width of the widest passing window (taps)."),
+            CSRField("centre", size=8, offset=16, description="Tap the delay was set to."),
+        ])
+        self.eye_addr = CSRStorage(bits_for(taps//32 - 1), name="eye_addr", description="Eye map word address.")
+        self.eye_data = CSRStatus(32, name="eye_data", description="Eye map word (tap 32*addr + i in bit i, 1: pass).")
+
+        # # #
+
+        sync = getattr(self.sync, clk_domain)
+
+        # Signals.
+        start        = Signal()
+        start_d      = Signal()
+        done         = Signal()
+        error        = Signal()
+        timer        = Signal(max=pulse_cycles + 1)
+        tap          = Signal(max=taps)
+        moves        = Signal(max=taps)
+        word         = Signal(32)
+        run_start    = Signal(max=taps)
+        run_width    = Signal(max=taps + 1)
+        best_start   = Signal(max=taps)
+        best_width   = Signal(max=taps + 1)
+        centre       = Signal(max=taps)
+        passed       = Signal()
+
+        # Eye Map.
+        self.specials.mem = mem = Memory(32, taps//32)
+        wr_port = mem.get_port(write_capable=True, clock_domain=clk_domain)
+        rd_port = mem.get_port(clock_domain="sys")
+        self.specials += wr_port, rd_port
+        self.comb += [
+            wr_port.adr.eq(tap[5:]),
+            wr_port.dat_w.eq(Cat(word[1:], passed)),
+            rd_port.adr.eq(self.eye_addr.storage),
+            self.eye_data.status.eq(rd_port.dat_r),
+        ]
+
+        # CDC.
+        self.specials += [
+            MultiReg(self.control.fields.start, start,                           odomain=clk_domain),
+            MultiReg(self.busy,                 self.status.fields.busy,         odomain="sys"),
+            MultiReg(done,                      self.status.fields.done,         odomain="sys"),
+            MultiReg(error,                     self.status.fields.error,        odomain="sys"),
+            MultiReg(best_start,                self.window.fields.start,        odomain="sys"),
+            MultiReg(best_width,                self.window.fields.width,        odomain="sys"),
+            MultiReg(centre,                    self.window.fields.centre,       odomain="sys"),
+        ]
+        sync += start_d.eq(start)
+
+        # FSM.
+        self.comb += [
+            self.direction.eq(0),
+            passed.eq(~self.cmp_error),
+        ]
+        self.fsm = fsm = ClockDomainsRenamer(clk_domain)(FSM(reset_state="IDLE"))
+        fsm.act("IDLE",
+            If(start & ~start_d,
+                NextValue(done,       0),
+                NextValue(error,      0),
+                NextValue(tap,        0),
+                NextValue(run_width,  0),
+                NextValue(best_start, 0),
+                NextValue(best_width, 0),
+                NextValue(timer,      pulse_cycles),
+                NextState("LOAD")
+            )
+        )
+        # Sweep: default delay, then one compare per tap.
+        fsm.act("LOAD",
+            self.busy.eq(1),
+            self.loadn.eq(0),
+            NextValue(timer, timer - 1),
+            If(timer == 0,
+                NextValue(timer, pulse_cycles),
+                NextState("SETTLE")
+            )
+        )
+        fsm.act("SETTLE",
+            self.busy.eq(1),
+            NextValue(timer, timer - 1),
+            If(timer == 0,
+                NextState("COMPARE")
+            )
+        )
+        fsm.act("COMPARE",
+            self.busy.eq(1),
+            self.cmp_en.eq(1),
+            If(self.cmp_done,
+                wr_port.we.eq(tap[:5] == 31),
+                NextValue(word, Cat(word[1:], passed)),
+                If(passed,
+                    NextValue(run_width, run_width + 1),
+                    If(run_width == 0,
+                        NextValue(run_start, tap),
+                    ),
+                    If(run_width + 1 > best_width,
+                        NextValue(best_start, Mux(run_width == 0, tap, run_start)),
+                        NextValue(best_width, run_width + 1),
+                    )
+                ).Else(
+                    NextValue(run_width, 0),
+                ),
+                NextValue(timer, pulse_cycles),
+                If(tap == taps - 1,
+                    NextState("CENTRE")
+                ).Else(
+                    NextValue(tap, tap + 1),
+                    NextState("MOVE")
+                )
+            )
+        )
+        fsm.act("MOVE",
+            self.busy.eq(1),
+            self.move.eq(1),
+            NextValue(timer, timer - 1),
+            If(timer == 0,
+                NextValue(timer, pulse_cycles),
+                NextState("SETTLE")
+            )
+        )
+        # Centre: default delay, then move to the middle of the widest window.
+        fsm.act("CENTRE",
+            self.busy.eq(1),
+            NextValue(centre, best_start + (best_width >> 1)),
+            NextValue(moves,  best_start + (best_width >> 1)),
+            NextValue(error,  best_width == 0),
+            If(best_width == 0,
+                NextValue(centre, 0),
+                NextValue(moves,  0),
+            ),
+            NextState("CENTRE-LOAD")
+        )
+        fsm.act("CENTRE-LOAD",
+            self.busy.eq(1),
+            self.loadn.eq(0),
+            NextValue(timer, timer - 1),
+            If(timer == 0,
+                NextValue(timer, pulse_cycles),
+                NextState("CENTRE-WAIT")
+            )
+        )
+        fsm.act("CENTRE-WAIT",
+            self.busy.eq(1),
+            NextValue(timer, timer - 1),
+            If(timer == 0,
+                NextValue(timer, pulse_cycles),
+                If(moves == 0,
+                    NextValue(done, 1),
+                    NextState("IDLE")
+                ).Else(
+                    NextValue(moves, moves - 1),
+                    NextState("CENTRE-MOVE")
+                )
+            )
+        )
+        fsm.act("CENTRE-MOVE",
+            self.busy.eq(1),
+            self.move.eq(1),
+            NextValue(timer, timer - 1),
+            If(timer == 0,
+                NextValue(timer, pulse_cycles),
+                NextState("CENTRE-WAIT")
+            )
+        )
@@ -21,9 +21,10 @@ from litex.soc.interconnect.csr            import *
 
 from gateware.common                                  import add_vhd2v_converter
 
-from gateware.LimeDFB.lms7002.src.lms7002_ddin  import LMS7002DDIN
-from gateware.LimeDFB.lms7002.src.lms7002_ddout import LMS7002DDOUT
-from gateware.LimeDFB.lms7002.src.lms7002_clk   import LMS7002CLK
+from gateware.LimeDFB.lms7002.src.lms7002_ddin     import LMS7002DDIN
+from gateware.LimeDFB.lms7002.src.lms7002_ddout    import LMS7002DDOUT
+from gateware.LimeDFB.lms7002.src.lms7002_clk      import LMS7002CLK
+from gateware.LimeDFB.lms7002.src.lms7002_eye_scan import LMS7002EyeScan
 
 # LMS7002 Top --------------------------------------------------------------------------------------
 
@@ -38,6 +39,7 @@ class LMS7002Top(LiteXModule):
         m_clk_domain         = "lms_rx",
         m_axis_rx_fifo_words = 16,
         with_max10_pll       = False,
+        with_eye_scan        = False,
         ):
 
         assert pads            is not None
@@ -164,6 +166,7 @@ class LMS7002Top(LiteXModule):
         tx_tst_data_en      = Signal()
 
         smpl_cmp_en         = Signal()
+        smpl_cmp_en_mux     = Signal()
         smpl_cmp_done       = Signal()
         smpl_cmp_error      = Signal()
         smpl_cmp_cnt        = Signal(16)
@@ -331,14 +334,14 @@ class LMS7002Top(LiteXModule):
 
             # Clk/Reset.
             i_clk           = ClockSignal("lms_rx"),
-            i_reset_n       = smpl_cmp_en,
+            i_reset_n       = smpl_cmp_en_mux,
 
             # DIQ bus.
             i_diq_h         = self.lms7002_ddin.rx_diq2_h,
             i_diq_l         = self.lms7002_ddin.rx_diq2_l,
 
             # Control signals
-            i_cmp_start     = smpl_cmp_en,
+            i_cmp_start     = smpl_cmp_en_mux,
             i_cmp_length    = rx_smpl_cmp_length,
             o_cmp_done      = smpl_cmp_done,
             o_cmp_error     = smpl_cmp_error,
@@ -536,6 +539,7 @@ class LMS7002Top(LiteXModule):
                 self.lms7002_ddin.data_loadn.eq(1),
                 self.lms7002_ddin.data_move.eq (0),
             ),
+            smpl_cmp_en_mux.eq(smpl_cmp_en),
             # Pads.
             self.pads.CORE_LDO_EN.eq(self.lms1.fields.core_ldo_en),
             self.pads.TXNRX1.eq(     self.lms1.fields.txnrx1),
@@ -549,6 +553,20 @@ class LMS7002Top(LiteXModule):
             ),
         ]
 
+        # Eye scan / delay calibration (takes over the RX delays and smpl_cmp while busy).
+        if with_eye_scan:
+            self.eye_scan = LMS7002EyeScan(clk_domain="lms_rx")
+            self.comb += [
+                self.eye_scan.cmp_done.eq( smpl_cmp_done),
+                self.eye_scan.cmp_error.eq(smpl_cmp_error),
+                If(self.eye_scan.busy,
+                    self.lms7002_ddin.data_loadn.eq(    self.eye_scan.loadn),
+                    self.lms7002_ddin.data_move.eq(     self.eye_scan.move),
+                    self.lms7002_ddin.data_direction.eq(self.eye_scan.direction),
+                    smpl_cmp_en_mux.eq(                 self.eye_scan.cmp_en),
+                )
+            ]
+
         # RX sync
         if platform.name.startswith("limesdr_mini"):
             self.sync.lms_rx += [
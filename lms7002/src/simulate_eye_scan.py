@@ -0,0 +1,154 @@
+#
+# This file is part of LimeSDR_GW.
+#
+# Copyright (c) 2024-2025 Lime Microsystems.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Testbench of LMS7002EyeScan (eye scan and delay calibration engine).
+
+The DELAYF and smpl_cmp blocks are replaced by a stub in the engine clock domain: loadn resets
+the delay to tap 0, a falling edge of move moves it one tap up, and cmp_done/cmp_error answer
+each compare (cmp_en rising) a few clocks later with the pass/fail pattern of the scenario at
+the current tap. For each pattern (one window, windows at either end of the sweep, several
+windows, no passing tap) the host starts the scan from sys, waits for status.done and checks:
+  - the eye map words read through eye_addr/eye_data (tap 32*k + i in bit i of word k),
+  - window.start/width (first widest run of passing taps) and window.centre,
+  - status.error (no passing tap) and the tap the stub delay is left at (the centre),
+  - one compare per tap.
+
+Example:
+    python3 -m gateware.LimeDFB.lms7002.src.simulate_eye_scan --cmp-cycles 20
+"""
+
+import argparse
+
+from migen import *
+
+from gateware.LimeDFB.lms7002.src.lms7002_eye_scan import LMS7002EyeScan
+
+TAPS = 128
+
+# Pass windows [start, stop) of each scenario.
+SCENARIOS = {
+    "centre"      : [(40, 70)],
+    "first_taps"  : [(0, 10)],
+    "last_taps"   : [(100, 128)],
+    "none"        : [],
+    "two_windows" : [(5, 8), (60, 90)],
+    "equal_width" : [(10, 20), (50, 60)],
+    "all"         : [(0, 128)],
+}
+
+# Reference Model ----------------------------------------------------------------------------------
+
+def eye_map(windows):
+    return [any(start <= tap < stop for start, stop in windows) for tap in range(TAPS)]
+
+def expected_window(passes):
+    """(start, width, centre, error) of the first widest run of passing taps."""
+    best_start = best_width = width = 0
+    for tap, passed in enumerate(passes):
+        width = width + 1 if passed else 0
+        if width > best_width:
+            best_start, best_width = tap - width + 1, width
+    if best_width == 0:
+        return 0, 0, 0, 1
+    return best_start, best_width, best_start + best_width//2, 0
+
+# Simulation ---------------------------------------------------------------------------------------
+
+class EyeScanBench(Module):
+    def __init__(self, pulse_cycles):
+        self.clock_domains.cd_sys    = ClockDomain("sys")
+        self.clock_domains.cd_lms_rx = ClockDomain("lms_rx")
+        self.submodules.eye_scan = LMS7002EyeScan(taps=TAPS, pulse_cycles=pulse_cycles, clk_domain="lms_rx")
+
+def run(windows, pulse_cycles, cmp_cycles, max_cycles):
+    bench  = EyeScanBench(pulse_cycles)
+    dut    = bench.eye_scan
+    passes = eye_map(windows)
+    state  = dict(tap=0, compares=0)
+    result = {}
+
+    @passive
+    def delay_and_compare():
+        move_d = cmp_en_d = 0
+        count  = 0
+        while True:
+            loadn, move, cmp_en = yield [dut.loadn, dut.move, dut.cmp_en]
+            if not loadn:
+                state["tap"] = 0
+            if move_d and not move:
+                state["tap"] = min(state["tap"] + 1, TAPS - 1)
+            if not cmp_en:
+                count = 0
+                yield [dut.cmp_done.eq(0), dut.cmp_error.eq(0)]
+            else:
+                state["compares"] += not cmp_en_d
+                count += 1
+                if count == cmp_cycles:
+                    yield [dut.cmp_done.eq(1), dut.cmp_error.eq(not passes[state["tap"]])]
+            move_d, cmp_en_d = move, cmp_en
+            yield
+
+    def host():
+        for _ in range(10):
+            yield
+        yield dut.control.fields.start.eq(1)
+        for _ in range(10):
+            yield
+        for _ in range(max_cycles):
+            if (yield dut.status.fields.done):
+                break
+            yield
+        result["status"] = yield [dut.status.fields.done, dut.status.fields.busy, dut.status.fields.error]
+        result["window"] = yield [dut.window.fields.start, dut.window.fields.width, dut.window.fields.centre]
+        words = []
+        for addr in range(TAPS//32):
+            yield dut.eye_addr.storage.eq(addr)
+            for _ in range(3):
+                yield
+            words.append((yield dut.eye_data.status))
+        result["words"] = words
+
+    run_simulation(bench, {"sys": [host()], "lms_rx": [delay_and_compare()]}, clocks={"sys": 10, "lms_rx": 8})
+
+    start, width, centre, error = expected_window(passes)
+    words  = [sum(passes[32*k + i] << i for i in range(32)) for k in range(TAPS//32)]
+    errors = []
+    if result["status"] != [1, 0, error]:
+        errors.append(f"status done/busy/error {result['status']}, expected [1, 0, {error}]")
+    if result["window"] != [start, width, centre]:
+        errors.append(f"window start/width/centre {result['window']}, expected {[start, width, centre]}")
+    if result["words"] != words:
+        errors.append("eye map " + " ".join(f"{w:08x}" for w in result["words"]))
+    if state["tap"] != centre:
+        errors.append(f"delay left at tap {state['tap']}, expected {centre}")
+    if state["compares"] != TAPS:
+        errors.append(f"{state['compares']} compares for {TAPS} taps")
+    return (start, width, centre, error), errors
+
+# Main ---------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="LMS7002EyeScan eye map and window testbench.")
+    parser.add_argument("--scenarios",    nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--pulse-cycles", type=int, default=16, help="loadn/move pulse and settle clocks")
+    parser.add_argument("--cmp-cycles",   type=int, default=20, help="Clocks from cmp_en to cmp_done")
+    parser.add_argument("--max-cycles",   type=int, default=50000)
+    args = parser.parse_args()
+
+    failures = 0
+    for name in args.scenarios:
+        (start, width, centre, error), errors = run(SCENARIOS[name], args.pulse_cycles, args.cmp_cycles, args.max_cycles)
+        failures += bool(errors)
+        print(f"{name:>12s}: window start {start:3d} width {width:3d} centre {centre:3d} error {error}"
+              + ("" if not errors else " FAIL: " + "; ".join(errors)))
+
+    print("PASS" if failures == 0 else f"FAIL ({failures} runs failed)")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
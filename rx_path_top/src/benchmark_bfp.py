@@ -0,0 +1,168 @@
+#
+# This file is part of LimeSDR_GW.
+#
+# Copyright (c) 2024-2025 Lime Microsystems.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Throughput and SNR benchmark of the RX BFP8 compression (see block_floating_point.py).
+
+Per signal level (dBFS, complex tone plus noise from the 12-bit LMS7002 ADC, left aligned in
+the 16-bit sample words) and sample format it reports:
+  - snr_db             : SNR of the received samples against the unquantized signal (the
+                         12/16-bit formats carry the ADC samples unchanged)
+  - bytes_per_sample   : link bytes per IQ sample, packet headers included
+  - max_rate_msps      : maximum sample rate per channel over --link-mbytes for --channels
+
+With --rtl, BlockFloatingPoint + ChannelPacker are also simulated for 1, 2 and 4 channels and
+their output is compared to bfp_encode (bit exact), with the sink valid every cycle and the
+source always ready or randomly ready; the sink accept rate is reported as samples per clock.
+
+Example:
+    python3 -m gateware.LimeDFB.rx_path_top.src.benchmark_bfp --channels 2 --rtl
+"""
+
+import argparse
+import csv
+import json
+import sys
+
+import numpy as np
+
+from migen import *
+
+from gateware.LimeDFB.rx_path_top.src.block_floating_point import (
+    BlockFloatingPoint, BFP_BLOCK, bfp_encode, bfp_decode,
+)
+from gateware.LimeDFB.rx_path_top.src.rx_path_top import ChannelPacker
+from gateware.LimeDFB.sim.stream_sim import StreamDriver, StreamMonitor, random_pattern
+
+FIELDS = ["format", "level_dbfs", "snr_db", "bytes_per_sample", "max_rate_msps"]
+
+FORMATS = {
+    "16-bit": 4.0,
+    "12-bit": 3.0,
+    "bfp8"  : 2.0 * (BFP_BLOCK + 1) / BFP_BLOCK,
+}
+
+# Signal Model -------------------------------------------------------------------------------------
+
+def test_signal(level_dbfs, beats, channels, seed=0):
+    """Complex tone at level_dbfs plus -70 dBc noise per channel: (float, 16-bit ADC words)."""
+    rng  = np.random.default_rng(seed)
+    n    = np.arange(beats)[:, None]
+    amp  = 2047 * 10 ** (level_dbfs / 20)
+    freq = 0.0123 * (1 + np.arange(channels))[None, :]
+    x    = amp * np.exp(2j * np.pi * freq * n)
+    x   += amp * 10 ** (-70 / 20) * (rng.standard_normal(x.shape) + 1j * rng.standard_normal(x.shape)) / np.sqrt(2)
+    adc  = np.clip(np.round(x.real), -2048, 2047) + 1j * np.clip(np.round(x.imag), -2048, 2047)
+    return x * 16, adc * 16
+
+
+def snr_db(reference, received):
+    error = received - reference
+    return 10 * np.log10(np.sum(np.abs(reference) ** 2) / np.sum(np.abs(error) ** 2))
+
+
+def snr_table(levels, channels, link_mbytes, pkt_size, beats=BFP_BLOCK * 1000):
+    # Packet overhead: one 16-byte header per pkt_size - 1 payload words.
+    overhead = pkt_size / (pkt_size - 1)
+    rows = []
+    for level in levels:
+        x, adc = test_signal(level, beats, channels)
+        for name, bytes_per_sample in FORMATS.items():
+            received = bfp_decode(bfp_encode(adc), channels) if name == "bfp8" else adc
+            rows.append(dict(
+                format           = name,
+                level_dbfs       = level,
+                snr_db           = snr_db(x[:len(received)], received),
+                bytes_per_sample = bytes_per_sample * overhead,
+                max_rate_msps    = link_mbytes / (bytes_per_sample * overhead * channels),
+            ))
+    return rows
+
+# RTL Check ----------------------------------------------------------------------------------------
+
+class BFPBench(Module):
+    def __init__(self, ch_en):
+        self.submodules.bfp    = bfp    = BlockFloatingPoint(Constant(ch_en, 4))
+        self.submodules.packer = packer = ChannelPacker(Constant(ch_en, 4))
+        self.comb += [
+            bfp.enable.eq(1),
+            packer.bfp.eq(1),
+            bfp.source.connect(packer.sink),
+        ]
+        self.sink   = bfp.sink
+        self.source = packer.source
+
+
+def rtl_check(ch_en, blocks=64, ready_probability=1.0, seed=0):
+    """Simulates BlockFloatingPoint + ChannelPacker, returns (bit exact, samples per clock)."""
+    channels = [i for i in range(4) if (ch_en >> i) & 1]
+    rng   = np.random.default_rng(seed)
+    beats = blocks * BFP_BLOCK
+    # Per block level from -60 dBFS to full scale, disabled channel slots at full scale.
+    scale = np.repeat(2 ** rng.uniform(3, 15, blocks), BFP_BLOCK)[:, None]
+    iq    = np.clip(np.round(scale * (rng.uniform(-1, 1, (beats, 4)) + 1j * rng.uniform(-1, 1, (beats, 4)))),
+                    -32768, 32767)
+    iq[:, [i for i in range(4) if i not in channels]] = 32767 - 32768j
+    words = [sum(((int(s.real) & 0xffff) | (int(s.imag) & 0xffff) << 16) << (32 * i) for i, s in enumerate(row))
+             for row in iq]
+
+    bench   = BFPBench(ch_en)
+    driver  = StreamDriver(bench.sink, np.array([[w, 2**16 - 1] for w in words], dtype=object), fields=["data", "keep"])
+    expect  = bfp_encode(iq[:, channels])
+    monitor = StreamMonitor(bench.source, fields=["data", "last"], signed=[], count=len(expect) // 16,
+                            ready_pattern=random_pattern(ready_probability, seed=seed))
+    run_simulation(bench, [driver.generator(), monitor.generator()])
+
+    data = monitor.data
+    out  = np.frombuffer(b"".join(int(w).to_bytes(16, "little") for w in data[:, 0]), dtype=np.uint8)
+    last = [k for k, v in enumerate(data[:, 1]) if v]
+    words_per_block = 2 * len(channels)
+    exact = (np.array_equal(out, expect) and
+             last == list(range(words_per_block - 1, len(data), words_per_block)))
+    return exact, beats * len(channels) / driver.cycles
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and SNR benchmark of the RX BFP8 compression.")
+    parser.add_argument("--levels",      nargs="+", type=float, default=[0, -6, -20, -40, -60], help="Signal levels (dBFS)")
+    parser.add_argument("--channels",    type=int,   default=2,     help="Enabled channels")
+    parser.add_argument("--link-mbytes", type=float, default=400.0, help="Link throughput (MB/s, e.g. FT601)")
+    parser.add_argument("--pkt-size",    type=int,   default=256,   help="Packet size in 128-bit words (header included)")
+    parser.add_argument("--rtl",         action="store_true", help="Check the gateware against the model")
+    parser.add_argument("--format",      choices=["csv", "json"], default="csv")
+    parser.add_argument("--output",      default="-", help="Output file ('-' for stdout)")
+    args = parser.parse_args()
+
+    rows = snr_table(args.levels, args.channels, args.link_mbytes, args.pkt_size)
+    for row in rows:
+        print(f"{row['format']:>6s} {row['level_dbfs']:6.1f} dBFS: SNR {row['snr_db']:5.1f} dB, "
+              f"{row['bytes_per_sample']:.2f} B/sample, {row['max_rate_msps']:6.1f} MSPS x {args.channels}",
+              file=sys.stderr)
+
+    if args.rtl:
+        for ch_en in [0b0001, 0b0101, 0b1111]:
+            for ready_probability in [1.0, 0.5]:
+                exact, rate = rtl_check(ch_en, ready_probability=ready_probability)
+                print(f"RTL ch_en=0b{ch_en:04b} ready={ready_probability:.2f}: "
+                      f"{'bit exact' if exact else 'MISMATCH'}, {rate:.2f} samples/clk", file=sys.stderr)
+                if not exact:
+                    sys.exit(1)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    if args.format == "csv":
+        writer = csv.DictWriter(out, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: (f"{v:.3f}" if isinstance(v, float) else v) for k, v in row.items()})
+    else:
+        json.dump(rows, out, indent=2)
+    if out is not sys.stdout:
+        out.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+#
+# This file is part of LimeSDR_GW.
+#
+# Copyright (c) 2024-2025 Lime Microsystems.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Throughput and backpressure benchmark of the RXPathTop packetization pipeline.
+
+    sink -> ChannelCombiner -> BitwidthSelector -> Data2PacketsFSM -> Converter(128, source_width)
+         -> source_ep_cdc -> source
+
+RXPathTop is simulated cycle by cycle with the Migen simulator. Its VHDL blocks
+(axis_chnl_combiner, DATA2PACKETS_FSM, counter64) are replaced by the Migen ports below, the
+rest (BufferizeEndpoints, BitwidthSelector, Converter, AsyncFIFO) is the real gateware. The
+sink side (s_clk/int_clk) runs on sys, the source side (m_clk) on its own clock,
+--source-clk-ratio times faster. With --fused-packer, ChannelCombiner and BitwidthSelector are
+replaced by the ChannelPacker stage and the converter moves behind source_ep_cdc:
+
+    sink -> ChannelPacker -> Data2PacketsFSM -> source_ep_cdc -> Converter(128, source_width) -> source
+
+The sink is driven like the LMS7002 receiver: valid every cycle, a sink stall loses the
+samples of that cycle. The source is throttled with a random ready pattern. Per configuration
+(pkt_size, enabled channels, 12/16-bit samples, ready probability) it reports:
+  - samples_per_clock   : IQ samples (all enabled channels) accepted by the sink per clock
+  - sink_stall_cycles   : cycles the sink was not ready (samples lost upstream)
+  - combiner_bubbles    : cycles chnl_combiner.sink had no data while the sink was valid
+                          (pipeline bubbles of the BufferizeEndpoints stages)
+  - bws_fifo_max        : high-water mark of the BitwidthSelector (ChannelPacker) FIFO (depth 256)
+  - packet_fifo_max     : high-water mark of the Data2PacketsFSM packet FIFO (depth 512), the
+                          data to size M_AXIS_IQPACKET_BUFFER_WORDS from
+  - drop_events         : entries of DATA2PACKETS_FSM into DROP_SAMPLES (lost packets)
+  - dropped_words       : 128-bit words discarded in DROP_SAMPLES
+  - source_beats        : source_width-bit beats delivered
+
+Example:
+    python3 -m gateware.LimeDFB.rx_path_top.src.benchmark_rx_path --pkt-sizes 64 256 --ready-probabilities 1.0 0.5
+"""
+
+import argparse
+import contextlib
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect import stream
+
+from gateware.LimeDFB.rx_path_top.src import rx_path_top
+from gateware.LimeDFB.sim.stream_sim import StreamMonitor, random_pattern
+
+FIELDS = [
+    "pkt_size", "channels", "sample_width", "ready_probability", "source_clk_ratio", "fused_packer", "cycles",
+    "samples_per_clock", "sink_stall_cycles", "combiner_bubbles", "bws_fifo_max", "packet_fifo_max",
+    "drop_events", "dropped_words", "source_beats", "runtime_ms",
+]
+
+# Simulation Models Of The VHDL Blocks -------------------------------------------------------------
+
+class SampleCounter64Sim(LiteXModule):
+    """counter64.vhd: 64-bit counter with synchronous clear, load and increment."""
+    def __init__(self, platform):
+        self.rst     = Signal()
+        self.inc_en  = Signal()
+        self.inc_val = Signal(32)
+        self.ld      = Signal()
+        self.ld_val  = Signal(64)
+        self.count_o = Signal(64)
+
+        self.sync += [
+            If(self.rst,
+                self.count_o.eq(0)
+            ).Elif(self.ld,
+                self.count_o.eq(self.ld_val)
+            ).Elif(self.inc_en,
+                self.count_o.eq(self.count_o + self.inc_val)
+            )
+        ]
+
+
+class ChannelCombinerSim(LiteXModule):
+    """
+    axis_chnl_combiner.vhd: packs the 32-bit IQ words of the enabled channels (s_clk_ch_en)
+    into a 16-word ring buffer and outputs 4 words per beat once more than 3 are stored.
+    """
+    def __init__(self, platform, s_clk_rst_n, s_clk_ch_en):
+        self.sink    = stream.Endpoint([("data", 128), ("keep", 16)])
+        self.source  = stream.Endpoint([("data", 128), ("keep", 16)])
+
+        self.debug_write_pointer    = Signal(5)
+        self.debug_read_pointer     = Signal(5)
+        self.debug_wrusedw          = Signal(5)
+        self.debug_pipeline_en      = Signal(3)
+
+        # # #
+
+        s_ready            = Signal()
+        data_reg           = Signal(128)
+        user_reg           = Signal(4)
+        pipeline_en        = Signal()
+        byte_array         = Array(Signal(32) for _ in range(4))
+        valid_byte_count   = Signal(3)
+        pipeline_en_stage1 = Signal()
+        byte_accum         = Array(Signal(32) for _ in range(16))
+        write_pointer      = Signal(5)
+        read_pointer       = Signal(5)
+        wrusedw            = Signal(5)
+
+        # Stage0: Input registers.
+        self.sync += [
+            If(self.sink.valid & s_ready,
+                data_reg.eq(self.sink.data),
+                user_reg.eq(s_clk_ch_en),
+            ),
+            pipeline_en.eq(self.sink.valid & s_ready),
+        ]
+
+        # Stage1: Capture the enabled channels.
+        cases = {}
+        for user in range(16):
+            enabled = [i for i in range(4) if (user >> i) & 1]
+            cases[user] = [byte_array[k].eq(data_reg[32*i:32*i + 32]) for k, i in enumerate(enabled)]
+            cases[user] += [valid_byte_count.eq(len(enabled))]
+        self.sync += [
+            If(pipeline_en, Case(user_reg, cases)),
+            pipeline_en_stage1.eq(pipeline_en),
+        ]
+
+        # Stage2: Accumulate into the ring buffer.
+        self.sync += If(pipeline_en_stage1,
+            [If(k < valid_byte_count, byte_accum[(write_pointer + k)[:4]].eq(byte_array[k])) for k in range(4)],
+            write_pointer.eq(write_pointer + valid_byte_count),
+        )
+
+        # Output.
+        self.sync += If(self.source.valid & self.source.ready, read_pointer.eq(read_pointer + 4))
+        self.comb += [
+            wrusedw.eq(write_pointer - read_pointer),
+            self.source.valid.eq(wrusedw > 3),
+            self.source.data.eq(Cat(*[byte_accum[(read_pointer + k)[:4]] for k in range(4)])),
+            self.source.keep.eq(2**16 - 1),
+            self.source.last.eq(1),
+            s_ready.eq(~(~s_clk_rst_n |
+                ((write_pointer[4] != read_pointer[4]) & (write_pointer[:4] == read_pointer[:4])) |
+                (wrusedw >= 8))),
+            self.sink.ready.eq(s_ready),
+            self.debug_write_pointer.eq(write_pointer),
+            self.debug_read_pointer.eq(read_pointer),
+            self.debug_wrusedw.eq(wrusedw),
+            self.debug_pipeline_en.eq(Cat(pipeline_en, pipeline_en_stage1)),
+        ]
+
+        # The VHDL resets asynchronously on aresetn.
+        self.sync += If(~s_clk_rst_n,
+            pipeline_en.eq(0),
+            pipeline_en_stage1.eq(0),
+            write_pointer.eq(0),
+            read_pointer.eq(0),
+        )
+
+
+class Data2PacketsFSMSim(LiteXModule):
+    """data2packets_fsm.vhd: writes a 128-bit header and pkt_size payload words per packet."""
+    def __init__(self, platform, rst_n, pkt_size, pct_hdr_0, pct_hdr_1,
+                 sink_buffer_size=4096,
+                 source_buffer_size=8192):
+        self.sink = stream.Endpoint([("data", 128), ("keep", 16)])
+        self.source = stream.Endpoint([("data", 128), ("keep", 16)])
+
+        source_fifo = ResetInserter()((stream.SyncFIFO([("data", 128), ("keep", 16)], depth=512, buffered=True)))
+        self.source_fifo = source_fifo
+
+        self.comb += [
+            self.source_fifo.source.connect(self.source),
+            self.source_fifo.reset.eq(~rst_n),
+        ]
+
+        self.wr_data_count_axis = Signal(10)
+
+        self.drop_samples = Signal()
+        self.wr_header = Signal()
+        self.state = Signal(4)
+        self.wr_cnt = Signal(16)
+
+        # # #
+
+        IDLE, DROP_SAMPLES, WR_HEADER, WR_PAYLOAD, PCT_END = range(5)
+        MAX_BUFFER_WORDS = 0x200
+
+        state          = self.state
+        next_state     = Signal(4)
+        space_required = Signal(16)
+        s_ready_reg    = Signal()
+        m_valid_reg    = Signal()
+        m_data_reg     = Signal(128)
+        m_last_reg     = Signal()
+        pct_wrcnt      = self.wr_cnt
+        sink_fire      = Signal()
+
+        self.comb += [
+            sink_fire.eq(self.sink.valid & s_ready_reg),
+            next_state.eq(state),
+            Case(state, {
+                IDLE: If(self.sink.valid,
+                    If(space_required >= MAX_BUFFER_WORDS,
+                        next_state.eq(DROP_SAMPLES)
+                    ).Else(
+                        next_state.eq(WR_HEADER)
+                    )
+                ),
+                DROP_SAMPLES: If((space_required <= MAX_BUFFER_WORDS) & self.sink.valid & self.sink.last,
+                    next_state.eq(IDLE)
+                ),
+                WR_HEADER: next_state.eq(WR_PAYLOAD),
+                WR_PAYLOAD: If(pct_wrcnt >= pkt_size, next_state.eq(PCT_END)),
+                "default": next_state.eq(IDLE),
+            }),
+            self.drop_samples.eq(state == DROP_SAMPLES),
+            self.wr_header.eq(state == WR_HEADER),
+            self.wr_data_count_axis.eq(source_fifo.level),
+            self.sink.ready.eq(Mux((state == IDLE) | (state == WR_HEADER), 0, s_ready_reg)),
+            source_fifo.sink.valid.eq(m_valid_reg),
+            source_fifo.sink.data.eq(m_data_reg),
+            source_fifo.sink.last.eq(m_last_reg),
+        ]
+
+        last_word = Signal(16)
+        self.comb += last_word.eq(pkt_size - 1)
+        self.sync += [
+            space_required.eq(source_fifo.level + pkt_size),
+            state.eq(next_state),
+            m_valid_reg.eq((state == WR_HEADER) | ((state == WR_PAYLOAD) & sink_fire)),
+            If((state == WR_PAYLOAD) & sink_fire & (pct_wrcnt == last_word),
+                s_ready_reg.eq(0)
+            ).Elif(((state == WR_PAYLOAD) & source_fifo.sink.ready & (pct_wrcnt == 1)) | (state == DROP_SAMPLES),
+                s_ready_reg.eq(1)
+            ),
+            If((state == WR_HEADER) | ((state == WR_PAYLOAD) & sink_fire),
+                pct_wrcnt.eq(pct_wrcnt + 1)
+            ).Elif(state == PCT_END,
+                pct_wrcnt.eq(0)
+            ),
+            m_last_reg.eq((state == WR_PAYLOAD) & (pct_wrcnt == last_word)),
+            If(state == WR_HEADER,
+                m_data_reg.eq(Cat(pct_hdr_0, pct_hdr_1))
+            ).Elif((state == WR_PAYLOAD) & sink_fire,
+                m_data_reg.eq(self.sink.data)
+            ),
+            If(~rst_n,
+                space_required.eq(0),
+                state.eq(IDLE),
+                m_valid_reg.eq(0),
+                s_ready_reg.eq(0),
+                pct_wrcnt.eq(0),
+                m_last_reg.eq(0),
+                m_data_reg.eq(0),
+            ),
+        ]
+
+
+@contextlib.contextmanager
+def sim_models():
+    """Build RXPathTop with the Migen ports of its VHDL blocks."""
+    names = ["SampleCounter64", "ChannelCombiner", "Data2PacketsFSM"]
+    saved = {name: getattr(rx_path_top, name) for name in names}
+    rx_path_top.SampleCounter64 = SampleCounter64Sim
+    rx_path_top.ChannelCombiner = ChannelCombinerSim
+    rx_path_top.Data2PacketsFSM = Data2PacketsFSMSim
+    try:
+        yield
+    finally:
+        for name, cls in saved.items():
+            setattr(rx_path_top, name, cls)
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+class RXPathBench(Module):
+    def __init__(self, source_width=64, fused_packer=False, **kwargs):
+        self.clock_domains.cd_m = ClockDomain("m")
+        self.fpgacfg_manager = SimpleNamespace(
+            rx_en       = Signal(),
+            mimo_int_en = Signal(),
+            ddr_en      = Signal(),
+            smpl_width  = Signal(2),
+            ch_en       = Signal(4),
+            smpl_nr_clr = Signal(),
+        )
+        with sim_models():
+            self.submodules.rx = rx_path_top.RXPathTop(SimpleNamespace(name="sim"), self.fpgacfg_manager,
+                int_clk_domain = "sys",
+                m_clk_domain   = "m",
+                s_clk_domain   = "sys",
+                source_width   = source_width,
+                fused_packer   = fused_packer,
+                **kwargs
+            )
+
+
+def lms_sink(rx, stats, cycles):
+    """LMS7002-like source: a new 4-channel word every cycle, lost when the sink is not ready."""
+    yield rx.sink.valid.eq(1)
+    yield rx.sink.keep.eq(2**16 - 1)
+    for n in range(cycles):
+        yield rx.sink.data.eq(n)
+        yield
+        if (yield rx.sink.ready):
+            stats["sink_beats"] += 1
+        else:
+            stats["sink_stall_cycles"] += 1
+    yield rx.sink.valid.eq(0)
+
+
+def probe(rx, stats):
+    """Per-cycle flow control, FIFO level and packet drop statistics."""
+    d2p = rx.data2packets_fsm
+    pack = rx.chnl_packer if hasattr(rx, "chnl_packer") else rx.bit_width_selector
+    first = rx.chnl_packer if hasattr(rx, "chnl_packer") else rx.chnl_combiner
+    reads = [rx.sink.valid, first.sink.valid, pack.source_fifo.level, d2p.source_fifo.level,
+             d2p.drop_samples, d2p.sink.valid, d2p.sink.ready]
+    yield "passive"
+    dropping = 0
+    while True:
+        yield
+        sink_valid, combiner_valid, bws_level, packet_level, drop, d2p_valid, d2p_ready = yield reads
+        stats["combiner_bubbles"] += int(sink_valid and not combiner_valid)
+        stats["bws_fifo_max"]     = max(stats["bws_fifo_max"], bws_level)
+        stats["packet_fifo_max"]  = max(stats["packet_fifo_max"], packet_level)
+        stats["drop_events"]     += int(drop and not dropping)
+        stats["dropped_words"]   += int(drop and d2p_valid and d2p_ready)
+        dropping = drop
+
+
+def run_config(pkt_size, channels, sample_width, ready_probability, args):
+    start = time.perf_counter()
+    bench = RXPathBench(args.source_width, args.fused_packer)
+    rx, cfg = bench.rx, bench.fpgacfg_manager
+    stats = dict(sink_beats=0, sink_stall_cycles=0, combiner_bubbles=0, bws_fifo_max=0, packet_fifo_max=0,
+                 drop_events=0, dropped_words=0)
+
+    def setup():
+        yield cfg.ch_en.eq(2**channels - 1)
+        yield cfg.smpl_width.eq(2 if sample_width == 12 else 0)
+        yield rx.pkt_size.storage.eq(pkt_size << 4)  # Bytes, RXPathTop takes storage[4:] as 128-bit words
+        yield cfg.rx_en.eq(1)
+        for _ in range(8):
+            yield
+        yield from lms_sink(rx, stats, args.cycles)
+
+    ready_pattern = (1,) if ready_probability >= 1 else random_pattern(ready_probability, seed=pkt_size)
+    monitor = StreamMonitor(rx.source, fields=["last"], ready_pattern=ready_pattern)
+    sys_period = 20
+    m_period   = max(2, 2 * round(sys_period / args.source_clk_ratio / 2))
+    run_simulation(bench, {"sys": [setup(), probe(rx, stats)], "m": [monitor.generator()]},
+                   clocks={"sys": sys_period, "m": m_period})
+
+    del stats["sink_beats"]
+    result = dict(pkt_size=pkt_size, channels=channels, sample_width=sample_width,
+                  ready_probability=ready_probability, source_clk_ratio=args.source_clk_ratio,
+                  fused_packer=args.fused_packer, cycles=args.cycles, source_beats=len(monitor.beats), **stats)
+    result["samples_per_clock"] = (args.cycles - stats["sink_stall_cycles"]) * channels / args.cycles
+    result["runtime_ms"] = (time.perf_counter() - start) * 1e3
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and backpressure benchmark of the RXPathTop packetizer.")
+    parser.add_argument("--pkt-sizes",     nargs="+", type=int,   default=[64, 128, 256], help="Packet payload in 128-bit words")
+    parser.add_argument("--channels",      nargs="+", type=int,   default=[1, 2, 4],      help="Enabled channels")
+    parser.add_argument("--sample-widths", nargs="+", type=int,   default=[12, 16])
+    parser.add_argument("--ready-probabilities", nargs="+", type=float, default=[1.0, 0.5],
+                        help="Probability of source ready per cycle (1.0 = no backpressure)")
+    parser.add_argument("--source-width",  type=int, default=64)
+    parser.add_argument("--fused-packer",  action="store_true", help="Use the fused ChannelPacker stage")
+    parser.add_argument("--source-clk-ratio", type=float, default=2.0, help="m_clk frequency relative to s_clk")
+    parser.add_argument("--cycles",        type=int, default=2048, help="Sink cycles per configuration")
+    parser.add_argument("--jobs",          type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--format",        choices=["csv", "json"], default="csv")
+    parser.add_argument("--output",        default="-", help="Output file ('-' for stdout)")
+    args = parser.parse_args()
+
+    configs = list(itertools.product(args.pkt_sizes, args.channels, args.sample_widths, args.ready_probabilities))
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        rows = list(pool.map(run_config, *zip(*configs), [args] * len(configs)))
+    for (pkt_size, channels, sample_width, ready_probability), row in zip(configs, rows):
+        print(f"pkt_size={pkt_size:4d} channels={channels} {sample_width}-bit ready={ready_probability:.2f}: "
+              f"{row['samples_per_clock']:4.2f} samples/clk, {row['sink_stall_cycles']} sink stalls, "
+              f"packet FIFO max {row['packet_fifo_max']}, {row['drop_events']} drops", file=sys.stderr)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    if args.format == "csv":
+        writer = csv.DictWriter(out, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: (f"{v:.3f}" if isinstance(v, float) else v) for k, v in row.items()})
+    else:
+        json.dump(rows, out, indent=2)
+    if out is not sys.stdout:
+        out.close()
+
+if __name__ == "__main__":
+    main()
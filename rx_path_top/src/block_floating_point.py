@@ -0,0 +1,195 @@
+#
+# This file is part of LimeSDR_GW.
+#
+# Copyright (c) 2024-2025 Lime Microsystems.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Block floating point (BFP8) compression of the RX sample stream.
+
+Each block covers BFP_BLOCK consecutive sink beats (one 16-bit IQ sample per enabled channel
+per beat). All I/Q values of a block share one exponent e (0-8), chosen so the largest value
+fits in 8 signed bits after an arithmetic shift right by e; every value is sent as an 8-bit
+mantissa round(v / 2**e), saturated to [-128, 127].
+
+Stream format (n enabled channels, bytes LSB-first in the 128-bit words, as the 16/12-bit
+packing):
+
+    block  = header + BFP_BLOCK x beat
+    header = e (1 byte) + 2n - 1 zero bytes
+    beat   = (I, Q) mantissa bytes of each enabled channel, in channel order
+
+so a block is 2n * (BFP_BLOCK + 1) bytes = 2n 128-bit words: blocks never straddle a word,
+and 'last' marks the last word of each block. With BFP_BLOCK = 15 a sample takes 2.13 bytes
+instead of 4 (16-bit) or 3 (12-bit).
+
+Packets carrying BFP8 data have BFP_FORMAT_ID in byte 3 of the packet header (pct_hdr_0).
+The packet timestamp counts the samples of the blocks completed before the packet; fixed size
+packets may split a block, adaptive packets (pkt_timeout) always end on a block boundary.
+``bfp_encode``/``bfp_decode`` are the bit-exact NumPy model of the gateware and the host
+decoder (packet payloads concatenated).
+"""
+
+from functools import reduce
+from operator import or_
+
+import numpy as np
+
+from migen import *
+
+from litex.gen import *
+
+from litex.soc.interconnect import stream
+
+BFP_BLOCK     = 15   # Sink beats per block.
+BFP_FORMAT_ID = 1    # Packet header byte 3.
+
+# Block Floating Point -----------------------------------------------------------------------------
+
+class BlockFloatingPoint(LiteXModule):
+    """
+    BFP8 compressor (exponent and mantissas), to be followed by ChannelPacker (bfp=1).
+
+    Each source beat carries the 8-bit (I, Q) mantissas of the 4 channel slots in the low 16
+    bits of each 32-bit channel word; the first beat of a block has ``first`` set and the block
+    exponent in ``exponent``. The sink beats are delayed by one block (the exponent is only
+    known after its last beat) in a 2-block FIFO, so the stage sustains one beat per clock.
+    With enable = 0 the stream passes through unchanged. All internal logic runs in the clock
+    domain this module is instantiated in.
+    """
+    def __init__(self, ch_en, block=BFP_BLOCK):
+        self.sink   = stream.Endpoint([("data", 128), ("keep", 16)])
+        self.source = stream.Endpoint([("data", 128), ("keep", 16), ("exponent", 4)])
+
+        self.enable = Signal()
+        self.rst    = Signal()
+
+        # # #
+
+        # Block Delay.
+        data_fifo = ResetInserter()(stream.SyncFIFO([("data", 128)], 2*block + 2, buffered=True))
+        exp_fifo  = ResetInserter()(stream.SyncFIFO([("exponent", 4)], 4))
+        self.data_fifo = data_fifo
+        self.exp_fifo  = exp_fifo
+
+        # Exponent: highest magnitude bit over the enabled I/Q values of the block.
+        values   = [self.sink.data[16*k:16*k + 16] for k in range(8)]
+        mags     = Signal(15)
+        acc      = Signal(15)
+        block_or = Signal(15)
+        in_count = Signal(max=block)
+        in_fire  = Signal()
+        self.comb += [
+            # v ^ sign: |v| for v >= 0, |v| - 1 for v < 0 (same number of magnitude bits).
+            mags.eq(reduce(or_, [Mux(ch_en[k//2], (v ^ Replicate(v[15], 16))[:15], 0) for k, v in enumerate(values)])),
+            block_or.eq(acc | mags),
+            exp_fifo.sink.exponent.eq(sum((block_or[p:] != 0) for p in range(7, 15))),
+        ]
+
+        self.comb += [
+            in_fire.eq(self.sink.valid & self.sink.ready),
+            data_fifo.sink.valid.eq(self.sink.valid & self.sink.ready),
+            data_fifo.sink.data.eq(self.sink.data),
+            exp_fifo.sink.valid.eq(in_fire & (in_count == block - 1)),
+        ]
+        self.sync += [
+            If(self.rst | ~self.enable,
+                acc.eq(0),
+                in_count.eq(0),
+            ).Elif(in_fire,
+                If(in_count == block - 1,
+                    acc.eq(0),
+                    in_count.eq(0),
+                ).Else(
+                    acc.eq(block_or),
+                    in_count.eq(in_count + 1),
+                )
+            )
+        ]
+
+        # Mantissas: round(v / 2**e), saturated to 8 bits.
+        exponent  = exp_fifo.source.exponent
+        mantissas = []
+        for k in range(8):
+            v = Signal((16, True))
+            m = Signal((8, True))
+            cases = {0: m.eq(v)}
+            for e in range(1, 9):
+                r = Signal((17, True))
+                cases[e] = [
+                    r.eq((v + (1 << (e - 1))) >> e),
+                    m.eq(Mux(r > 127, 127, r)),
+                ]
+            self.comb += [
+                v.eq(data_fifo.source.data[16*k:16*k + 16]),
+                Case(exponent, cases),
+            ]
+            mantissas.append(m)
+
+        out_count = Signal(max=block)
+        out_fire  = Signal()
+        self.comb += [
+            out_fire.eq(self.source.valid & self.source.ready),
+            If(self.enable,
+                self.source.valid.eq(data_fifo.source.valid & exp_fifo.source.valid),
+                self.source.first.eq(out_count == 0),
+                self.source.exponent.eq(exponent),
+                self.source.data.eq(Cat(*[Cat(mantissas[2*i], mantissas[2*i + 1], Constant(0, 16)) for i in range(4)])),
+                self.source.keep.eq(2**16 - 1),
+                data_fifo.source.ready.eq(out_fire),
+                exp_fifo.source.ready.eq(out_fire & (out_count == block - 1)),
+                self.sink.ready.eq(data_fifo.sink.ready & exp_fifo.sink.ready),
+            ).Else(
+                self.sink.connect(self.source, omit=["exponent"]),
+            ),
+            data_fifo.reset.eq(self.rst | ~self.enable),
+            exp_fifo.reset.eq( self.rst | ~self.enable),
+        ]
+        self.sync += [
+            If(self.rst | ~self.enable,
+                out_count.eq(0),
+            ).Elif(out_fire,
+                out_count.eq(Mux(out_count == block - 1, 0, out_count + 1)),
+            )
+        ]
+
+# NumPy Model / Host Decoder -----------------------------------------------------------------------
+
+def bfp_exponents(iq, block=BFP_BLOCK):
+    """Block exponents of iq (beats x channels complex int16 values, whole blocks)."""
+    values = np.concatenate([iq.real, iq.imag], axis=1).astype(np.int64).reshape(-1, block * 2 * iq.shape[1])
+    mags   = np.bitwise_or.reduce(values ^ (values >> 15), axis=1) & 0x7fff
+    return np.array([sum(int(m >> p != 0) for p in range(7, 15)) for m in mags], dtype=np.int64)
+
+
+def bfp_encode(iq, block=BFP_BLOCK):
+    """
+    Compressed byte stream of iq (beats x enabled channels, complex 16-bit values) as produced
+    by BlockFloatingPoint + ChannelPacker. Trailing beats that do not fill a block are dropped.
+    """
+    iq = np.asarray(iq)
+    n_blocks, channels = len(iq) // block, iq.shape[1]
+    iq = iq[:n_blocks * block]
+    exps = bfp_exponents(iq, block)
+    e    = np.repeat(exps, block)[:, None]
+    out  = []
+    for values in (iq.real.astype(np.int64), iq.imag.astype(np.int64)):
+        r = np.where(e > 0, (values + (1 << np.maximum(e - 1, 0))) >> e, values)
+        out.append(np.clip(r, -128, 127))
+    # Beat bytes: I0 Q0 I1 Q1 ...
+    beats  = np.stack(out, axis=2).reshape(n_blocks, block, 2 * channels).astype(np.int8).view(np.uint8)
+    header = np.zeros((n_blocks, 1, 2 * channels), dtype=np.uint8)
+    header[:, 0, 0] = exps
+    return np.concatenate([header, beats], axis=1).reshape(-1)
+
+
+def bfp_decode(payload, channels, block=BFP_BLOCK):
+    """Host decoder: BFP8 byte stream (packet payloads concatenated) to beats x channels complex values."""
+    payload = np.frombuffer(bytes(payload), dtype=np.uint8) if not isinstance(payload, np.ndarray) else payload
+    block_bytes = 2 * channels * (block + 1)
+    blocks  = payload[:len(payload) // block_bytes * block_bytes].reshape(-1, block + 1, 2 * channels)
+    exps    = blocks[:, 0, 0].astype(np.int64)
+    m       = blocks[:, 1:, :].astype(np.uint8).view(np.int8).astype(np.int64) << exps[:, None, None]
+    m       = m.reshape(-1, channels, 2)
+    return m[:, :, 0] + 1j * m[:, :, 1]
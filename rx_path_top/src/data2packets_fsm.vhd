@@ -186,10 +186,11 @@ begin
       if (ARESET_N = '0') then
          s_axis_tready_reg <= '0';
       elsif rising_edge(ACLK) then
-         if ((current_state = WR_PAYLOAD and M_AXIS_TREADY = '1' and pct_wrcnt = 1) or current_state = DROP_SAMPLES) then
-            s_axis_tready_reg <= '1';
-         elsif (current_state = WR_PAYLOAD and S_AXIS_TVALID='1' and s_axis_tready_reg='1' and pct_wrcnt=unsigned(PCT_SIZE) - 1) then
+         -- Last payload word first: with PCT_SIZE = 2 it is also the first one (pct_wrcnt = 1)
+         if (current_state = WR_PAYLOAD and S_AXIS_TVALID='1' and s_axis_tready_reg='1' and pct_wrcnt=unsigned(PCT_SIZE) - 1) then
             s_axis_tready_reg <= '0';
+         elsif ((current_state = WR_PAYLOAD and M_AXIS_TREADY = '1' and pct_wrcnt = 1) or current_state = DROP_SAMPLES) then
+            s_axis_tready_reg <= '1';
          else
             s_axis_tready_reg <= s_axis_tready_reg;
          end if;
@@ -19,6 +19,11 @@ from litex.soc.interconnect                import stream
 
 from gateware.common import *
 
+from gateware.LimeDFB.general.stream_perf_counters import StreamPerfCounters
+from gateware.LimeDFB.general.timed_stream_gate    import TimedStreamGate
+
+from gateware.LimeDFB.rx_path_top.src.block_floating_point import BlockFloatingPoint, BFP_BLOCK, BFP_FORMAT_ID
+
 # RX Path Top --------------------------------------------------------------------------------------
 
 class RXPathTop(LiteXModule):
@@ -35,9 +40,18 @@ class RXPathTop(LiteXModule):
         source_width                 = 64,
         use_channel_combiner         = True,
         bypass_packets               = False,
+        fused_packer                 = False,
+        with_scheduler               = False,
+        adaptive_packets             = False,
+        with_compression             = False,
+        runtime_ch_switch            = False,
+        with_counters                = False,
         ):
 
         assert fpgacfg_manager is not None
+        assert not with_compression or fused_packer, "with_compression requires fused_packer."
+        assert not runtime_ch_switch or (fused_packer and adaptive_packets and not with_compression), \
+            "runtime_ch_switch requires fused_packer and adaptive_packets, without compression."
         assert sink_width in [64, 128], f"Invalid sink_width: {sink_width}. Must be 64 (two channels) or 128 (four channels)."
 
         self.platform              = platform
@@ -59,10 +73,23 @@ class RXPathTop(LiteXModule):
         # Sample Compare.
         self.smpl_cnt_en           = Signal()
 
-        self.pkt_size = CSRStorage(16, reset=253,
+        self.pkt_size = CSRStorage(16, reset=253, name="pkt_size",
             description="Packet Size in bytes, "
         )
 
+        if adaptive_packets:
+            self.pkt_timeout = CSRStorage(32, reset=0, name="pkt_timeout",
+                description="Packet timeout in s_clk cycles: pending samples are sent in a shorter packet after it elapses (0: fixed pkt_size packets)."
+            )
+
+        if with_compression:
+            self.compression = CSRStorage(name="compression", fields=[
+                CSRField("mode", size=2, offset=0, values=[
+                    ("``0b00``", "Off (16/12-bit samples, smpl_width)."),
+                    ("``0b01``", "BFP8: block floating point, 8-bit mantissas (see block_floating_point.py)."),
+                ], description="Sample compression (change while the RX path is in reset)."),
+            ])
+
         # # #
 
         # Signals.
@@ -84,6 +111,7 @@ class RXPathTop(LiteXModule):
         mimo_en                  = Signal()
         ddr_en                   = Signal()
         s_smpl_width             = Signal(2)
+        s_bfp_en                 = Signal()
 
         # IQ Stream Combiner To Rx Path Top.
         iq_to_bit_pack_tdata         = Signal(64)
@@ -164,23 +192,77 @@ class RXPathTop(LiteXModule):
                 pkt_size.eq(Cat(Constant(0, 3), self.pkt_size.storage)[7:]),
             ]
 
+        # Sample format in header byte 3 when compressed.
+        pct_hdr_0_fmt = Signal(64)
+        self.comb += [
+            pct_hdr_0_fmt.eq(pct_hdr_0),
+            If(s_bfp_en,
+                pct_hdr_0_fmt[24:32].eq(BFP_FORMAT_ID),
+            )
+        ]
 
 
+        #-----------------------------------------------------------------------------------------------------------
+        # Stage 0 - Timed start/stop (drops the samples outside the scheduled bursts)
+        # ----------------------------------------------------------------------------------------------------------
+        if with_scheduler:
+            # Start at sample N / stop after M samples: queue a (N, M) burst, times are smpl_nr_cnt values.
+            self.scheduler = TimedStreamGate([("data", sink_width), ("keep", sink_width//8)],
+                clock_domain = s_clk_domain,
+                queue_depth  = 4,
+                drop         = True,
+            )
+            self.comb += [
+                self.scheduler.time.eq(self.smpl_nr_cnt),
+                self.sink.connect(self.scheduler.sink, keep=["data", "keep", "valid", "ready"]),
+            ]
+            pipe_sink = self.scheduler.source
+        else:
+            pipe_sink = self.sink
+
         #-----------------------------------------------------------------------------------------------------------
         # Stage I - Channel combiner and bit_width selector
         # ----------------------------------------------------------------------------------------------------------
-        chnl_combiner = ChannelCombiner(platform, s_clk_rst_n, self.s_clk_ch_en)
-        chnl_combiner = stream.BufferizeEndpoints({"sink": stream.DIR_SINK}, True, True)(chnl_combiner)
-        chnl_combiner = stream.BufferizeEndpoints({"source": stream.DIR_SOURCE}, True, True)(chnl_combiner)
-        chnl_combiner = ClockDomainsRenamer(s_clk_domain)(chnl_combiner)
-        self.chnl_combiner = chnl_combiner
+        if fused_packer:
+            # Single stage at one beat per clock (see ChannelPacker).
+            self.chnl_packer = ClockDomainsRenamer(s_clk_domain)(ChannelPacker(self.s_clk_ch_en,
+                runtime_switch = runtime_ch_switch,
+            ))
 
-        self.bit_width_selector = ClockDomainsRenamer(s_clk_domain)(BitwidthSelector(platform))
+            self.comb += [
+                self.chnl_packer.sel.eq(Mux(s_smpl_width == 2, 1, 0)),
+                self.chnl_packer.bfp.eq(s_bfp_en),
+                self.chnl_packer.rst.eq(~s_clk_rst_n),
+            ]
+            pack_source = self.chnl_packer.source
 
-        self.comb += [
-            self.bit_width_selector.sel.eq(Mux(s_smpl_width == 2, 1, 0)),
-            self.bit_width_selector.rst.eq(~s_clk_rst_n),
-        ]
+            if runtime_ch_switch:
+                # ch_en changes without reset: packets end at the switch and carry their channel
+                # set in header byte 4, the timestamps keep counting.
+                self.comb += pct_hdr_0_fmt[32:40].eq(pack_source.ch_en)
+
+            if with_compression:
+                # Exponent/mantissas ahead of the packer (one block of latency).
+                self.bfp = ClockDomainsRenamer(s_clk_domain)(BlockFloatingPoint(self.s_clk_ch_en))
+                self.specials += MultiReg(self.compression.fields.mode == 1, s_bfp_en, s_clk_domain)
+                self.comb += [
+                    self.bfp.enable.eq(s_bfp_en),
+                    self.bfp.rst.eq(~s_clk_rst_n),
+                ]
+        else:
+            chnl_combiner = ChannelCombiner(platform, s_clk_rst_n, self.s_clk_ch_en)
+            chnl_combiner = stream.BufferizeEndpoints({"sink": stream.DIR_SINK}, True, True)(chnl_combiner)
+            chnl_combiner = stream.BufferizeEndpoints({"source": stream.DIR_SOURCE}, True, True)(chnl_combiner)
+            chnl_combiner = ClockDomainsRenamer(s_clk_domain)(chnl_combiner)
+            self.chnl_combiner = chnl_combiner
+
+            self.bit_width_selector = ClockDomainsRenamer(s_clk_domain)(BitwidthSelector(platform))
+
+            self.comb += [
+                self.bit_width_selector.sel.eq(Mux(s_smpl_width == 2, 1, 0)),
+                self.bit_width_selector.rst.eq(~s_clk_rst_n),
+            ]
+            pack_source = self.bit_width_selector.source
 
         #-----------------------------------------------------------------------------------------------------------
         # Stage II - Sample counter end packetizer (Data2PacketsFSM)
@@ -191,8 +273,9 @@ class RXPathTop(LiteXModule):
             base_inc_val = Signal(32)
 
             sync_s_clk_domain = getattr(self.sync, s_clk_domain)
-            sync_s_clk_domain += self.num_of_channels.eq(
-                sum(self.s_clk_ch_en[i] for i in range(len(self.s_clk_ch_en))))
+            if not runtime_ch_switch:
+                sync_s_clk_domain += self.num_of_channels.eq(
+                    sum(self.s_clk_ch_en[i] for i in range(len(self.s_clk_ch_en))))
 
             cases = {
                 0: base_inc_val.eq(Constant(0, 32)),
@@ -204,33 +287,68 @@ class RXPathTop(LiteXModule):
 
             self.comb += Case(self.num_of_channels, cases)
 
-            sync_s_clk_domain += [
-                If (s_smpl_width == 2,
-                    self.sample_counter_1_inc_val.eq(base_inc_val*4),
-                ).Else(
-                    self.sample_counter_1_inc_val.eq(base_inc_val),
-                )
+            if runtime_ch_switch:
+                # Samples per word from the channel set each word was packed with.
+                self.comb += [
+                    self.num_of_channels.eq(sum(pack_source.ch_en[i] for i in range(4))),
+                    If (s_smpl_width == 2,
+                        self.sample_counter_1_inc_val.eq(base_inc_val*4),
+                    ).Else(
+                        self.sample_counter_1_inc_val.eq(base_inc_val),
+                    )
+                ]
+            else:
+                sync_s_clk_domain += [
+                    If (s_bfp_en,
+                        self.sample_counter_1_inc_val.eq(BFP_BLOCK),
+                    ).Elif (s_smpl_width == 2,
+                        self.sample_counter_1_inc_val.eq(base_inc_val*4),
+                    ).Else(
+                        self.sample_counter_1_inc_val.eq(base_inc_val),
+                    )
 
-            ]
+                ]
 
             sample_counter_1 = ClockDomainsRenamer(s_clk_domain)(SampleCounter64(platform))
             self.sample_counter_1 = sample_counter_1
             self.comb += [
                 sample_counter_1.rst.eq(s_clk_rst),
-                sample_counter_1.inc_en.eq(self.bit_width_selector.source.valid & self.bit_width_selector.source.ready & self.bit_width_selector.source.last),
+                sample_counter_1.inc_en.eq(pack_source.valid & pack_source.ready & pack_source.last),
                 sample_counter_1.inc_val.eq(self.sample_counter_1_inc_val),
-                sample_counter_1.ld.eq(0),
-                sample_counter_1.ld_val.eq(0),
+                # Packet timestamps of a scheduled burst start at its sample number.
+                sample_counter_1.ld.eq(self.scheduler.start if with_scheduler else 0),
+                sample_counter_1.ld_val.eq(self.scheduler.start_time if with_scheduler else 0),
                 bp_sample_nr_counter.eq(sample_counter_1.count_o),
             ]
 
+            # ----------------------------------------------------------------------------------------------------------
+            # Adaptive packet size (shorter packets after pkt_timeout, payload size in header bytes 1-2)
+            if adaptive_packets:
+                packet_sizer = ClockDomainsRenamer(s_clk_domain)(PacketSizer(with_boundary=runtime_ch_switch))
+                self.packet_sizer = packet_sizer
+                pack_fifo = self.chnl_packer.source_fifo if fused_packer else self.bit_width_selector.source_fifo
+
+                pct_size        = packet_sizer.size
+                pct_hdr_0_sized = Signal(64)
+                self.comb += [
+                    packet_sizer.max_size.eq(pkt_size),
+                    packet_sizer.timeout.eq(self.pkt_timeout.storage),
+                    packet_sizer.level.eq(self.chnl_packer.head_level if fused_packer else pack_fifo.level),
+                    packet_sizer.boundary.eq(self.chnl_packer.boundary if fused_packer else 0),
+                    packet_sizer.frame_words.eq(Mux(s_bfp_en, 2*self.num_of_channels, Mux(s_smpl_width == 2, 3, 1))),
+                    pct_hdr_0_sized.eq(Cat(pct_hdr_0_fmt[:8], ((packet_sizer.size - 1) << 4)[:16], pct_hdr_0_fmt[24:])),
+                ]
+            else:
+                pct_size        = pkt_size
+                pct_hdr_0_sized = pct_hdr_0_fmt
+
             # ----------------------------------------------------------------------------------------------------------
             # Packetizer
             data2packets_fsm = Data2PacketsFSM(
                 platform    = platform,
                 rst_n       = s_clk_rst_n,      # Pass in the reset
-                pkt_size    = pkt_size,         # Pass in the size signal
-                pct_hdr_0   = pct_hdr_0,        # Pass in header 0
+                pkt_size    = pct_size,         # Pass in the size signal
+                pct_hdr_0   = pct_hdr_0_sized,  # Pass in header 0
                 pct_hdr_1   = self.pct_hdr_1    # Pass in header 1
             )
 
@@ -238,51 +356,89 @@ class RXPathTop(LiteXModule):
             data2packets_fsm = ClockDomainsRenamer(s_clk_domain)(data2packets_fsm)
             self.data2packets_fsm = data2packets_fsm
 
+            if adaptive_packets:
+                self.comb += packet_sizer.idle.eq(data2packets_fsm.state == 0)
+
 
         #-----------------------------------------------------------------------------------------------------------
         # Stage III - Converting source width and CDC (source_ep_conv->source_ep_cdc)
         # ----------------------------------------------------------------------------------------------------------
+        # With fused_packer, cross at 128b and convert in m_clk: a 128b to 64b converter in s_clk
+        # would accept one beat every second clock and halve the packer throughput.
+        if fused_packer:
+            cdc_width   = 128
+            conv_domain = m_clk_domain
+        else:
+            cdc_width   = source_width
+            conv_domain = s_clk_domain
+
         # 128b to 256b converter
         self.source_ep_conv = ep_conv = ResetInserter()(
-            ClockDomainsRenamer(s_clk_domain)(stream.Converter(128, source_width)))
+            ClockDomainsRenamer(conv_domain)(stream.Converter(128, source_width)))
 
         # Clock domain crossing FIFO
-        source_ep_cdc      = stream.AsyncFIFO([("data", source_width), ("keep", source_width//8)], 128)
+        source_ep_cdc      = stream.AsyncFIFO([("data", cdc_width), ("keep", cdc_width//8)], 128*source_width//cdc_width)
         source_ep_cdc      = ClockDomainsRenamer({"write": s_clk_domain, "read": m_clk_domain})(source_ep_cdc)
         self.source_ep_cdc = source_ep_cdc
 
 
 
         #-----------------------------------------------------------------------------------------------------------
-        # Final pipeline sink -> chnl_combiner -> bit_width_selector -> (data2packets_fsm) -> source_ep_conv -> source_ep_cdc
+        # Final pipeline sink -> (scheduler) -> chnl_combiner -> bit_width_selector -> (data2packets_fsm) -> source_ep_conv -> source_ep_cdc
+        # (fused_packer:  sink -> (scheduler) -> (bfp) -> chnl_packer -> (data2packets_fsm) -> source_ep_cdc -> source_ep_conv)
         # ----------------------------------------------------------------------------------------------------------
 
-        # sink -> chnl_combiner -> bit_width_selector.sink
-        self.comb += [
-            self.sink.connect(self.chnl_combiner.sink, keep=["data", "keep", "valid", "ready"]),
-            self.chnl_combiner.source.connect(self.bit_width_selector.sink, keep=["data", "keep", "valid", "ready"]),
-        ]
+        if with_compression:
+            # pipe_sink -> bfp -> chnl_packer.sink
+            self.comb += [
+                pipe_sink.connect(self.bfp.sink, keep=["data", "keep", "valid", "ready"]),
+                self.bfp.source.connect(self.chnl_packer.sink),
+            ]
+        elif fused_packer:
+            # pipe_sink -> chnl_packer.sink
+            self.comb += pipe_sink.connect(self.chnl_packer.sink, keep=["data", "keep", "valid", "ready"])
+        else:
+            # pipe_sink -> chnl_combiner -> bit_width_selector.sink
+            self.comb += [
+                pipe_sink.connect(self.chnl_combiner.sink, keep=["data", "keep", "valid", "ready"]),
+                self.chnl_combiner.source.connect(self.bit_width_selector.sink, keep=["data", "keep", "valid", "ready"]),
+            ]
 
-        # bit_width_selector.source -> (data2packets_fsm) ->  source_ep_conv.sink
+        # pack_source -> (packet_sizer -> data2packets_fsm) -> source_ep_conv.sink (fused_packer: source_ep_cdc.sink)
+        pack_sink = self.source_ep_cdc.sink if fused_packer else self.source_ep_conv.sink
         if not bypass_packets:
+            if adaptive_packets:
+                self.comb += [
+                    pack_source.connect(self.packet_sizer.sink, omit=["ch_en"]),
+                    self.packet_sizer.source.connect(self.data2packets_fsm.sink),
+                ]
+            else:
+                self.comb += pack_source.connect(self.data2packets_fsm.sink)
+            self.comb += self.data2packets_fsm.source.connect(pack_sink, omit=["keep", "last"])
+        else:
             self.comb += [
-                self.bit_width_selector.source.connect(self.data2packets_fsm.sink),
-                self.data2packets_fsm.source.connect(self.source_ep_conv.sink, omit=["keep", "last"]),
+                pack_source.connect(pack_sink, omit=["keep", "last"]),
+            ]
+
+        if fused_packer:
+            # source_ep_cdc.source -> source_ep_conv -> source
+            self.comb += [
+                self.source_ep_conv.reset.eq(~m_clk_rst_n),
+                # Override ready to flush out leftover data when system is in reset
+                self.source_ep_cdc.source.connect(self.source_ep_conv.sink, omit=["keep", "last", "ready"]),
+                self.source_ep_cdc.source.ready.eq(self.source_ep_conv.sink.ready | ~m_clk_rst_n),
+                self.source_ep_conv.source.connect(self.source, keep=["data", "valid", "ready"]),
             ]
         else:
+            # source_ep_conv.soruce-> source_ep_cdc -> source
             self.comb += [
-                self.bit_width_selector.source.connect(self.source_ep_conv.sink, omit=["keep", "last"]),
+                self.source_ep_conv.reset.eq(~s_clk_rst_n),
+                self.source_ep_conv.source.connect(self.source_ep_cdc.sink, omit=["keep", "last"]),
+                # Override ready to flush out leftover data when system is in reset
+                self.source_ep_cdc.source.connect(self.source, omit=["ready"]),
+                self.source_ep_cdc.source.ready.eq(self.source.ready | ~m_clk_rst_n),
             ]
 
-        # source_ep_conv.soruce-> source_ep_cdc -> source
-        self.comb += [
-            self.source_ep_conv.reset.eq(~s_clk_rst_n),
-            self.source_ep_conv.source.connect(self.source_ep_cdc.sink, omit=["keep", "last"]),
-            # Override ready to flush out leftover data when system is in reset
-            self.source_ep_cdc.source.connect(self.source, omit=["ready"]),
-            self.source_ep_cdc.source.ready.eq(self.source.ready | ~m_clk_rst_n),
-        ]
-
         if not bypass_packets:
             if soc_has_timesource:
                 self.comb += [
@@ -356,23 +512,31 @@ class RXPathTop(LiteXModule):
         self.flow_control_signals.s_clk = [
             self.sink.valid,
             self.sink.ready,
-            self.chnl_combiner.sink.valid,
-            self.chnl_combiner.sink.ready,
-            self.chnl_combiner.source.valid,
-            self.chnl_combiner.source.ready,
-            self.bit_width_selector.sink.valid,
-            self.bit_width_selector.sink.ready,
-            self.bit_width_selector.source.valid,
-            self.bit_width_selector.source.ready,
-            self.bit_width_selector.source.last,
-            self.source_ep_conv.sink.valid,
-            self.source_ep_conv.sink.ready,
-            self.source_ep_conv.source.valid,
-            self.source_ep_conv.source.ready,
             self.source_ep_cdc.sink.valid,
             self.source_ep_cdc.sink.ready,
         ]
 
+        if fused_packer:
+            self.flow_control_signals.s_clk += [
+                self.chnl_packer.sink.valid,
+                self.chnl_packer.sink.ready,
+                self.chnl_packer.source.valid,
+                self.chnl_packer.source.ready,
+                self.chnl_packer.source.last,
+            ]
+        else:
+            self.flow_control_signals.s_clk += [
+                self.chnl_combiner.sink.valid,
+                self.chnl_combiner.sink.ready,
+                self.chnl_combiner.source.valid,
+                self.chnl_combiner.source.ready,
+                self.bit_width_selector.sink.valid,
+                self.bit_width_selector.sink.ready,
+                self.bit_width_selector.source.valid,
+                self.bit_width_selector.source.ready,
+                self.bit_width_selector.source.last,
+            ]
+
         if not bypass_packets:
             self.flow_control_signals.s_clk += [
                 self.data2packets_fsm.sink.valid,
@@ -388,6 +552,58 @@ class RXPathTop(LiteXModule):
             self.source_ep_cdc.source.ready,
         ]
 
+        conv_signals = [
+            self.source_ep_conv.sink.valid,
+            self.source_ep_conv.sink.ready,
+            self.source_ep_conv.source.valid,
+            self.source_ep_conv.source.ready,
+        ]
+        if fused_packer:
+            self.flow_control_signals.m_clk += conv_signals
+        else:
+            self.flow_control_signals.s_clk += conv_signals
+
+        # Performance Counters. --------------------------------------------------------------------
+        if with_counters:
+            self.counters = StreamPerfCounters()
+            self.counters.add_probe("sink",
+                valid        = self.sink.valid,
+                ready        = self.sink.ready,
+                clock_domain = s_clk_domain,
+            )
+            if fused_packer:
+                self.counters.add_probe("chnl_packer",
+                    valid        = self.chnl_packer.source.valid,
+                    ready        = self.chnl_packer.source.ready,
+                    level        = self.chnl_packer.source_fifo.level,
+                    clock_domain = s_clk_domain,
+                )
+            else:
+                self.counters.add_probe("chnl_combiner",
+                    valid        = self.chnl_combiner.source.valid,
+                    ready        = self.chnl_combiner.source.ready,
+                    clock_domain = s_clk_domain,
+                )
+                self.counters.add_probe("bit_width_selector",
+                    valid        = self.bit_width_selector.source.valid,
+                    ready        = self.bit_width_selector.source.ready,
+                    level        = self.bit_width_selector.source_fifo.level,
+                    clock_domain = s_clk_domain,
+                )
+            if not bypass_packets:
+                self.counters.add_probe("data2packets_fsm",
+                    valid        = self.data2packets_fsm.source.valid,
+                    ready        = self.data2packets_fsm.source.ready,
+                    level        = self.data2packets_fsm.source_fifo.level,
+                    clock_domain = s_clk_domain,
+                )
+            # AsyncFIFO has no level output, count its read side handshakes.
+            self.counters.add_probe("source_ep_cdc",
+                valid        = self.source_ep_cdc.source.valid,
+                ready        = self.source_ep_cdc.source.ready,
+                clock_domain = m_clk_domain,
+            )
+
 
 # ---------------------------------------------------------------------------------
 #  Helper Class: SampleCounter64
@@ -676,6 +892,361 @@ class BitwidthSelector(LiteXModule):
         ]
 
 
+# ---------------------------------------------------------------------------------
+#  Helper Class: ChannelPacker
+# ---------------------------------------------------------------------------------
+class ChannelPacker(LiteXModule):
+    """
+    Fused ChannelCombiner + BitwidthSelector (zero-bubble "combine + pack" stage).
+
+    Packs the 32-bit IQ words of the enabled channels (16-bit mode, sel=0) or their 24-bit
+    12-bit IQ pairs (MSBs of each 16-bit half, sel=1) LSB-first into 128-bit words, the same
+    output as ChannelCombiner -> BitwidthSelector, without their ring buffer thresholds and
+    gearbox cycles. All internal logic runs in the clock domain this module is instantiated in.
+        Path Details:
+                               [ sink ]
+                                  | [128b] 4 x 32b channel words
+                                  v
+                          [  compaction   ]------- ch_en, sel      (Stage0, registered)
+                                  | [128b] + byte count (0-16)
+                                  v
+                          [  accumulator  ]                         (Stage1, 256b)
+                                  | [128b]
+                                  v
+                          [  source_fifo  ]
+                                  |
+                                  v [128b]
+                               [ source ]
+
+    The accumulator holds up to two output words, so it accepts a new input beat in the cycle
+    it emits one: a 4-channel 16-bit stream (16 bytes/clk in and out) or a 12-bit stream
+    (12 bytes/clk in) passes at one sink beat per clock. sink.ready only depends on registered
+    state and on the FIFO being writable (no combinatorial path from source.ready).
+
+    'last' is set on every word in 16-bit mode and every third word in 12-bit mode, as in
+    BitwidthSelector.
+
+    With bfp=1 the sink is the BlockFloatingPoint stream: 16-bit (I, Q) mantissa pairs per
+    channel, plus the block header (exponent) on the first beat of each block. 'last' then
+    marks the last of the 2n words of each block.
+
+    With runtime_switch=True (bfp=0 only) a s_clk_ch_en change is taken without reset, at the
+    next frame boundary of the sink bytes (one word, three in 12-bit mode), so no word mixes
+    two channel sets. The source words carry the channel set they were packed with (ch_en);
+    head_level is the source_fifo level up to the first word of another channel set (boundary
+    set while such a word is queued), for PacketSizer to end the packet there.
+    """
+    def __init__(self, s_clk_ch_en, fifo_depth=256, runtime_switch=False):
+        layout = [("data", 128), ("keep", 16)] + ([("ch_en", 4)] if runtime_switch else [])
+
+        self.sink    = stream.Endpoint([("data", 128), ("keep", 16), ("exponent", 4)])
+        self.source  = stream.Endpoint(layout)
+
+        # Source fifo for storing samples and handling backpressure
+        source_fifo = ResetInserter()((stream.SyncFIFO(layout, depth=fifo_depth, buffered=True)))
+        self.source_fifo = source_fifo
+
+        self.sel = Signal()
+        self.bfp = Signal()
+        self.rst = Signal()
+
+        self.head_level = Signal(len(source_fifo.level))
+        self.boundary   = Signal()
+
+        # # #
+
+        # Stage0: Compaction of the enabled channels.
+        in_valid = Signal()
+        in_ready = Signal()
+        in_data  = Signal(128)
+        in_bytes = Signal(5)
+
+        beat_ch_en = Signal(4) # Channel set of the sink beat.
+        in_ch_en   = Signal(4)
+        words     = [self.sink.data[32*i:32*i + 32] for i in range(4)]
+        packed    = [Cat(word[4:16], word[20:32]) for word in words]
+        mantissas = [word[:16] for word in words]
+
+        cases = {}
+        for ch_en in range(16):
+            enabled = [i for i in range(4) if (ch_en >> i) & 1]
+            if not enabled:
+                cases[ch_en] = [in_data.eq(0), in_bytes.eq(0)]
+                continue
+            n = len(enabled)
+            cases[ch_en] = If(self.bfp,
+                If(self.sink.first,
+                    # Block header: exponent byte padded to one beat.
+                    in_data.eq(Cat(self.sink.exponent, Constant(0, 16*n - 4), *[mantissas[i] for i in enabled])),
+                    in_bytes.eq(4*n),
+                ).Else(
+                    in_data.eq(Cat(*[mantissas[i] for i in enabled])),
+                    in_bytes.eq(2*n),
+                )
+            ).Elif(self.sel,
+                in_data.eq(Cat(*[packed[i] for i in enabled])),
+                in_bytes.eq(3*len(enabled)),
+            ).Else(
+                in_data.eq(Cat(*[words[i] for i in enabled])),
+                in_bytes.eq(4*len(enabled)),
+            )
+
+        self.comb += self.sink.ready.eq(~in_valid | in_ready)
+        self.sync += [
+            If(self.rst,
+                in_valid.eq(0),
+            ).Elif(self.sink.ready,
+                in_valid.eq(self.sink.valid),
+                If(self.sink.valid,
+                    Case(beat_ch_en, cases),
+                    in_ch_en.eq(beat_ch_en),
+                ),
+            )
+        ]
+
+        # Stage1: Accumulation (level in bytes, bits above level are kept at 0).
+        acc      = Signal(256)
+        level    = Signal(6)
+        out_fire = Signal()
+        in_fire  = Signal()
+        shifted  = Signal(256)
+        base     = Signal(5)
+        last_cnt = Signal(3)
+        last_max = Signal(3)
+
+        self.comb += [
+            source_fifo.sink.valid.eq(level >= 16),
+            source_fifo.sink.data.eq(acc[:128]),
+            source_fifo.sink.keep.eq(2**16 - 1),
+            last_max.eq(Mux(self.bfp, 2*sum(beat_ch_en[i] for i in range(4)) - 1, Mux(self.sel, 2, 0))),
+            source_fifo.sink.last.eq(last_cnt == last_max),
+            out_fire.eq(source_fifo.sink.valid & source_fifo.sink.ready),
+            # Room for a 16 byte input once the output word of this cycle is gone.
+            in_ready.eq((level <= 16) | (out_fire & (level <= 32))),
+            in_fire.eq(in_valid & in_ready),
+            shifted.eq(Mux(out_fire, acc[128:], acc)),
+            base.eq(Mux(out_fire, level - 16, level)),
+        ]
+
+        self.sync += [
+            If(self.rst,
+                acc.eq(0),
+                level.eq(0),
+                last_cnt.eq(0),
+            ).Else(
+                If(in_fire,
+                    Case(base, {b: acc.eq(shifted | (in_data << 8*b)) for b in range(17)}),
+                ).Else(
+                    acc.eq(shifted),
+                ),
+                level.eq(level - Mux(out_fire, 16, 0) + Mux(in_fire, in_bytes, 0)),
+                If(out_fire,
+                    last_cnt.eq(Mux(source_fifo.sink.last, 0, last_cnt + 1)),
+                ),
+            )
+        ]
+
+        self.comb += [
+            source_fifo.reset.eq(self.rst),
+            source_fifo.source.connect(self.source),
+        ]
+
+        if runtime_switch:
+            self.add_runtime_switch(s_clk_ch_en, beat_ch_en, in_ch_en, in_fire, out_fire, base)
+        else:
+            self.comb += [
+                beat_ch_en.eq(s_clk_ch_en),
+                self.head_level.eq(source_fifo.level),
+            ]
+
+    def add_runtime_switch(self, s_clk_ch_en, beat_ch_en, in_ch_en, in_fire, out_fire, base):
+        source_fifo = self.source_fifo
+
+        # Packed channel set, taken from s_clk_ch_en (stable for a cycle) when the sink bytes are
+        # at a frame boundary and the previous switch has reached source_fifo.
+        packed_ch_en = Signal(4)
+        ch_en_d      = Signal(4)
+        switch       = Signal()
+        switch_ready = Signal()
+        frame_pos    = Signal(6) # Sink bytes in the current frame.
+        frame_next   = Signal(7)
+        frame_bytes  = Signal(6)
+        n            = Signal(3)
+        self.comb += [
+            switch.eq((packed_ch_en != s_clk_ch_en) & (s_clk_ch_en == ch_en_d) & (frame_pos == 0) & switch_ready),
+            beat_ch_en.eq(Mux(switch, s_clk_ch_en, packed_ch_en)),
+            n.eq(beat_ch_en[0] + beat_ch_en[1] + beat_ch_en[2] + beat_ch_en[3]),
+            frame_bytes.eq(Mux(self.sel, 48, 16)),
+            frame_next.eq(frame_pos + Mux(self.sel, 3*n, 4*n)),
+        ]
+        self.sync += [
+            ch_en_d.eq(s_clk_ch_en),
+            If(self.rst,
+                packed_ch_en.eq(s_clk_ch_en),
+                frame_pos.eq(0),
+            ).Else(
+                packed_ch_en.eq(beat_ch_en),
+                If(self.sink.valid & self.sink.ready,
+                    frame_pos.eq(Mux(frame_next >= frame_bytes, frame_next - frame_bytes, frame_next)),
+                )
+            )
+        ]
+
+        # Channel set of the accumulator words (frame aligned: a word never mixes two sets).
+        tag_lo = Signal(4)
+        tag_hi = Signal(4)
+        self.sync += [
+            If(in_fire,
+                If(base < 16,
+                    tag_lo.eq(in_ch_en),
+                ).Else(
+                    tag_lo.eq(Mux(out_fire, tag_hi, tag_lo)),
+                ),
+                tag_hi.eq(in_ch_en),
+            ).Elif(out_fire,
+                tag_lo.eq(tag_hi),
+            )
+        ]
+        self.comb += source_fifo.sink.ch_en.eq(tag_lo)
+
+        # Queued words of the previous channel set.
+        wr_ch_en = Signal(4) # Channel set of the last word written to source_fifo.
+        run      = Signal(len(source_fifo.level))
+        rd_fire  = Signal()
+        queued   = Signal(len(source_fifo.level))
+        self.comb += [
+            rd_fire.eq(source_fifo.source.valid & source_fifo.source.ready),
+            queued.eq(source_fifo.level - rd_fire),
+            switch_ready.eq(~self.boundary & ((wr_ch_en == packed_ch_en) | (packed_ch_en == 0))),
+            self.head_level.eq(Mux(self.boundary, run, source_fifo.level)),
+        ]
+        self.sync += [
+            If(self.rst,
+                wr_ch_en.eq(s_clk_ch_en),
+                self.boundary.eq(0),
+            ).Else(
+                If(out_fire,
+                    wr_ch_en.eq(tag_lo),
+                ),
+                If(out_fire & (tag_lo != wr_ch_en) & (queued != 0),
+                    self.boundary.eq(1),
+                    run.eq(queued),
+                ).Elif(self.boundary & rd_fire,
+                    run.eq(run - 1),
+                    If(run == 1,
+                        self.boundary.eq(0),
+                    )
+                )
+            )
+        ]
+
+
+# ---------------------------------------------------------------------------------
+#  Helper Class: PacketSizer
+# ---------------------------------------------------------------------------------
+class PacketSizer(LiteXModule):
+    """
+    Adaptive packet size for Data2PacketsFSM.
+
+    With timeout = 0 the stream passes through and size = max_size (fixed size packets).
+    Otherwise the samples are held back while the packetizer is idle, until either a full
+    packet (max_size - 1 payload words) is pending in the upstream FIFO (level), or timeout
+    cycles elapsed with data pending. In the latter case the packet is closed with the pending
+    words, rounded down to whole frames (frame_words: 1 for 16-bit, 3 for 12-bit samples, 2n for
+    BFP8 blocks of n channels).
+    The chosen size (header included, as PCT_SIZE) is held until the packetizer is idle again.
+    With with_boundary=True (ChannelPacker runtime switch) the packet is also closed at once when
+    boundary is set (level then stops at the boundary), timeout = 0 disables the timeout only.
+    All internal logic runs in the clock domain this module is instantiated in.
+    """
+    def __init__(self, level_width=16, timeout_width=32, with_boundary=False):
+        self.sink        = stream.Endpoint([("data", 128), ("keep", 16)])
+        self.source      = stream.Endpoint([("data", 128), ("keep", 16)])
+
+        self.max_size    = Signal(16)
+        self.timeout     = Signal(timeout_width)
+        self.level       = Signal(level_width)
+        self.frame_words = Signal(4)
+        self.idle        = Signal() # Packetizer idle (DATA2PACKETS_FSM IDLE state).
+        self.boundary    = Signal()
+        self.size        = Signal(16)
+
+        # # #
+
+        timer   = Signal(timeout_width)
+        pending = Signal(level_width)
+        started = Signal()
+        size    = Signal(16)
+        opened  = Signal()
+        close   = Signal()
+
+        passthrough = Signal()
+
+        if with_boundary:
+            self.comb += close.eq(((self.timeout != 0) & (timer >= self.timeout)) | self.boundary)
+        else:
+            self.comb += [
+                close.eq(timer >= self.timeout),
+                passthrough.eq(self.timeout == 0),
+            ]
+
+        # Pending words in whole frames (level // 3 * 3 and level // 6 * 6 exact for level < 2045,
+        # else powers of 2).
+        self.comb += Case(self.frame_words, {
+            3: pending.eq(((self.level * 683) >> 11) * 3),
+            6: pending.eq(((self.level * 683) >> 12) * 6),
+            2: pending.eq(Cat(Constant(0, 1), self.level[1:])),
+            4: pending.eq(Cat(Constant(0, 2), self.level[2:])),
+            8: pending.eq(Cat(Constant(0, 3), self.level[3:])),
+            "default": pending.eq(self.level),
+        })
+
+        self.fsm = fsm = FSM(reset_state="WAIT")
+        fsm.act("WAIT",
+            If(self.level != 0,
+                NextValue(timer, timer + 1),
+            ),
+            If(self.idle,
+                If(self.level >= self.max_size - 1,
+                    NextValue(size, self.max_size),
+                    NextState("LOAD"),
+                ).Elif(close & (pending != 0),
+                    NextValue(size, pending + 1),
+                    NextState("LOAD"),
+                )
+            )
+        )
+        # One cycle for DATA2PACKETS_FSM to register the space required for the new size.
+        fsm.act("LOAD",
+            NextValue(timer,   0),
+            NextValue(started, 0),
+            NextState("OPEN"),
+        )
+        fsm.act("OPEN",
+            If(~self.idle,
+                NextValue(started, 1),
+            ),
+            # Hide the next samples from the packetizer as soon as it returns to idle.
+            If(started & self.idle,
+                NextState("WAIT"),
+            ).Else(
+                opened.eq(1),
+            )
+        )
+
+        self.comb += [
+            self.sink.connect(self.source, omit=["valid", "ready"]),
+            If(passthrough,
+                self.size.eq(self.max_size),
+                self.sink.connect(self.source, keep=["valid", "ready"]),
+            ).Else(
+                self.size.eq(size),
+                self.source.valid.eq(self.sink.valid & opened),
+                self.sink.ready.eq(self.source.ready & opened),
+            )
+        ]
+
+
 # ---------------------------------------------------------------------------------
 #  Helper Class: Data2PacketsFSM
 # ---------------------------------------------------------------------------------
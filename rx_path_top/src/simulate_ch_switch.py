@@ -0,0 +1,148 @@
+#
+# This file is part of LimeSDR_GW.
+#
+# Copyright (c) 2024-2025 Lime Microsystems.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Runtime channel switch testbench of RXPathTop (fused_packer, adaptive_packets, runtime_ch_switch).
+
+The sink is fed a 4-channel word per clock, held until accepted, with numbered samples (sample
+t of channel i = 4*t + i, t counting accepted words like the sample counter), while ch_en
+changes at random cycles. 4 channels of 16-bit samples fill the 128-bit path, so the packet
+headers make the sink backpressure there; no sample may be lost or repeated. PacketSizer
+closes the current packet on a switch (and on pkt_timeout), so the parsed source stream must
+hold, per packet:
+  - a channel mask byte matching the payload (no partial channel group),
+  - the samples of the enabled channels only, group g being sample time ts + g,
+  - timestamps that follow on from the previous packet (no sample time lost or repeated).
+12-bit and 16-bit samples are covered. The VHDL blocks are replaced by the Migen ports of
+benchmark_rx_path.
+
+Example:
+    python3 -m gateware.LimeDFB.rx_path_top.src.simulate_ch_switch --seeds 1 2 3 --timeouts 0 40
+"""
+
+import argparse
+import random
+
+from migen import *
+
+from gateware.LimeDFB.rx_path_top.src.benchmark_rx_path import RXPathBench
+from gateware.LimeDFB.sim.stream_sim import StreamMonitor
+
+MODES = [0b0001, 0b0011, 0b0101, 0b1111]
+
+# Packet Parser ------------------------------------------------------------------------------------
+
+def unpack12(payload):
+    """12-bit payload to 32-bit I/Q words (I[15:4], Q[15:4] packed LSB first, 24 bits per word)."""
+    bits  = int.from_bytes(payload, "little")
+    words = []
+    for k in range(len(payload)*8 // 24):
+        v = (bits >> (24*k)) & 0xffffff
+        words.append(((v & 0xfff) << 4) | (((v >> 12) & 0xfff) << 20))
+    return words
+
+def check_packets(raw, sample_width):
+    """Parse the source bytes into packets, return (packets, channel masks, sample times, errors)."""
+    errors = []
+    masks  = set()
+    start  = packets = total = 0
+    next_ts = None
+    keep    = 0xfff0fff0 if sample_width == 12 else 0xffffffff
+    while start + 16 <= len(raw):
+        size    = int.from_bytes(raw[start + 1:start + 3], "little")
+        mask    = raw[start + 4]
+        ts      = int.from_bytes(raw[start + 8:start + 16], "little")
+        payload = raw[start + 16:start + 16 + size]
+        start  += 16 + size
+        packets += 1
+        enabled = [i for i in range(4) if (mask >> i) & 1]
+        masks.add(mask)
+        if sample_width == 12:
+            words = unpack12(payload)
+        else:
+            words = [int.from_bytes(payload[4*k:4*k + 4], "little") for k in range(len(payload) // 4)]
+        if not enabled or len(words) % len(enabled):
+            errors.append(f"packet {packets}: {len(words)} words for mask {mask:#06b}")
+            continue
+        groups = len(words) // len(enabled)
+        for g in range(groups):
+            expected = [((ts + g)*4 + i) & keep for i in enabled]
+            if words[g*len(enabled):(g + 1)*len(enabled)] != expected:
+                errors.append(f"packet {packets}: mask {mask:#06b} ts {ts} group {g} differs")
+                break
+        if next_ts is not None and ts != next_ts:
+            errors.append(f"packet {packets}: ts {ts}, expected {next_ts}")
+        next_ts = ts + groups
+        total  += groups
+    return packets, masks, total, errors
+
+# Simulation ---------------------------------------------------------------------------------------
+
+def run(seed, timeout, sample_width, cycles, switches, pkt_size):
+    bench = RXPathBench(source_width=64, fused_packer=True, adaptive_packets=True, runtime_ch_switch=True)
+    rx    = bench.rx
+    cfg   = bench.fpgacfg_manager
+    rng   = random.Random(seed)
+    times = set(rng.sample(range(50, cycles - 100), switches))
+
+    def generator():
+        yield cfg.ch_en.eq(0b0011)
+        yield cfg.smpl_width.eq(2 if sample_width == 12 else 0)
+        yield rx.pkt_size.storage.eq(pkt_size << 4)
+        yield rx.pkt_timeout.storage.eq(timeout)
+        yield cfg.rx_en.eq(1)
+        for _ in range(10):
+            yield
+        yield rx.sink.valid.eq(1)
+        yield rx.sink.keep.eq(2**16 - 1)
+        t = 0
+        for cycle in range(cycles):
+            if cycle in times:
+                yield cfg.ch_en.eq(rng.choice(MODES))
+            yield rx.sink.data.eq(sum(((4*t + i) & 0xffffffff) << (32*i) for i in range(4)))
+            yield
+            t += (yield rx.sink.ready)
+        yield rx.sink.valid.eq(0)
+        # Drain.
+        for _ in range(2*cycles):
+            yield
+
+    monitor = StreamMonitor(rx.source, fields=["data"], signed=[])
+    run_simulation(bench, {"sys": [generator()], "m": [monitor.generator()]}, clocks={"sys": 20, "m": 10})
+
+    raw = b"".join(int(word).to_bytes(8, "little") for word in monitor.data[:, 0])
+    packets, masks, total, errors = check_packets(raw, sample_width)
+    if len(masks) < 2:
+        errors.append("no channel switch reached the output")
+    return packets, masks, total, errors[:4]
+
+# Main ---------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Runtime channel switch testbench of RXPathTop.")
+    parser.add_argument("--seeds",         nargs="+", type=int, default=[1, 2, 3])
+    parser.add_argument("--timeouts",      nargs="+", type=int, default=[0, 40], help="pkt_timeout (0 = disabled)")
+    parser.add_argument("--sample-widths", nargs="+", type=int, default=[12, 16], choices=[12, 16])
+    parser.add_argument("--cycles",        type=int, default=1500, help="Sink cycles per run")
+    parser.add_argument("--switches",      type=int, default=6,    help="ch_en changes per run")
+    parser.add_argument("--pkt-size",      type=int, default=16,   help="Packet payload in 128-bit words")
+    args = parser.parse_args()
+
+    failures = 0
+    for sample_width in args.sample_widths:
+        for timeout in args.timeouts:
+            for seed in args.seeds:
+                packets, masks, total, errors = run(seed, timeout, sample_width, args.cycles, args.switches, args.pkt_size)
+                failures += bool(errors)
+                print(f"{sample_width}-bit timeout {timeout:3d} seed {seed}: {packets} packets, {total} sample times, "
+                      f"masks {sorted(masks)}" + ("" if not errors else " FAIL: " + "; ".join(errors)))
+
+    print("PASS" if failures == 0 else f"FAIL ({failures} runs failed)")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
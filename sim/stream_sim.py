@@ -0,0 +1,209 @@
+"""Batch stream drivers and monitors for Migen testbenches.
+
+Per-sample testbenches (``yield dut.sink.i.eq(int(stim[idx].real))`` for every field, then a
+ready poll) spend most of the simulation time in generator switches and int conversions.
+``StreamDriver`` and ``StreamMonitor`` take and return NumPy arrays (one row per beat, one
+column per field) and keep the per-cycle work to one batched write and one batched read:
+
+  - The driver converts the whole array to Python ints once and only rewrites the payload
+    after a handshake.
+  - The monitor reads valid and all fields with a single ``yield [...]`` and converts the
+    collected beats to an array (with sign extension) at the end.
+
+Both work on ``stream.Endpoint`` and on ``AXIStreamInterface`` (an Endpoint subclass; fields
+wider than 63 bits, e.g. a 128-bit ``data``, are carried as Python ints in object arrays,
+``pack_words``/``unpack_words`` convert them from/to sample arrays). Valid/ready
+backpressure follows repeating 0/1 patterns, ``random_pattern`` builds randomized ones.
+The generators run under ``run_simulation`` and under ``sim.verilator_sim.VerilatorSimulator``.
+
+Example:
+    driver  = StreamDriver(dut.sink, iq_to_beats(stim, dut.sink), valid_pattern=random_pattern(0.8))
+    monitor = StreamMonitor(dut.source, ready_pattern=[1, 1, 0])
+    run_simulation(dut, [driver.generator(), monitor.generator()])
+    output = beats_to_iq(monitor.data, dut.source)
+"""
+import itertools
+
+import numpy as np
+from migen import *
+from gateware.LimeDFB.Resampler.half_band_complex import SSR_FACTORS, lane_fields
+
+# Helpers ------------------------------------------------------------------------------------
+
+def payload_names(endpoint):
+    """Payload field names of a stream endpoint, in layout order."""
+    return [name for name, *_ in endpoint.description.payload_layout]
+
+def random_pattern(probability, length=1024, seed=0):
+    """Random 0/1 valid/ready pattern asserted with the given probability."""
+    return (np.random.default_rng(seed).random(length) < probability).astype(np.uint8)
+
+def sign_extend(values, width):
+    """Two's complement interpretation of unsigned width-bit values (NumPy arrays)."""
+    if width >= 64:
+        return np.array([v - (1 << width) if v >> (width - 1) else v for v in values], dtype=object)
+    half = 1 << (width - 1)
+    return ((np.asarray(values, dtype=np.int64) + half) & ((1 << width) - 1)) - half
+
+def iq_fields(endpoint):
+    """(i, q) field names of an IQ endpoint in sample order (1, 2, 4 or 8 samples per beat)."""
+    for lanes in reversed(SSR_FACTORS):
+        if hasattr(endpoint, lane_fields(lanes)[-1][0]):
+            return lane_fields(lanes)
+    return lane_fields(1)
+
+def iq_to_beats(samples, endpoint):
+    """Complex samples to a beats x fields array for an IQ endpoint (trailing samples that do not fill a beat are dropped)."""
+    lanes = iq_fields(endpoint)
+    samples = np.asarray(samples)
+    n_beats = len(samples) // len(lanes)
+    columns = {}
+    for k, (i, q) in enumerate(lanes):
+        lane = samples[k::len(lanes)][:n_beats]
+        columns[i] = lane.real.astype(np.int64)
+        columns[q] = lane.imag.astype(np.int64)
+    return np.stack([columns[name] for name in payload_names(endpoint)], axis=1)
+
+def beats_to_iq(beats, endpoint, fields=None):
+    """Monitor output of an IQ endpoint back to complex samples, in sample order."""
+    fields = payload_names(endpoint) if fields is None else list(fields)
+    lanes = iq_fields(endpoint)
+    beats = np.asarray(beats).reshape(-1, len(fields))
+    samples = [beats[:, fields.index(i)] + 1j * beats[:, fields.index(q)] for i, q in lanes]
+    return np.stack(samples, axis=1).reshape(-1)
+
+def pack_words(values, width, word_width):
+    """Pack width-bit values LSB-first into word_width-bit words (Python ints, object array)."""
+    per_word = word_width // width
+    mask = (1 << width) - 1
+    values = [int(v) & mask for v in np.asarray(values).reshape(-1)]
+    values += [0] * (-len(values) % per_word)
+    words = [sum(v << (width * k) for k, v in enumerate(values[n:n + per_word]))
+             for n in range(0, len(values), per_word)]
+    return np.array(words, dtype=object)
+
+def unpack_words(words, width, word_width, signed=True):
+    """Inverse of pack_words: word_width-bit words to a flat array of width-bit values."""
+    per_word = word_width // width
+    mask = (1 << width) - 1
+    values = np.array([(int(w) >> (width * k)) & mask for w in np.asarray(words).reshape(-1) for k in range(per_word)],
+                      dtype=np.int64)
+    return sign_extend(values, width) if signed else values
+
+# Driver -------------------------------------------------------------------------------------
+
+class StreamDriver:
+    """
+    Drives a sink endpoint with the rows of data (beats x fields, or 1-D for one field).
+
+    fields defaults to the payload fields in layout order; any endpoint signal can be listed
+    (e.g. "last" or "keep"). valid_pattern repeats over the cycles. After the last beat the
+    generator keeps running for flush cycles, then sets done.
+    """
+    def __init__(self, endpoint, data, fields=None, valid_pattern=(1,), flush=0):
+        self.endpoint = endpoint
+        self.fields   = payload_names(endpoint) if fields is None else list(fields)
+        self.signals  = [getattr(endpoint, name) for name in self.fields]
+        data = np.asarray(data)
+        if data.ndim == 1:
+            data = data.reshape(-1, 1)
+        assert data.shape[1] == len(self.signals), f"data has {data.shape[1]} columns for {len(self.signals)} fields"
+        # One Python int conversion for the whole stimulus, masked to the field widths
+        masks = [(1 << len(signal)) - 1 for signal in self.signals]
+        self.rows = [[int(v) & mask for v, mask in zip(row, masks)] for row in data.tolist()]
+        self.valid_pattern = [bool(v) for v in valid_pattern]
+        self.flush  = flush
+        self.cycles = 0
+        self.done   = False
+
+    def generator(self):
+        endpoint, signals = self.endpoint, self.signals
+        pattern = itertools.cycle(self.valid_pattern)
+        idx, loaded, valid = 0, -1, False
+        while idx < len(self.rows):
+            writes = []
+            if loaded != idx:
+                writes += [signal.eq(v) for signal, v in zip(signals, self.rows[idx])]
+                loaded = idx
+            if next(pattern) != valid:
+                valid = not valid
+                writes.append(endpoint.valid.eq(valid))
+            if writes:
+                yield writes
+            yield
+            self.cycles += 1
+            if valid and (yield endpoint.ready):
+                idx += 1
+        yield endpoint.valid.eq(0)
+        for _ in range(self.flush):
+            yield
+            self.cycles += 1
+        self.done = True
+
+# Monitor ------------------------------------------------------------------------------------
+
+class StreamMonitor:
+    """
+    Collects the beats of a source endpoint.
+
+    With count, the generator stays active until count beats have been received; without it
+    the generator is passive and collects until the other generators finish. Fields whose
+    name is in signed (all payload fields by default) are sign extended in data.
+    """
+    def __init__(self, endpoint, fields=None, ready_pattern=(1,), count=None, signed=None):
+        self.endpoint = endpoint
+        self.fields   = payload_names(endpoint) if fields is None else list(fields)
+        self.signals  = [getattr(endpoint, name) for name in self.fields]
+        self.signed   = set(payload_names(endpoint) if signed is None else signed)
+        self.ready_pattern = [bool(v) for v in ready_pattern]
+        self.count  = count
+        self.cycles = 0
+        self.beats  = []
+
+    def generator(self):
+        endpoint = self.endpoint
+        reads = [endpoint.valid] + self.signals
+        beats = self.beats
+        pattern = itertools.cycle(self.ready_pattern)
+        if self.count is None:
+            yield "passive"
+        ready = False
+        while self.count is None or len(beats) < self.count:
+            if next(pattern) != ready:
+                ready = not ready
+                yield endpoint.ready.eq(ready)
+            yield
+            self.cycles += 1
+            values = yield reads
+            if ready and values[0]:
+                beats.append(values[1:])
+        yield endpoint.ready.eq(0)
+
+    @property
+    def data(self):
+        """Received beats (beats x fields); int64, or object for fields wider than 63 bits."""
+        wide = any(len(signal) > 63 for signal in self.signals)
+        data = np.array(self.beats, dtype=object if wide else np.int64).reshape(-1, len(self.signals))
+        for k, (name, signal) in enumerate(zip(self.fields, self.signals)):
+            if name in self.signed and not signal.signed:
+                data[:, k] = sign_extend(data[:, k], len(signal))
+        return data
+
+# Simulation ---------------------------------------------------------------------------------
+
+def simulate_stream(dut, data, sink=None, source=None, count=None, flush=0, valid_pattern=(1,), ready_pattern=(1,),
+                    generators=(), simulator=None, **kwargs):
+    """
+    Push data through sink (default dut.sink) and return the beats collected on source
+    (default dut.source) with the driver and monitor. generators are run alongside (e.g.
+    CSR setup). simulator is a VerilatorSimulator, or None for Migen's run_simulation
+    (kwargs are passed on, e.g. vcd_name).
+    """
+    driver  = StreamDriver(dut.sink if sink is None else sink, data, valid_pattern=valid_pattern, flush=flush)
+    monitor = StreamMonitor(dut.source if source is None else source, ready_pattern=ready_pattern, count=count)
+    generators = [driver.generator(), monitor.generator(), *generators]
+    if simulator is None:
+        run_simulation(dut, generators, **kwargs)
+    else:
+        simulator.run(generators)
+    return monitor.data
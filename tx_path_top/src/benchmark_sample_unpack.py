@@ -0,0 +1,150 @@
+#
+# This file is part of LimeSDR_GW.
+#
+# Copyright (c) 2024-2025 Lime Microsystems.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Sustained throughput, latency and cost benchmark of the TX sample unpackers.
+
+    converters : sample_unpack128, Converter(128, 32) / Converter(128, 64) / Gearbox(128, 96)
+                 or bypass selected by the number of enabled channels.
+    no3ch      : sample_unpack128(enable_3Ch_mode=False) (3-channel mode not supported).
+    shared     : sample_unpack128_shared, one queue for all the modes.
+
+Each unpacker is simulated cycle by cycle with the sink valid every cycle (samples waiting in
+the packet buffers) and the source ready with the given probability. The sink words carry
+sequential sample numbers, so the output sample order is checked too. Per configuration it
+reports:
+  - samples_per_clock : output samples (all enabled channels) per clock
+  - beats_per_clock   : output beats per clock (1.0 = the DAC interface rate)
+  - latency_mean/max  : clocks from a sink word presented to its first sample on the source
+  - order_ok          : samples out in the input order, none lost
+  - ff_bits           : flip-flop bits of the unpacker (resource cost proxy)
+
+Example:
+    python3 -m gateware.LimeDFB.tx_path_top.src.benchmark_sample_unpack --ready-probabilities 1.0 0.5
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import sys
+
+import numpy as np
+
+from migen import *
+from migen.fhdl.tools import list_targets
+
+from gateware.LimeDFB.tx_path_top.src.sample_unpack128 import sample_unpack128, sample_unpack128_shared
+
+FIELDS = [
+    "unpacker", "channels", "ready_probability", "cycles", "samples_per_clock", "beats_per_clock",
+    "latency_mean", "latency_max", "order_ok", "ff_bits",
+]
+
+UNPACKERS = {
+    "converters" : lambda: sample_unpack128(),
+    "no3ch"      : lambda: sample_unpack128(enable_3Ch_mode=False),
+    "shared"     : lambda: sample_unpack128_shared(),
+}
+
+CH_EN = {1: 0b0001, 2: 0b0101, 3: 0b0111, 4: 0b1111}
+
+# Helpers ------------------------------------------------------------------------------------------
+
+def ff_bits(module):
+    """Flip-flop bits of a module (all the signals assigned synchronously)."""
+    fragment = module.get_fragment()
+    return sum(len(target) for statements in fragment.sync.values() for target in list_targets(statements))
+
+
+def run_config(unpacker, channels, ready_probability, words, max_cycles):
+    dut   = UNPACKERS[unpacker]()
+    ch_en = CH_EN[channels]
+    rng   = np.random.default_rng(channels)
+    ready = (rng.random(max_cycles) < ready_probability).tolist()
+    present, accepted, out = [], [], []
+
+    def generator():
+        yield dut.ch_en.eq(ch_en)
+        for _ in range(16): # ch_en evaluation after reset (sample_unpack128 FSM).
+            yield
+        k = 0
+        for cycle, r in enumerate(ready):
+            writes = [dut.source.ready.eq(r), dut.sink.valid.eq(k < words)]
+            if k < words and len(present) == k:
+                present.append(cycle)
+                writes.append(dut.sink.data.eq(sum((4*k + i) << (32*i) for i in range(4))))
+            yield writes
+            yield
+            sink_ready, source_valid, source_data = yield [dut.sink.ready, dut.source.valid, dut.source.data]
+            if k < words and sink_ready:
+                accepted.append(cycle)
+                k += 1
+            if r and source_valid:
+                out.append((cycle, source_data))
+                if len(out) * channels >= 4*words:
+                    break
+
+    run_simulation(dut, [generator()])
+
+    # Output samples in enabled channel order.
+    slots   = [i for i in range(4) if (ch_en >> i) & 1]
+    samples = [((data >> (32*i)) & 0xffffffff, c) for c, data in out for i in slots]
+    ids     = [s for s, _ in samples]
+    first   = {}
+    for s, c in samples:
+        first.setdefault(s // 4, c)
+    latency = [first[k] - c for k, c in enumerate(present) if k in first]
+    span    = (out[-1][0] - present[0] + 1) if out else max_cycles
+    return dict(
+        unpacker          = unpacker,
+        channels          = channels,
+        ready_probability = ready_probability,
+        cycles            = span,
+        samples_per_clock = len(samples) / span,
+        beats_per_clock   = len(out) / span,
+        latency_mean      = float(np.mean(latency)) if latency else float("nan"),
+        latency_max       = max(latency) if latency else -1,
+        order_ok          = ids[:4*words] == list(range(4*words)),
+        ff_bits           = ff_bits(UNPACKERS[unpacker]()),
+    )
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput, latency and cost benchmark of the TX sample unpackers.")
+    parser.add_argument("--unpackers", nargs="+", default=list(UNPACKERS), choices=list(UNPACKERS))
+    parser.add_argument("--channels",  nargs="+", type=int, default=[1, 2, 3, 4], choices=[1, 2, 3, 4])
+    parser.add_argument("--ready-probabilities", nargs="+", type=float, default=[1.0, 0.7, 0.5],
+                        help="Probability of source ready per cycle (1.0 = no backpressure)")
+    parser.add_argument("--words",     type=int, default=240,  help="Sink words per configuration")
+    parser.add_argument("--max-cycles", type=int, default=4000, help="Simulation length limit")
+    parser.add_argument("--format",    choices=["csv", "json"], default="csv")
+    parser.add_argument("--output",    default="-", help="Output file ('-' for stdout)")
+    args = parser.parse_args()
+
+    rows = []
+    for unpacker, channels, ready_probability in itertools.product(args.unpackers, args.channels, args.ready_probabilities):
+        row = run_config(unpacker, channels, ready_probability, args.words, args.max_cycles)
+        rows.append(row)
+        print(f"{unpacker:>10s} {channels}ch ready={ready_probability:.2f}: {row['samples_per_clock']:4.2f} samples/clk, "
+              f"{row['beats_per_clock']:4.2f} beats/clk, latency {row['latency_mean']:5.1f}/{row['latency_max']} clk, "
+              f"order {'ok' if row['order_ok'] else 'BAD'}, {row['ff_bits']} FF bits", file=sys.stderr)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    if args.format == "csv":
+        writer = csv.DictWriter(out, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: (f"{v:.3f}" if isinstance(v, float) else v) for k, v in row.items()})
+    else:
+        json.dump(rows, out, indent=2)
+    if out is not sys.stdout:
+        out.close()
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,9 @@ use ieee.numeric_std.all;
 -- Entity declaration
 -- ----------------------------------------------------------------------------
 entity sample_padder is
+  generic (
+      G_TLAST           : boolean := false -- M_AXIS_TLAST on the last padded word of a packet (else '0')
+  );
   port (
       --input ports 
       CLK       		: in  std_logic;
@@ -45,12 +48,14 @@ architecture arch of sample_padder is
 
    signal in_shift_cnt      : unsigned(3 downto 0);
    signal in_shift_reg_full : std_logic;
+   signal in_last           : std_logic;
 
    signal out_reg_load           : std_logic;
    signal out_reg_load_ack       : std_logic;
    signal out_reg_empty          : std_logic;
    signal out_reg_almost_empty   : std_logic; 
 	signal out_reg_shift_cnt      : unsigned(3 downto 0);
+   signal out_last               : std_logic;
 
 begin
 
@@ -75,6 +80,22 @@ begin
       end if;
    end process;
 
+   -- TLAST of the 3 input words, output with the last of the 4 padded words (G_TLAST)
+   process (CLK, RESET_N)
+   begin
+      if RESET_N = '0' then
+         in_last <= '0';
+      elsif rising_edge(CLK) then
+         if in_shift_reg_full ='0' AND S_AXIS_TVALID = '1' then 
+            if in_shift_cnt = 0 then 
+               in_last <= S_AXIS_TLAST;
+            else 
+               in_last <= in_last OR S_AXIS_TLAST;
+            end if;
+         end if;
+      end if;
+   end process;
+
    -- Counter for input buffer to determine when it is full. 
 	-- Counter is reset to 0 when content from input reg is loaded to output reg
    process (CLK, RESET_N)
@@ -122,6 +143,18 @@ begin
    end process;
 
    
+   process (CLK, RESET_N)
+   begin
+      if RESET_N = '0' then
+         out_last <= '0';
+      elsif rising_edge(CLK) then
+         if out_reg_load_ack = '1' then 
+            out_last <= in_last;
+         end if;
+      end if;
+   end process;
+
+   
    -- Output buffer load request signal
    process (CLK, RESET_N)
    begin
@@ -202,7 +235,9 @@ begin
    S_AXIS_TREADY <= not in_shift_reg_full when BYPASS = '0' else M_AXIS_TREADY;
    M_AXIS_TVALID <= not out_reg_empty     when BYPASS = '0' else S_AXIS_TVALID;
    M_AXIS_TDATA  <= out_shift_reg(3)      when BYPASS = '0' else S_AXIS_TDATA;
-	M_AXIS_TLAST  <= '0' 						when BYPASS = '0' else S_AXIS_TLAST;
+	M_AXIS_TLAST  <= S_AXIS_TLAST 				when BYPASS = '1' else 
+	                 out_last						when G_TLAST and out_reg_shift_cnt = 1 else 
+	                 '0';
 
 
 
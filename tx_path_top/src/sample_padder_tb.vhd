@@ -46,11 +46,15 @@ architecture tb_behave of sample_padder_tb is
    signal M_AXIS_TREADY  : std_logic;
    signal M_AXIS_TLAST   : std_logic;
 
+   -- Packets of 6 input words (2 padder groups), i.e. 8 padded output words
+   signal in_word_cnt  : unsigned(2 downto 0);
+   signal out_word_cnt : unsigned(2 downto 0);
+
 
 
 begin
 
-   S_AXIS_TLAST <= '0';
+   S_AXIS_TLAST <= '1' when in_word_cnt = 5 else '0';
 
    test_sample_array(0)<=x"aa555222555aaa555aaa555aaa555111";
    test_sample_array(1)<=x"5aaa555aaa555333555aaa555aaa555a";
@@ -146,8 +150,34 @@ begin
 
    S_AXIS_TDATA <= test_sample_array(to_integer(test_sample_cnt));
 
+   -- Packet framing: TLAST on the last input word of each packet must come out on the last
+   -- padded word of that packet
+   process (clk0, reset_n)
+   begin
+      if reset_n = '0' then
+         in_word_cnt  <= (others=>'0');
+         out_word_cnt <= (others=>'0');
+      elsif rising_edge(clk0) then
+         if S_AXIS_TVALID = '1' and S_AXIS_TREADY = '1' then 
+            if in_word_cnt = 5 then 
+               in_word_cnt <= (others=>'0');
+            else 
+               in_word_cnt <= in_word_cnt + 1;
+            end if;
+         end if;
+         if M_AXIS_TVALID = '1' and M_AXIS_TREADY = '1' then 
+            out_word_cnt <= out_word_cnt + 1;
+            assert (M_AXIS_TLAST = '1') = (out_word_cnt = 7)
+               report "M_AXIS_TLAST not on the last padded word of a packet" severity error;
+         end if;
+      end if;
+   end process;
+
 
    sample_padder_dut : entity work.sample_padder
+      generic map(
+         G_TLAST        => true
+      )
       port map(
           --input ports 
           CLK       		=> clk0,
@@ -12,7 +12,15 @@ from litex.soc.interconnect import stream
 from litex.soc.interconnect.stream import Converter, Gearbox
 
 class sample_unpack128(LiteXModule):
-    def __init__(self, enable_3Ch_mode=True
+    """
+    Unpacks the 128-bit sample words to the enabled channel slots (1, 2, 3 or 4 channels).
+
+    By default a ch_en change restarts the unpacker at once. With runtime_switch=True the new
+    ch_en is only taken between packets: once the beat with sink.last is unpacked, the next
+    packet is held until the converters are reconfigured, so no sample is lost or unpacked with
+    the wrong channel set and the stream does not need a reset.
+    """
+    def __init__(self, enable_3Ch_mode=True, runtime_switch=False
                  ):
         self.sink = AXIStreamInterface(128)
         self.source = AXIStreamInterface(128)
@@ -24,6 +32,14 @@ class sample_unpack128(LiteXModule):
 
         self.intermediate_data = Signal(128)
 
+        # Sink held (runtime_switch: ch_en change pending at a packet boundary).
+        hold       = Signal()
+        sink_valid = Signal()
+        self.comb += sink_valid.eq(self.sink.valid & ~hold)
+
+        # Channel set used by the unpacker.
+        ch_en = self.ch_en_reg if runtime_switch else self.ch_en
+
         self.num_chans = Signal(2)
         # To avoid invalid values, these are the values:
         # 00: 1 channel active
@@ -38,8 +54,8 @@ class sample_unpack128(LiteXModule):
         # FSM should be busy for longer than this
         self.sync += [
             # Add two pairs of adjacent bits
-            num_chans_var0.eq(self.ch_en[0] + self.ch_en[1]),
-            num_chans_var1.eq(self.ch_en[2] + self.ch_en[3]),
+            num_chans_var0.eq(ch_en[0] + ch_en[1]),
+            num_chans_var1.eq(ch_en[2] + ch_en[3]),
             # Add both pairs
             num_chans_var3.eq(num_chans_var0 + num_chans_var1),
             # Adjust the final value to fit in 2 bits
@@ -48,7 +64,8 @@ class sample_unpack128(LiteXModule):
 
         self.conv1ch = ResetInserter()(Converter(128, 32))
         self.conv2ch = ResetInserter()(Converter(128, 64))
-        self.conv3ch = ResetInserter()(Gearbox(128, 96))
+        # LSB first, as the converters (the default msb_first=True reorders the samples).
+        self.conv3ch = ResetInserter()(Gearbox(128, 96, msb_first=False))
         self.comb += [
             self.conv1ch.sink.data.eq(self.sink.data),
             self.conv2ch.sink.data.eq(self.sink.data),
@@ -58,10 +75,22 @@ class sample_unpack128(LiteXModule):
         # --------------------------------------------------
         # Multiplex width converters
         # --------------------------------------------------
+        def conv_output(conv):
+            # runtime_switch: no beat leaves a converter while the muxing is reevaluated.
+            if runtime_switch:
+                return [
+                    self.source.valid.eq(conv.source.valid & self.global_ready),
+                    conv.source.ready.eq(self.source.ready & self.global_ready),
+                ]
+            return [
+                self.source.valid.eq(conv.source.valid),
+                conv.source.ready.eq(self.source.ready),
+            ]
+
         cases = dict()
         cases[0] = [
             # Connect converter to module sink
-            self.conv1ch.sink.valid.eq(self.sink.valid),
+            self.conv1ch.sink.valid.eq(sink_valid),
             self.sink.ready.eq(self.conv1ch.sink.ready),
             # Keep in reset until global ready is set
             self.conv1ch.reset.eq(~self.global_ready),
@@ -72,12 +101,11 @@ class sample_unpack128(LiteXModule):
             self.intermediate_data[0:32].eq(self.conv1ch.source.data),
             self.intermediate_data[32:128].eq(0),
             # Assign control signals
-            self.source.valid.eq(self.conv1ch.source.valid),
-            self.conv1ch.source.ready.eq(self.source.ready),
+            *conv_output(self.conv1ch),
         ]
         cases[1] = [
             # Connect converter to module sink
-            self.conv2ch.sink.valid.eq(self.sink.valid),
+            self.conv2ch.sink.valid.eq(sink_valid),
             self.sink.ready.eq(self.conv2ch.sink.ready),
             # Keep other converters in reset
             self.conv1ch.reset.eq(1),
@@ -87,12 +115,11 @@ class sample_unpack128(LiteXModule):
             self.intermediate_data[0:64].eq(self.conv2ch.source.data),
             self.intermediate_data[64:128].eq(0),
             # Assign control signals
-            self.source.valid.eq(self.conv2ch.source.valid),
-            self.conv2ch.source.ready.eq(self.source.ready),
+            *conv_output(self.conv2ch),
         ]
         cases[2] = [
             # Connect converter to module sink
-             self.conv3ch.sink.valid.eq(self.sink.valid),
+             self.conv3ch.sink.valid.eq(sink_valid),
              self.sink.ready.eq(self.conv3ch.sink.ready),
             # Keep other converters in reset
             self.conv1ch.reset.eq(1),
@@ -102,8 +129,7 @@ class sample_unpack128(LiteXModule):
              self.intermediate_data[0:96].eq(self.conv3ch.source.data),
              self.intermediate_data[96:128].eq(0),
             # Assign control signals
-             self.source.valid.eq(self.conv3ch.source.valid),
-             self.conv3ch.source.ready.eq(self.source.ready),
+             *conv_output(self.conv3ch),
         ]
         if enable_3Ch_mode:
             cases[2].append(self.conv3ch.reset.eq(~self.global_ready))
@@ -118,11 +144,14 @@ class sample_unpack128(LiteXModule):
              self.conv3ch.reset.eq(1),
             # Full bypass, ignore all other logic, except for the muxing
             self.intermediate_data.eq(self.sink.data),
-            self.source.valid.eq(self.sink.valid & self.global_ready),
+            self.source.valid.eq(sink_valid & self.global_ready),
             self.sink.ready.eq(self.source.ready & self.global_ready),
         ]
 
-        self.comb += Case(self.num_chans, cases)
+        self.comb += [
+            Case(self.num_chans, cases),
+            If(hold, self.sink.ready.eq(0)),
+        ]
 
         # --------------------------------------------------
         # Figure out output assignments
@@ -155,14 +184,40 @@ class sample_unpack128(LiteXModule):
         self.active_chans_before = Signal(2)
 
         # Track if ch_en changes
-        self.sync += [
-            self.ch_en_reg.eq(self.ch_en),
-            If(self.ch_en_changed_reset, [
-                self.ch_en_changed.eq(0)
-            ]).Elif(self.ch_en_reg != self.ch_en, [
-                self.ch_en_changed.eq(1)
-            ])
-        ]
+        if runtime_switch:
+            # Take the new ch_en (stable for a cycle) between packets, once the converters are
+            # empty, and hold the sink until the muxing is reevaluated.
+            ch_en_d   = Signal(4)
+            in_packet = Signal()
+            switch    = Signal()
+            self.comb += [
+                hold.eq((~in_packet & (self.ch_en_reg != self.ch_en)) | self.ch_en_changed | ~self.global_ready),
+                switch.eq(~in_packet & (self.ch_en_reg != self.ch_en) & (self.ch_en == ch_en_d) &
+                    ~self.source.valid & ~self.ch_en_changed),
+            ]
+            self.sync += [
+                ch_en_d.eq(self.ch_en),
+                If(self.sink.valid & self.sink.ready,
+                    in_packet.eq(~self.sink.last),
+                ),
+                If(switch,
+                    self.ch_en_reg.eq(self.ch_en),
+                ),
+                If(self.ch_en_changed_reset, [
+                    self.ch_en_changed.eq(0)
+                ]).Elif(switch, [
+                    self.ch_en_changed.eq(1)
+                ])
+            ]
+        else:
+            self.sync += [
+                self.ch_en_reg.eq(self.ch_en),
+                If(self.ch_en_changed_reset, [
+                    self.ch_en_changed.eq(0)
+                ]).Elif(self.ch_en_reg != self.ch_en, [
+                    self.ch_en_changed.eq(1)
+                ])
+            ]
 
         # FSM
         self.submodules.fsm = fsm = FSM(reset_state="reset")
@@ -191,7 +246,7 @@ class sample_unpack128(LiteXModule):
 
         fsm.act("CH1", [
             # Handle CH1 value
-            If(self.ch_en[0], [
+            If(ch_en[0], [
                 # channel 1 is present
                 NextValue(self.ch1_mux_pointer, 1),
                 # active_chans_before should only ever be 0 at this moment
@@ -207,7 +262,7 @@ class sample_unpack128(LiteXModule):
 
         fsm.act("CH2", [
             # Handle CH2 value
-            If(self.ch_en[1], [
+            If(ch_en[1], [
                 NextValue(self.ch2_mux_pointer, self.active_chans_before + 1),
                 NextValue(self.active_chans_before, self.active_chans_before + 1),
             ]).Else([
@@ -219,7 +274,7 @@ class sample_unpack128(LiteXModule):
 
         fsm.act("CH3", [
             # Handle CH3 value
-            If(self.ch_en[2], [
+            If(ch_en[2], [
                 NextValue(self.ch3_mux_pointer, self.active_chans_before + 1),
                 NextValue(self.active_chans_before, self.active_chans_before + 1),
             ]).Else([
@@ -231,7 +286,7 @@ class sample_unpack128(LiteXModule):
 
         fsm.act("CH4", [
             # Handle CH4 value
-            If(self.ch_en[3], [
+            If(ch_en[3], [
                 NextValue(self.ch4_mux_pointer, self.active_chans_before + 1),
                 # Reset active_chans_before value before finishing just in case
                 NextValue(self.active_chans_before, 0),
@@ -280,3 +335,106 @@ class sample_unpack128(LiteXModule):
                 self.source.data[96:128].eq(data_slices[self.ch4_mux_pointer - 1]),
             ])
         ]
+
+
+class sample_unpack128_shared(LiteXModule):
+    """
+    Single datapath replacement for sample_unpack128 (same ports, same output).
+
+    The 32-bit samples of the sink words are queued (LSB first) in a 7-sample shift register;
+    every output beat takes the n oldest samples (n = number of enabled channels) and places them
+    in the enabled channel slots, the disabled ones are zero. The 1, 2, 3 and 4-channel modes
+    thus share one datapath instead of Converter(128, 32), Converter(128, 64), Gearbox(128, 96)
+    and the bypass, and the 3-channel mode costs nothing extra. One output beat per clock in every
+    mode, one cycle of latency. The queue is flushed when ch_en changes, or with
+    runtime_switch=True between packets (after sink.last) once less than a beat is left, as
+    sample_unpack128.
+    """
+    def __init__(self, runtime_switch=False):
+        self.sink   = AXIStreamInterface(128)
+        self.source = AXIStreamInterface(128)
+        self.ch_en  = Signal(4)
+
+        # # #
+
+        ch_en    = Signal(4)
+        pending  = Signal()
+        hold     = Signal()
+        changed  = Signal()
+        n        = Signal(3)
+        queue    = Signal(7*32)
+        level    = Signal(3) # Samples in queue.
+        left     = Signal(3) # Samples left after the output beat.
+        shifted  = Signal(7*32)
+        insert   = Signal(128)
+        in_fire  = Signal()
+        out_fire = Signal()
+
+        self.comb += [
+            pending.eq(ch_en != self.ch_en),
+            n.eq(ch_en[0] + ch_en[1] + ch_en[2] + ch_en[3]),
+        ]
+        if runtime_switch:
+            # Hold the next packet until the queue has less than a beat left (flushed).
+            ch_en_d   = Signal(4)
+            in_packet = Signal()
+            self.comb += [
+                hold.eq(pending & ~in_packet),
+                changed.eq(hold & (self.ch_en == ch_en_d) & ((n == 0) | (level < n))),
+            ]
+            self.sync += [
+                ch_en_d.eq(self.ch_en),
+                If(self.sink.valid & self.sink.ready,
+                    in_packet.eq(~self.sink.last),
+                ),
+            ]
+        else:
+            self.comb += [
+                hold.eq(pending),
+                changed.eq(pending),
+            ]
+        self.sync += If(changed, ch_en.eq(self.ch_en))
+
+        # Flow control.
+        self.comb += [
+            If(n == 0,
+                # No channel enabled: zero beats at the sink rate, as sample_unpack128.
+                self.source.valid.eq(self.sink.valid & ~hold),
+                self.sink.ready.eq(self.source.ready & ~hold),
+            ).Else(
+                self.source.valid.eq(level >= n),
+                self.sink.ready.eq(~hold & (left <= 3)),
+            ),
+            out_fire.eq(self.source.valid & self.source.ready & (n != 0)),
+            in_fire.eq(self.sink.valid & self.sink.ready & (n != 0)),
+            left.eq(level - Mux(out_fire, n, 0)),
+            insert.eq(Mux(in_fire, self.sink.data, 0)),
+        ]
+
+        # Queue: drop the n samples sent, append the 4 samples received.
+        self.comb += [
+            Case(Mux(out_fire, n, 0), {k: shifted.eq(queue >> (32*k)) for k in range(5)}),
+        ]
+        self.sync += [
+            Case(left, {**{l: queue.eq(shifted | (insert << (32*l))) for l in range(4)}, "default": queue.eq(shifted)}),
+            If(changed,
+                queue.eq(0),
+                level.eq(0),
+            ).Else(
+                level.eq(left + Mux(in_fire, 4, 0)),
+            )
+        ]
+
+        # Output: k-th oldest sample to the k-th enabled channel.
+        cases = {}
+        for en in range(16):
+            slots = []
+            k = 0
+            for i in range(4):
+                if (en >> i) & 1:
+                    slots.append(queue[32*k:32*k + 32])
+                    k += 1
+                else:
+                    slots.append(Constant(0, 32))
+            cases[en] = self.source.data.eq(Cat(*slots))
+        self.comb += Case(ch_en, cases)
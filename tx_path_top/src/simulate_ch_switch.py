@@ -0,0 +1,120 @@
+#
+# This file is part of LimeSDR_GW.
+#
+# Copyright (c) 2024-2025 Lime Microsystems.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Runtime channel switch testbench of the TX sample unpackers (runtime_switch=True).
+
+Packets of sequentially numbered 32-bit samples (sink.last on the last word of each packet)
+are unpacked with random source backpressure while ch_en changes at random cycles, mid packet
+included. Checks:
+  - every sample comes out once and in order (none lost or repeated across a switch),
+  - every output beat holds samples of a single packet,
+  - all the beats of a packet use the same channel slots (the switch waits for sink.last).
+The 12-bit path carries sink.last through sample_padder (G_TLAST, see sample_padder_tb.vhd).
+
+Example:
+    python3 -m gateware.LimeDFB.tx_path_top.src.simulate_ch_switch --seeds 1 2 3
+"""
+
+import argparse
+import random
+
+from migen import *
+
+from gateware.LimeDFB.tx_path_top.src.sample_unpack128 import sample_unpack128, sample_unpack128_shared
+
+UNPACKERS = {
+    "converters" : lambda: sample_unpack128(runtime_switch=True),
+    "shared"     : lambda: sample_unpack128_shared(runtime_switch=True),
+}
+
+MODES = [0b0001, 0b0101, 0b0111, 0b1111, 0b1010, 0b1101]
+
+# Simulation ---------------------------------------------------------------------------------------
+
+def run(unpacker, seed, packets, packet_words, switch_probability, ready_probability, max_cycles):
+    dut   = UNPACKERS[unpacker]()
+    rng   = random.Random(seed)
+    words = packets*packet_words
+    out   = []
+
+    def generator():
+        yield dut.ch_en.eq(0b0101)
+        for _ in range(20):
+            yield
+        k = 0
+        for _ in range(max_cycles):
+            writes = [dut.source.ready.eq(rng.random() < ready_probability)]
+            if rng.random() < switch_probability:
+                writes.append(dut.ch_en.eq(rng.choice(MODES)))
+            if k < words:
+                writes += [
+                    dut.sink.valid.eq(1),
+                    dut.sink.data.eq(sum((4*k + i + 1) << (32*i) for i in range(4))),
+                    dut.sink.last.eq(k % packet_words == packet_words - 1),
+                ]
+            else:
+                writes.append(dut.sink.valid.eq(0))
+            yield writes
+            yield
+            sink_ready, source_valid, source_data, source_ready = yield [
+                dut.sink.ready, dut.source.valid, dut.source.data, dut.source.ready]
+            if k < words and sink_ready:
+                k += 1
+            if source_valid and source_ready:
+                out.append([(source_data >> (32*i)) & 0xffffffff for i in range(4)])
+                if sum(1 for beat in out for x in beat if x) >= 4*words:
+                    break
+
+    run_simulation(dut, [generator()])
+
+    # Checks (sample numbers start at 1, a zero slot is a disabled channel).
+    errors  = []
+    samples = []
+    modes   = {}
+    for beat in out:
+        mask = sum(1 << i for i in range(4) if beat[i])
+        ids  = [x for x in beat if x]
+        pkts = {(x - 1) // (4*packet_words) for x in ids}
+        if len(pkts) != 1:
+            errors.append(f"beat {beat} spans packets {sorted(pkts)}")
+            continue
+        pkt = pkts.pop()
+        if modes.setdefault(pkt, mask) != mask:
+            errors.append(f"channel set change inside packet {pkt}")
+        samples += ids
+    if samples != list(range(1, 4*words + 1)):
+        errors.append(f"{len(samples)} samples out of {4*words}, order {'ok' if samples == sorted(samples) else 'BAD'}")
+    return len(set(modes.values())), errors[:4]
+
+# Main ---------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Runtime channel switch testbench of the TX sample unpackers.")
+    parser.add_argument("--unpackers",    nargs="+", default=list(UNPACKERS), choices=list(UNPACKERS))
+    parser.add_argument("--seeds",        nargs="+", type=int, default=[1, 2, 3])
+    parser.add_argument("--packets",      type=int, default=40)
+    parser.add_argument("--packet-words", type=int, default=6, help="Sink words per packet (24 samples)")
+    parser.add_argument("--switch-probability", type=float, default=0.01, help="ch_en change probability per cycle")
+    parser.add_argument("--ready-probability",  type=float, default=0.7)
+    parser.add_argument("--max-cycles",   type=int, default=20000)
+    args = parser.parse_args()
+
+    failures = 0
+    for unpacker in args.unpackers:
+        for seed in args.seeds:
+            modes, errors = run(unpacker, seed, args.packets, args.packet_words, args.switch_probability,
+                                args.ready_probability, args.max_cycles)
+            failures += bool(errors)
+            print(f"{unpacker:>10s} seed {seed}: {args.packets} packets, {modes} channel sets"
+                  + ("" if not errors else " FAIL: " + "; ".join(errors)))
+
+    print("PASS" if failures == 0 else f"FAIL ({failures} runs failed)")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
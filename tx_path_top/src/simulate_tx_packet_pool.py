@@ -0,0 +1,172 @@
+#
+# This file is part of LimeSDR_GW.
+#
+# Copyright (c) 2024-2025 Lime Microsystems.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Testbench of TXPacketPool (shared memory TX packet buffer).
+
+A stream of packets is written with random sink bubbles while sample_nr advances one sample
+every few clocks and the source sees random backpressure:
+  - on-time packets, spaced so that each one is reached by sample_nr after the previous one,
+  - late packets (timestamp in the past), released unread with a drop pulse,
+  - packets with the sync disable bit set, sent as soon as they are at the head,
+  - header-only packets (payload sizes below 16 bytes), consumed without a descriptor,
+  - payloads of 1 to max_words words in a small pool, so the ring wraps many times and the
+    writer waits for space (full).
+Checks: the payload words and last flags of the sent packets in order, no synced packet sent
+before its timestamp, one drop per late packet and pct_loss_flg, the pool wrapped and was
+filled up, and all the space is released at the end.
+
+Example:
+    python3 -m gateware.LimeDFB.tx_path_top.src.simulate_tx_packet_pool
+"""
+
+import argparse
+
+import numpy as np
+
+from migen import *
+
+from gateware.LimeDFB.tx_path_top.src.tx_path_top import TXPacketPool
+
+BASE         = 1000 # First timestamp.
+SAMPLE_CLKS  = 4    # Clocks per sample_nr increment.
+
+# Packets ------------------------------------------------------------------------------------------
+
+def packet_mix(count, max_words, rng):
+    """(kind, timestamp, size in bytes, sync disable bit) of count packets."""
+    packets = []
+    ts = BASE
+    for _ in range(count):
+        kind  = rng.choice(["on_time"] * 6 + ["late", "synch_dis", "header_only"])
+        words = int(rng.integers(1, max_words + 1))
+        size  = 16*words + int(rng.integers(0, 16))  # Partial last word ignored, as PCT2DATA_BUF_WR.
+        if kind == "on_time":
+            packets.append((kind, ts, size, 0))
+            ts += 3*words + 8
+        elif kind == "late":
+            packets.append((kind, BASE // 2, size, 0))
+        elif kind == "synch_dis":
+            packets.append((kind, 0, size, 1))
+        else:
+            packets.append((kind, ts, int(rng.integers(0, 16)), 0))
+    return packets
+
+def packet_words(timestamp, size, synch_dis, seq):
+    header = (timestamp << 64) | (size << 8) | (synch_dis << 4)
+    return [header] + [(seq << 32) | k for k in range(size // 16)]
+
+# Simulation ---------------------------------------------------------------------------------------
+
+def run(packets, pool_words, desc_depth, ready_probability, seed):
+    dut  = TXPacketPool(pool_words=pool_words, desc_depth=desc_depth)
+    rng  = np.random.default_rng(seed)
+    words = [w for seq, (_, *packet) in enumerate(packets) for w in packet_words(*packet, seq)]
+    state = dict(sample_nr=BASE - 200, drops=0, peak=0, full=0)
+    out   = []
+
+    @passive
+    def timebase():
+        clocks = 0
+        while True:
+            yield dut.sample_nr.eq(state["sample_nr"])
+            yield
+            clocks += 1
+            if clocks % SAMPLE_CLKS == 0:
+                state["sample_nr"] += 1
+            drop, full, level = yield [dut.drop, dut.full, dut.level]
+            state["drops"] += drop
+            state["full"]  += full
+            state["peak"]   = max(state["peak"], level)
+
+    def writer():
+        idx = 0
+        while idx < len(words):
+            valid = int(rng.random() < 0.8)
+            yield [dut.sink.valid.eq(valid), dut.sink.data.eq(words[idx])]
+            yield
+            if valid and (yield dut.sink.ready):
+                idx += 1
+        yield dut.sink.valid.eq(0)
+        # Until everything is sent or released.
+        for _ in range(64):
+            yield
+        while not (yield dut.empty):
+            yield
+        for _ in range(16):
+            yield
+        state["loss"] = yield dut.pct_loss_flg
+        yield dut.pct_loss_flg_clr.eq(1)
+        yield
+        yield dut.pct_loss_flg_clr.eq(0)
+        yield
+        state["loss_cleared"] = not (yield dut.pct_loss_flg)
+        state["level"] = yield dut.level
+
+    @passive
+    def reader():
+        while True:
+            ready = int(rng.random() < ready_probability)
+            yield dut.source.ready.eq(ready)
+            yield
+            valid, data, last = yield [dut.source.valid, dut.source.data, dut.source.last]
+            if ready and valid:
+                out.append((data, last, state["sample_nr"]))
+
+    run_simulation(dut, [timebase(), writer(), reader()])
+
+    # Expected.
+    sent = [(seq, kind, ts, size) for seq, (kind, ts, size, _) in enumerate(packets)
+            if kind in ["on_time", "synch_dis"] and size >= 16]
+    expected = [((seq << 32) | k, int(k == size // 16 - 1)) for seq, _, _, size in sent for k in range(size // 16)]
+    late = sum(kind == "late" for kind, *_ in packets)
+
+    errors = []
+    if [(data, last) for data, last, _ in out] != expected:
+        errors.append(f"output differs ({len(out)} words out, {len(expected)} expected)")
+    first = {}
+    for data, _, sample_nr in out:
+        first.setdefault(data >> 32, sample_nr)
+    early = [seq for seq, kind, ts, _ in sent if kind == "on_time" and first.get(seq, ts) < ts]
+    if early:
+        errors.append(f"packets {early[:4]} sent before their timestamp")
+    if state["drops"] != late or state["loss"] != (late > 0) or not state["loss_cleared"]:
+        errors.append(f"{state['drops']} drops for {late} late packets, pct_loss_flg {state['loss']}")
+    if state["level"] != 0:
+        errors.append(f"{state['level']} words still allocated")
+    stored = sum(size // 16 for _, _, size, _ in packets)
+    if stored < 2*pool_words or state["full"] == 0:
+        errors.append(f"scenario too small: {stored} words for a {pool_words} word pool, full {state['full']} cycles")
+    return dict(sent=len(sent), late=late, stored=stored, peak=state["peak"], full=state["full"]), errors
+
+# Main ---------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="TXPacketPool ring, late drop and backpressure testbench.")
+    parser.add_argument("--packets",    type=int, default=120, help="Packets per run")
+    parser.add_argument("--max-words",  type=int, default=24,  help="Largest payload (128-bit words)")
+    parser.add_argument("--pool-words", type=int, default=60, help="Not a power of 2, so the ring wraps explicitly")
+    parser.add_argument("--desc-depth", type=int, default=4)
+    parser.add_argument("--ready-probabilities", nargs="+", type=float, default=[1.0, 0.5],
+                        help="Probability of source ready per cycle (1.0 = no backpressure)")
+    parser.add_argument("--seed",       type=int, default=0)
+    args = parser.parse_args()
+
+    packets  = packet_mix(args.packets, args.max_words, np.random.default_rng(args.seed))
+    failures = 0
+    for k, ready_probability in enumerate(args.ready_probabilities):
+        stats, errors = run(packets, args.pool_words, args.desc_depth, ready_probability, args.seed + k)
+        failures += bool(errors)
+        print(f"ready={ready_probability:.2f}: {stats['sent']} packets sent, {stats['late']} late dropped, "
+              f"{stats['stored']} words through a {args.pool_words} word pool (peak {stats['peak']}, "
+              f"full {stats['full']} cycles)" + ("" if not errors else " FAIL: " + "; ".join(errors)))
+
+    print("PASS" if failures == 0 else f"FAIL ({failures} runs failed)")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
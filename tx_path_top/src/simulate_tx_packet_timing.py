@@ -0,0 +1,181 @@
+#
+# This file is part of LimeSDR_GW.
+#
+# Copyright (c) 2024-2025 Lime Microsystems.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Testbench of TXPacketTiming (timestamp accounting and early drop of late TX packets).
+
+A mix of packets is streamed through the stage with random sink bubbles and source
+backpressure:
+  - on-time, late within max_lateness, late by exactly max_lateness and by one more sample,
+  - late packets with the per packet sync disable bit set (never dropped),
+  - header-only packets (payload sizes below 16 bytes) and sizes that are not a multiple of 16,
+  - timestamps far ahead of or behind sample_nr (lead saturated to 32-bit).
+The output must be the input with exactly the packets the reference model drops removed
+(framing kept across dropped packets), and the counters, snapshot at the end, must match
+the model: early_drops, min_lead, and late_packets/underruns/full_stalls for random
+buf_clr/all_empty/all_full/out_valid/out_ready activity.
+
+Example:
+    python3 -m gateware.LimeDFB.tx_path_top.src.simulate_tx_packet_timing
+"""
+
+import argparse
+
+import numpy as np
+
+from migen import *
+
+from gateware.LimeDFB.tx_path_top.src.tx_path_top import TXPacketTiming
+
+SAMPLE_NR = 1 << 40
+
+# Packets ------------------------------------------------------------------------------------------
+
+def packet_mix(max_lateness, rng, count):
+    """(timestamp, size in bytes, sync disable bit) of count packets."""
+    leads = [
+        1000, 0, -1, -max_lateness, -max_lateness - 1, -10*max_lateness - 5,
+        (1 << 63) - SAMPLE_NR, -SAMPLE_NR,                   # Saturated leads.
+    ]
+    sizes = [0, 4, 8, 15, 16, 24, 40, 64, 256]
+    packets = []
+    for _ in range(count):
+        lead = int(rng.choice(leads)) if rng.random() < 0.7 else int(rng.integers(-3*max_lateness, 3*max_lateness + 1))
+        packets.append((SAMPLE_NR + lead, int(rng.choice(sizes)), int(rng.random() < 0.2)))
+    return packets
+
+def packet_words(timestamp, size, synch_dis, seq):
+    """Header word then size // 16 payload words (tagged with the packet sequence number)."""
+    header = (timestamp << 64) | (size << 8) | (synch_dis << 4)
+    return [header] + [(seq << 32) | (k + 1) for k in range(size // 16)]
+
+def lead_of(timestamp):
+    return timestamp - SAMPLE_NR
+
+def saturate32(value):
+    return max(-2**31, min(2**31 - 1, value))
+
+def to_signed32(value):
+    return value - (1 << 32) if value >> 31 else value
+
+# Simulation ---------------------------------------------------------------------------------------
+
+def run(drop_en, synch_dis, max_lateness, packets, seed, valid_probability=0.8, ready_probability=0.6):
+    dut = TXPacketTiming()
+    rng = np.random.default_rng(seed)
+    words = [w for seq, packet in enumerate(packets) for w in packet_words(*packet, seq)]
+    out = []
+    expected_counts = dict(late_packets=0, underruns=0, full_stalls=0)
+
+    def generator():
+        yield dut.control.fields.drop_en.eq(drop_en)
+        yield dut.max_lateness.storage.eq(max_lateness)
+        yield dut.sample_nr.eq(SAMPLE_NR)
+        yield dut.synch_dis.eq(synch_dis)
+        yield dut.control.fields.clear.eq(1)
+        yield
+        yield dut.control.fields.clear.eq(0)
+
+        idx = 0
+        buf_clr = all_empty = all_full = out_valid = 0
+        prev_buf_clr = prev_underrun = armed = 0
+        idle = 0
+        while idle < 32:
+            # Buffer side activity (runs of a few cycles, so edges and levels both occur).
+            if rng.random() < 0.2: buf_clr   = 1 - buf_clr
+            if rng.random() < 0.1: all_empty = 1 - all_empty
+            if rng.random() < 0.1: all_full  = 1 - all_full
+            if rng.random() < 0.3: out_valid = 1 - out_valid
+            out_ready = int(rng.random() < 0.7)
+            valid     = int(idx < len(words) and rng.random() < valid_probability)
+            yield [
+                dut.sink.valid.eq(valid),
+                dut.sink.data.eq(words[idx] if idx < len(words) else 0),
+                dut.source.ready.eq(int(rng.random() < ready_probability)),
+                dut.buf_clr.eq(buf_clr),
+                dut.all_empty.eq(all_empty),
+                dut.all_full.eq(all_full),
+                dut.out_valid.eq(out_valid),
+                dut.out_ready.eq(out_ready),
+            ]
+            yield
+            sink_ready, source_valid, source_ready, source_data = yield [
+                dut.sink.ready, dut.source.valid, dut.source.ready, dut.source.data]
+            if valid and sink_ready:
+                idx += 1
+            if source_valid and source_ready:
+                out.append(source_data)
+            idle = idle + 1 if idx == len(words) else 0
+
+            # Counter model.
+            underrun = armed & out_ready & (1 - out_valid) & all_empty
+            expected_counts["late_packets"] += buf_clr & (1 - prev_buf_clr)
+            expected_counts["underruns"]    += underrun & (1 - prev_underrun)
+            expected_counts["full_stalls"]  += source_valid & (1 - source_ready) & all_full
+            armed |= out_valid & out_ready
+            prev_buf_clr, prev_underrun = buf_clr, underrun
+
+        yield dut.sink.valid.eq(0)
+        yield dut.control.fields.snapshot.eq(1)
+        yield
+        yield dut.control.fields.snapshot.eq(0)
+        yield
+        counters = yield [dut.late_packets.status, dut.early_drops.status, dut.underruns.status,
+                          dut.full_stalls.status, dut.min_lead.status]
+        results.update(zip(["late_packets", "early_drops", "underruns", "full_stalls", "min_lead"], counters))
+
+    results = {}
+    run_simulation(dut, [generator()])
+    results["min_lead"] = to_signed32(results["min_lead"])
+
+    # Reference model.
+    synced  = [not synch_dis and not sd for _, _, sd in packets]
+    dropped = [s and drop_en and -lead_of(ts) > max_lateness for (ts, _, _), s in zip(packets, synced)]
+    kept    = [w for seq, (packet, d) in enumerate(zip(packets, dropped)) if not d for w in packet_words(*packet, seq)]
+    leads   = [saturate32(lead_of(ts)) for (ts, _, _), s in zip(packets, synced) if s]
+    expected = dict(expected_counts, early_drops=sum(dropped), min_lead=min(leads, default=2**31 - 1))
+
+    errors = []
+    if out != kept:
+        first = next((k for k, (a, b) in enumerate(zip(out, kept)) if a != b), min(len(out), len(kept)))
+        errors.append(f"output differs from word {first} ({len(out)} words out, {len(kept)} expected)")
+    for name, value in expected.items():
+        if results[name] != value:
+            errors.append(f"{name} {results[name]}, expected {value}")
+    return sum(dropped), expected, errors
+
+# Main ---------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="TXPacketTiming early drop and counter testbench.")
+    parser.add_argument("--packets",      type=int, default=200, help="Packets per run")
+    parser.add_argument("--max-lateness", type=int, default=100, help="Lateness threshold (samples)")
+    parser.add_argument("--seed",         type=int, default=0)
+    args = parser.parse_args()
+
+    rng     = np.random.default_rng(args.seed)
+    packets = packet_mix(args.max_lateness, rng, args.packets)
+    runs = [
+        # drop_en, synch_dis, max_lateness
+        (1, 0, args.max_lateness),
+        (1, 0, 0),
+        (0, 0, args.max_lateness),
+        (1, 1, args.max_lateness),
+    ]
+    failures = 0
+    for k, (drop_en, synch_dis, max_lateness) in enumerate(runs):
+        drops, expected, errors = run(drop_en, synch_dis, max_lateness, packets, seed=args.seed + k)
+        failures += bool(errors)
+        print(f"drop_en={drop_en} synch_dis={synch_dis} max_lateness={max_lateness:4d}: {drops:3d}/{len(packets)} dropped, "
+              f"min_lead {expected['min_lead']}, late {expected['late_packets']}, underruns {expected['underruns']}, "
+              f"full_stalls {expected['full_stalls']}" + ("" if not errors else " FAIL: " + "; ".join(errors)))
+
+    print("PASS" if failures == 0 else f"FAIL ({failures} runs failed)")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
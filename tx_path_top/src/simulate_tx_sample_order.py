@@ -0,0 +1,178 @@
+#
+# This file is part of LimeSDR_GW.
+#
+# Copyright (c) 2024-2025 Lime Microsystems.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+I/Q sample order testbench of the TX sample path (sample_padder + sample unpackers).
+
+The reference is the host packet format, not another unpacker: a packet payload is a byte
+stream of sample times, each holding the enabled channels in channel order (A, B, C, D), each
+channel one I/Q pair:
+  - 16-bit: I then Q, 2 bytes each, little endian,
+  - 12-bit: I and Q packed in 3 bytes, I in the 12 low bits (I | Q << 12, little endian).
+The payload is cut into 128-bit words (byte 0 in bits 7:0), 12-bit words go through the
+padder mapping read from sample_padder.vhd (3 words to 4 words, 12-bit fields padded to
+16-bit), then through the unpacker under test. Every output beat must hold sample time t in
+the enabled channel slots, I in bits 15:0 and Q in bits 31:16 of the slot, the disabled
+slots zero.
+
+Example:
+    python3 -m gateware.LimeDFB.tx_path_top.src.simulate_tx_sample_order --channels 0b0111
+"""
+
+import argparse
+import os
+import random
+import re
+
+from migen import *
+
+from gateware.LimeDFB.tx_path_top.src.sample_unpack128 import sample_unpack128, sample_unpack128_shared
+
+UNPACKERS = {
+    "converters" : lambda: sample_unpack128(),
+    "shared"     : lambda: sample_unpack128_shared(),
+}
+
+CH_EN = [0b0001, 0b0011, 0b0101, 0b0111, 0b1011, 0b1101, 0b1111]
+
+# Host Packet Format -------------------------------------------------------------------------------
+
+def host_payload(samples, sample_width):
+    """Payload bytes of samples[t][k] = (i, q) of the k-th enabled channel at sample time t."""
+    payload = bytearray()
+    for group in samples:
+        for i, q in group:
+            if sample_width == 16:
+                payload += (i & 0xffff).to_bytes(2, "little") + (q & 0xffff).to_bytes(2, "little")
+            else:
+                payload += ((i & 0xfff) | ((q & 0xfff) << 12)).to_bytes(3, "little")
+    return payload
+
+def payload_words(payload):
+    return [int.from_bytes(payload[16*k:16*k + 16], "little") for k in range(len(payload) // 16)]
+
+# Padder Mapping -----------------------------------------------------------------------------------
+
+def padder_mapping(path=os.path.join(os.path.dirname(__file__), "sample_padder.vhd")):
+    """
+    out_shift_reg bit ranges of sample_padder.vhd as {(out_word, high, low): [pieces]}, a piece
+    being (in_word, high, low) or a constant bit string, MSB first as in the VHDL.
+    """
+    target = re.compile(r"out_shift_reg\((\d)\)\((\d+)\s+downto\s+(\d+)\s*\)\s*<=\s*(.*?);")
+    source = re.compile(r"in_shift_reg\((\d)\)\((\d+)\s+downto\s+(\d+)\s*\)")
+    mapping = {}
+    with open(path) as f:
+        for line in f:
+            match = target.search(line)
+            if match is None:
+                continue
+            pieces = []
+            for piece in match.group(4).split("&"):
+                piece = piece.strip()
+                slice_ = source.fullmatch(piece)
+                pieces.append(tuple(map(int, slice_.groups())) if slice_ else piece.strip('"'))
+            mapping[tuple(map(int, match.groups()[:3]))] = pieces
+    assert len(mapping) == 32, "sample_padder.vhd: unexpected out_shift_reg mapping"
+    return mapping
+
+def pad(words, mapping):
+    """Padded output words of the 12-bit input words (3 in, 4 out, out_shift_reg(3) first)."""
+    out = []
+    for k in range(0, len(words) - len(words) % 3, 3):
+        # in_shift_reg(2) holds the first word of the group, in_shift_reg(0) the last.
+        in_reg = {2: words[k], 1: words[k + 1], 0: words[k + 2]}
+        out_reg = {n: 0 for n in range(4)}
+        for (n, high, low), pieces in mapping.items():
+            value = 0
+            for piece in pieces:
+                if isinstance(piece, tuple):
+                    word, h, l = piece
+                    value = (value << (h - l + 1)) | ((in_reg[word] >> l) & ((1 << (h - l + 1)) - 1))
+                else:
+                    value = (value << len(piece)) | int(piece, 2)
+            assert value < 1 << (high - low + 1)
+            out_reg[n] |= value << low
+        out += [out_reg[3], out_reg[2], out_reg[1], out_reg[0]]
+    return out
+
+# Simulation ---------------------------------------------------------------------------------------
+
+def run(unpacker, ch_en, sample_width, times, seed, ready_probability=0.7):
+    rng      = random.Random(seed)
+    channels = [c for c in range(4) if (ch_en >> c) & 1]
+    limit    = 1 << (sample_width - 1)
+    samples  = [[(rng.randrange(-limit, limit), rng.randrange(-limit, limit)) for _ in channels] for _ in range(times)]
+    words    = payload_words(host_payload(samples, sample_width))
+    if sample_width == 12:
+        words = pad(words, padder_mapping())
+
+    dut = UNPACKERS[unpacker]()
+    out = []
+
+    def generator():
+        yield dut.ch_en.eq(ch_en)
+        for _ in range(16): # ch_en evaluation after reset (sample_unpack128 FSM).
+            yield
+        k = 0
+        for _ in range(8*len(words) + 64):
+            writes = [dut.source.ready.eq(rng.random() < ready_probability), dut.sink.valid.eq(k < len(words))]
+            if k < len(words):
+                writes.append(dut.sink.data.eq(words[k]))
+            yield writes
+            yield
+            sink_ready, source_valid, source_ready, source_data = yield [
+                dut.sink.ready, dut.source.valid, dut.source.ready, dut.source.data]
+            if k < len(words) and sink_ready:
+                k += 1
+            if source_valid and source_ready:
+                out.append(source_data)
+                if len(out) == times:
+                    break
+
+    run_simulation(dut, [generator()])
+
+    # Expected slots: I in bits 15:0, Q in bits 31:16, 12-bit samples MSB aligned by the padder.
+    shift = 16 - sample_width
+    errors = []
+    for t, group in enumerate(samples[:len(out)]):
+        expected = [0]*4
+        for c, (i, q) in zip(channels, group):
+            expected[c] = (((i << shift) & 0xffff) | (((q << shift) & 0xffff) << 16))
+        got = [(out[t] >> (32*c)) & 0xffffffff for c in range(4)]
+        if got != expected:
+            errors.append(f"sample time {t}: slots {' '.join(f'{v:08x}' for v in got)}, "
+                          f"expected {' '.join(f'{v:08x}' for v in expected)}")
+            break
+    if len(out) != times:
+        errors.append(f"{len(out)} output beats for {times} sample times")
+    return errors
+
+# Main ---------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="I/Q sample order testbench of the TX padder and unpackers.")
+    parser.add_argument("--unpackers",     nargs="+", default=list(UNPACKERS), choices=list(UNPACKERS))
+    parser.add_argument("--channels",      nargs="+", type=lambda v: int(v, 0), default=CH_EN, help="ch_en values")
+    parser.add_argument("--sample-widths", nargs="+", type=int, default=[16, 12], choices=[12, 16])
+    parser.add_argument("--times",         type=int, default=96, help="Sample times per run (multiple of 16)")
+    parser.add_argument("--seed",          type=int, default=0)
+    args = parser.parse_args()
+
+    failures = 0
+    for unpacker in args.unpackers:
+        for sample_width in args.sample_widths:
+            for ch_en in args.channels:
+                errors = run(unpacker, ch_en, sample_width, args.times, args.seed)
+                failures += bool(errors)
+                print(f"{unpacker:>10s} {sample_width}-bit ch_en={ch_en:04b}: "
+                      + ("ok" if not errors else "FAIL: " + "; ".join(errors)))
+
+    print("PASS" if failures == 0 else f"FAIL ({failures} runs failed)")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -17,10 +17,13 @@ TX Path Top Module Structure:
     Input Buffer (CDC s_clk -> m_clk)
     |
     v
+    Packet Timing / Early Drop (optional, with_pkt_timing) <---- rx_sample_nr
+    |
+    v
     PCT2DATA Buffer Writer
     |
     v
-    Multiple Buffer FIFOs (BUFF_COUNT)
+    Multiple Buffer FIFOs (BUFF_COUNT)    (packet_pool: TXPacketPool, one shared memory)
     |
     v
     PCT2DATA Buffer Reader <---- Sample Number FIFO (CDC rx_clk -> m_clk)
@@ -29,7 +32,11 @@ TX Path Top Module Structure:
     Sample Padder (12->16 bit)
     |
     v
-    Sample Unpacker
+    Sample Unpacker                       (shared_unpacker: sample_unpack128_shared, output4channels)
+                                          (runtime_ch_switch: ch_en taken between packets)
+    |
+    v
+    Timed Burst Gate (optional, with_scheduler) <---- rx_sample_nr
     |
     v
     AXI Stream Output (64)
@@ -42,15 +49,19 @@ from types import SimpleNamespace
 from litex.soc.interconnect.stream import ClockDomainCrossing
 from migen import *
 
-from migen.genlib.cdc import MultiReg
+from migen.genlib.cdc import MultiReg, PulseSynchronizer
 
 from litex.gen import *
 
 from litex.soc.interconnect.axi.axi_stream import AXIStreamInterface
+from litex.soc.interconnect.csr            import CSRStatus, CSRStorage, CSRField
 from litex.soc.interconnect                import stream
 
 from gateware.common import *
 
+from gateware.LimeDFB.general.stream_perf_counters import StreamPerfCounters
+from gateware.LimeDFB.general.timed_stream_gate    import TimedStreamGate
+
 # TX Path Top --------------------------------------------------------------------------------------
 
 class TXPathTop(LiteXModule):
@@ -65,12 +76,26 @@ class TXPathTop(LiteXModule):
         m_clk_domain      = "lms_tx",
         s_clk_domain      = "lms_tx",
         output4channels   = False,
-        input_buff_size   = 512
+        shared_unpacker   = False,
+        runtime_ch_switch = False,
+        input_buff_size   = 512,
+        packet_pool       = False,
+        pool_words        = None,
+        pool_slots        = 16,
+        with_scheduler    = False,
+        with_pkt_timing   = False,
+        with_counters     = False,
         ):
         #Input buffer acts as CDC, so a minimum of 4 depth is required to instantiate the async FIFO
         assert input_buff_size >= (128*4), "TXPathTop input_buff_size must be greater than or equal to 4 cycles of 128bit"
 
         assert fpgacfg_manager is not None
+        assert not runtime_ch_switch or output4channels, "TXPathTop runtime_ch_switch requires output4channels"
+
+        # Packet pool: same memory as the BUFF_COUNT buffers by default, shared by pool_slots packets.
+        if pool_words is None:
+            pool_words = BUFF_COUNT*PCT_MAX_SIZE//16
+        assert not packet_pool or pool_words >= PCT_MAX_SIZE//16, "TXPathTop pool_words must hold a PCT_MAX_SIZE packet"
 
         self.platform          = platform
 
@@ -204,152 +229,192 @@ class TXPathTop(LiteXModule):
             # Async fifo used by ClockDomainCrossing does not have a reset
             # Passing reset as a ready signal to clear out the fifo is a workaround
             conv_64_to_128.source.ready.eq(input_buff.sink.ready | ~s_reset_n),
-            input_buff.source.ready.eq(p2d_wr_sink_ready | ~m_reset_n),
         ]
 
-        self.pct2data_buf_wr = Instance("PCT2DATA_BUF_WR",
-            # Parameters.
-            p_G_BUFF_COUNT    = BUFF_COUNT,
-
-            # Clk/Reset.
-            i_AXIS_ACLK       = ClockSignal(m_clk_domain),    # m_axis_domain
-            i_S_AXIS_ARESET_N = m_reset_n,                    # m_axis_domain.a_reset_n
-
-            # AXI Stream Slave
-            i_S_AXIS_TVALID   = input_buff.source.valid,
-            i_S_AXIS_TDATA    = input_buff.source.data,
-            o_S_AXIS_TREADY   = p2d_wr_sink_ready,
-            i_S_AXIS_TLAST    = input_buff.source.last,
-
-            # AXI Stream Master
-            i_M_AXIS_ARESET_N = m_reset_n,                    # m_axis_domain.a_reset_n
-            o_M_AXIS_TVALID   = p2d_wr_tvalid,
-            o_M_AXIS_TDATA    = p2d_wr_tdata,
-            i_M_AXIS_TREADY   = p2d_wr_tready,
-            o_M_AXIS_TLAST    = p2d_wr_tlast,
-
-            i_BUF_EMPTY       = p2d_wr_buf_empty,
-            i_RESET_N         = self.ext_reset_n,
-        )
-
-        cases = {}
-
-        # local variables to avoid mismatch between
-        # data_width and tkeep_width
-        packet_mode = True
-        data_width  = 128
-        tkeep_width = int(data_width/8)
-        fifo_depth  = int(PCT_MAX_SIZE/(128/8))
-
-        force_convert = platform.vhd2v_force
-        # May be problematic if we need to use fifo somewhere else
-        self.fifo_src_conv =  VHD2VConverter(platform,
-                              work_package   = "work",
-                              force_convert  = force_convert,
-                              flatten_source = False,
-                              add_instance   = False,
-                              files    = ["gateware/LimeDFB/axis_fifo/src/axis_fifo.vhd",
-                                          "gateware/LimeDFB/axis_fifo/src/wptr_handler.vhd",
-                                          "gateware/LimeDFB/axis_fifo/src/rptr_handler.vhd",
-                                          "gateware/LimeDFB/axis_fifo/src/ram_mem_wrapper.vhd",
-                                          # VHD2VConverter is not able to convert this file.
-                                          # OK because it is not used in "Generic" implementation
-                                          #"gateware/LimeDFB/axis_fifo/src/xilinx_simple_dual_port_2_clock_ram.vhd",
-                                          "gateware/LimeDFB/cdc/src/cdc_sync_bit.vhd",
-                                          "gateware/LimeDFB/cdc/src/cdc_sync_bus.vhd",
-                                          ],
-                              params= {
-                                  'p_G_VENDOR'      : "GENERIC", # Only "GENERIC" supported for now
-                                  'p_G_PACKET_MODE' : "true" if packet_mode else "false",
-                                  'p_g_DATA_WIDTH'  : data_width,
-                                  'p_g_FIFO_DEPTH'  : fifo_depth,
-                              },
-                              top_entity='axis_fifo'
-                              )
-
-        # -1 to fix off by one error
-        for i in range(BUFF_COUNT):
-            usedw_width = math.ceil(math.log2(fifo_depth))
-            # wr_usedw = Signal(usedw_width+1)
-            # rd_usedw = Signal(usedw_width+1)
-            sample_data_out = Signal(data_width)
-
-            fifo_dict = {
-                # --- Ports (s_axis) ---
-                "i_s_axis_aresetn": (m_reset_n & self.ext_reset_n & p2d_rd_resetn[i]),
-                "i_s_axis_aclk":    ClockSignal(m_clk_domain),
-                "i_s_axis_tvalid":  p2d_wr_tvalid[i],
-                "o_s_axis_tready":  p2d_wr_tready[i],
-                "i_s_axis_tdata":   p2d_wr_tdata,
-                "i_s_axis_tkeep":   Replicate(1, tkeep_width),
-                "i_s_axis_tlast":   p2d_wr_tlast[i],
-
-                # --- Ports (m_axis) ---
-                "i_m_axis_aresetn": (m_reset_n & self.ext_reset_n & p2d_rd_resetn[i]),
-                "i_m_axis_aclk":    ClockSignal(m_clk_domain),
-                "o_m_axis_tvalid":  p2d_rd_tvalid[i],
-                "i_m_axis_tready":  p2d_rd_tready[i],
-                "o_m_axis_tdata":   sample_data_out,
-                "o_m_axis_tkeep":   Open(),
-                "o_m_axis_tlast":   p2d_rd_tlast[i],
-
-                # --- Ports (usedw) ---
-                "o_rdusedw":        Open(),
-                "o_wrusedw":        Open(),
-            }
-
-            if force_convert:
-                fifo_config = fifo_dict
-            else:
-                fifo_config = fifo_dict.copy()
-                fifo_config["p_G_FIFO_DEPTH"] = fifo_depth
-                fifo_config["p_G_DATA_WIDTH"] = data_width
-
-            self.packet_buf = Instance("axis_fifo", **fifo_config)
-
-            self.comb +=[
-                p2d_wr_buf_empty[i].eq(~p2d_rd_tvalid[i])
+        # Late packets are discarded here before they take one of the BUFF_COUNT buffers.
+        if with_pkt_timing:
+            self.packet_timing = TXPacketTiming(clock_domain=m_clk_domain)
+            self.comb += [
+                self.packet_timing.rst.eq(      ~(m_reset_n & self.ext_reset_n)),
+                self.packet_timing.sample_nr.eq(rx_sample_nr_sync),
+                self.packet_timing.synch_dis.eq(synch_dis),
+                self.packet_timing.out_valid.eq(self.source.valid),
+                self.packet_timing.out_ready.eq(self.source.ready),
+                input_buff.source.connect(self.packet_timing.sink, omit=["ready"]),
+                input_buff.source.ready.eq(self.packet_timing.sink.ready | ~m_reset_n),
+                self.packet_timing.source.ready.eq(p2d_wr_sink_ready),
             ]
+            p2d_wr_source = self.packet_timing.source
+        else:
+            self.comb += input_buff.source.ready.eq(p2d_wr_sink_ready | ~m_reset_n)
+            p2d_wr_source = input_buff.source
+
+        if packet_pool:
+            # Shared memory pool: variable size slots and a descriptor FIFO (see TXPacketPool).
+            pool = TXPacketPool(pool_words=pool_words, desc_depth=pool_slots)
+            pool = ResetInserter()(ClockDomainsRenamer(m_clk_domain)(pool))
+            self.packet_pool = pool
+            self.comb += [
+                pool.reset.eq(~(m_reset_n & self.ext_reset_n)),
+                pool.sink.valid.eq(p2d_wr_source.valid),
+                pool.sink.data.eq(p2d_wr_source.data),
+                p2d_wr_sink_ready.eq(pool.sink.ready),
+                pool.sample_nr.eq(rx_sample_nr_sync),
+                pool.synch_dis.eq(synch_dis),
+                pool.pct_loss_flg_clr.eq(pct_loss_flg_clr),
+                self.pct_loss_flg.eq(pool.pct_loss_flg),
+                data_pad_tvalid.eq(pool.source.valid),
+                data_pad_tdata.eq(pool.source.data),
+                data_pad_tlast.eq(pool.source.last),
+                pool.source.ready.eq(data_pad_tready),
+            ]
+        else:
+            self.pct2data_buf_wr = Instance("PCT2DATA_BUF_WR",
+                # Parameters.
+                p_G_BUFF_COUNT    = BUFF_COUNT,
 
-            cases[i] = p2d_rd_tdata.eq(sample_data_out)
-
-        # Mux data input for p2d_rd
-        self.comb += Case(curr_buf_index, cases)
+                # Clk/Reset.
+                i_AXIS_ACLK       = ClockSignal(m_clk_domain),    # m_axis_domain
+                i_S_AXIS_ARESET_N = m_reset_n,                    # m_axis_domain.a_reset_n
 
-        self.pct2data_buf_rd = Instance("PCT2DATA_BUF_RD",
-            # Parameters.
-            p_G_BUFF_COUNT       = BUFF_COUNT,
+                # AXI Stream Slave
+                i_S_AXIS_TVALID   = p2d_wr_source.valid,
+                i_S_AXIS_TDATA    = p2d_wr_source.data,
+                o_S_AXIS_TREADY   = p2d_wr_sink_ready,
+                i_S_AXIS_TLAST    = p2d_wr_source.last,
 
-            # Clk/Reset.
-            i_AXIS_ACLK          = ClockSignal(m_clk_domain), #m_axis_domain
+                # AXI Stream Master
+                i_M_AXIS_ARESET_N = m_reset_n,                    # m_axis_domain.a_reset_n
+                o_M_AXIS_TVALID   = p2d_wr_tvalid,
+                o_M_AXIS_TDATA    = p2d_wr_tdata,
+                i_M_AXIS_TREADY   = p2d_wr_tready,
+                o_M_AXIS_TLAST    = p2d_wr_tlast,
+
+                i_BUF_EMPTY       = p2d_wr_buf_empty,
+                i_RESET_N         = self.ext_reset_n,
+            )
 
-            # AXI Stream Slave.
-            i_S_AXIS_ARESET_N    = m_reset_n,                 # m_axis_domain.a_reset_n (iqsample)
-            o_S_AXIS_BUF_RESET_N = p2d_rd_resetn,
-            i_S_AXIS_TVALID      = p2d_rd_tvalid,
-            i_S_AXIS_TDATA       = p2d_rd_tdata,
-            o_S_AXIS_TREADY      = p2d_rd_tready,
-            i_S_AXIS_TLAST       = p2d_rd_tlast,
+            cases = {}
+
+            # local variables to avoid mismatch between
+            # data_width and tkeep_width
+            packet_mode = True
+            data_width  = 128
+            tkeep_width = int(data_width/8)
+            fifo_depth  = int(PCT_MAX_SIZE/(128/8))
+
+            force_convert = platform.vhd2v_force
+            # May be problematic if we need to use fifo somewhere else
+            self.fifo_src_conv =  VHD2VConverter(platform,
+                                  work_package   = "work",
+                                  force_convert  = force_convert,
+                                  flatten_source = False,
+                                  add_instance   = False,
+                                  files    = ["gateware/LimeDFB/axis_fifo/src/axis_fifo.vhd",
+                                              "gateware/LimeDFB/axis_fifo/src/wptr_handler.vhd",
+                                              "gateware/LimeDFB/axis_fifo/src/rptr_handler.vhd",
+                                              "gateware/LimeDFB/axis_fifo/src/ram_mem_wrapper.vhd",
+                                              # VHD2VConverter is not able to convert this file.
+                                              # OK because it is not used in "Generic" implementation
+                                              #"gateware/LimeDFB/axis_fifo/src/xilinx_simple_dual_port_2_clock_ram.vhd",
+                                              "gateware/LimeDFB/cdc/src/cdc_sync_bit.vhd",
+                                              "gateware/LimeDFB/cdc/src/cdc_sync_bus.vhd",
+                                              ],
+                                  params= {
+                                      'p_G_VENDOR'      : "GENERIC", # Only "GENERIC" supported for now
+                                      'p_G_PACKET_MODE' : "true" if packet_mode else "false",
+                                      'p_g_DATA_WIDTH'  : data_width,
+                                      'p_g_FIFO_DEPTH'  : fifo_depth,
+                                  },
+                                  top_entity='axis_fifo'
+                                  )
+
+            # -1 to fix off by one error
+            for i in range(BUFF_COUNT):
+                usedw_width = math.ceil(math.log2(fifo_depth))
+                # wr_usedw = Signal(usedw_width+1)
+                # rd_usedw = Signal(usedw_width+1)
+                sample_data_out = Signal(data_width)
+
+                fifo_dict = {
+                    # --- Ports (s_axis) ---
+                    "i_s_axis_aresetn": (m_reset_n & self.ext_reset_n & p2d_rd_resetn[i]),
+                    "i_s_axis_aclk":    ClockSignal(m_clk_domain),
+                    "i_s_axis_tvalid":  p2d_wr_tvalid[i],
+                    "o_s_axis_tready":  p2d_wr_tready[i],
+                    "i_s_axis_tdata":   p2d_wr_tdata,
+                    "i_s_axis_tkeep":   Replicate(1, tkeep_width),
+                    "i_s_axis_tlast":   p2d_wr_tlast[i],
+
+                    # --- Ports (m_axis) ---
+                    "i_m_axis_aresetn": (m_reset_n & self.ext_reset_n & p2d_rd_resetn[i]),
+                    "i_m_axis_aclk":    ClockSignal(m_clk_domain),
+                    "o_m_axis_tvalid":  p2d_rd_tvalid[i],
+                    "i_m_axis_tready":  p2d_rd_tready[i],
+                    "o_m_axis_tdata":   sample_data_out,
+                    "o_m_axis_tkeep":   Open(),
+                    "o_m_axis_tlast":   p2d_rd_tlast[i],
+
+                    # --- Ports (usedw) ---
+                    "o_rdusedw":        Open(),
+                    "o_wrusedw":        Open(),
+                }
+
+                if force_convert:
+                    fifo_config = fifo_dict
+                else:
+                    fifo_config = fifo_dict.copy()
+                    fifo_config["p_G_FIFO_DEPTH"] = fifo_depth
+                    fifo_config["p_G_DATA_WIDTH"] = data_width
+
+                self.packet_buf = Instance("axis_fifo", **fifo_config)
+
+                self.comb +=[
+                    p2d_wr_buf_empty[i].eq(~p2d_rd_tvalid[i])
+                ]
+
+                cases[i] = p2d_rd_tdata.eq(sample_data_out)
+
+            # Mux data input for p2d_rd
+            self.comb += Case(curr_buf_index, cases)
+
+            self.pct2data_buf_rd = Instance("PCT2DATA_BUF_RD",
+                # Parameters.
+                p_G_BUFF_COUNT       = BUFF_COUNT,
 
-            # AXI Stream Master.
-            i_M_AXIS_ARESET_N    = m_reset_n,               # m_axis_domain.a_reset_n (iqsample)
-            o_M_AXIS_TVALID      = data_pad_tvalid,
-            o_M_AXIS_TDATA       = data_pad_tdata,
-            i_M_AXIS_TREADY      = data_pad_tready,
-            o_M_AXIS_TLAST       = data_pad_tlast,
-
-            o_CURR_BUF_INDEX     = curr_buf_index,
-
-            i_RESET_N            = self.ext_reset_n,          # Unconnected for XTRX
-            i_SYNCH_DIS          = synch_dis,                 # Disable timestamp sync
-            i_SAMPLE_NR          = rx_sample_nr_sync,
-            o_PCT_LOSS_FLG       = self.pct_loss_flg,         # Goes high when a packet is dropped due to outdated timestamp, stays high until PCT_LOSS_FLG_CLR is set
-            i_PCT_LOSS_FLG_CLR   = pct_loss_flg_clr,          # Clears PCT_LOSS_FLG
-            o_conn_buf_o         = self.conn_buf,
-        )
+                # Clk/Reset.
+                i_AXIS_ACLK          = ClockSignal(m_clk_domain), #m_axis_domain
+
+                # AXI Stream Slave.
+                i_S_AXIS_ARESET_N    = m_reset_n,                 # m_axis_domain.a_reset_n (iqsample)
+                o_S_AXIS_BUF_RESET_N = p2d_rd_resetn,
+                i_S_AXIS_TVALID      = p2d_rd_tvalid,
+                i_S_AXIS_TDATA       = p2d_rd_tdata,
+                o_S_AXIS_TREADY      = p2d_rd_tready,
+                i_S_AXIS_TLAST       = p2d_rd_tlast,
+
+                # AXI Stream Master.
+                i_M_AXIS_ARESET_N    = m_reset_n,               # m_axis_domain.a_reset_n (iqsample)
+                o_M_AXIS_TVALID      = data_pad_tvalid,
+                o_M_AXIS_TDATA       = data_pad_tdata,
+                i_M_AXIS_TREADY      = data_pad_tready,
+                o_M_AXIS_TLAST       = data_pad_tlast,
+
+                o_CURR_BUF_INDEX     = curr_buf_index,
+
+                i_RESET_N            = self.ext_reset_n,          # Unconnected for XTRX
+                i_SYNCH_DIS          = synch_dis,                 # Disable timestamp sync
+                i_SAMPLE_NR          = rx_sample_nr_sync,
+                o_PCT_LOSS_FLG       = self.pct_loss_flg,         # Goes high when a packet is dropped due to outdated timestamp, stays high until PCT_LOSS_FLG_CLR is set
+                i_PCT_LOSS_FLG_CLR   = pct_loss_flg_clr,          # Clears PCT_LOSS_FLG
+                o_conn_buf_o         = self.conn_buf,
+            )
 
         # Pad 12 bit samples to 16 bit samples, bypass logic if no padding is needed
         self.sample_padder = Instance("sample_padder",
+            # Parameters.
+            p_G_TLAST       = "true" if runtime_ch_switch else "false", # sink.last for the unpacker switch
+
             # Clk/Reset.
             i_CLK           = ClockSignal(m_clk_domain), # m_axis_domain
             i_RESET_N       = self.ext_reset_n,          # Unconnected for XTRX
@@ -369,6 +434,22 @@ class TXPathTop(LiteXModule):
             # Control.
             i_BYPASS        = unpack_bypass,
         )
+        # Timed bursts: the unpacked samples are held until rx_sample_nr reaches the timestamp of the
+        # next queued burst. Packet timestamp sync in PCT2DATA_BUF_RD should be disabled (synch_dis).
+        if with_scheduler:
+            self.scheduler = TimedStreamGate([("data", len(self.source.data))],
+                clock_domain = m_clk_domain,
+                queue_depth  = 16,
+                drop         = False,
+            )
+            self.comb += [
+                self.scheduler.time.eq(rx_sample_nr_sync),
+                self.scheduler.source.connect(self.source, keep=["data", "valid", "ready"]),
+            ]
+            unpack_source = self.scheduler.sink
+        else:
+            unpack_source = self.source
+
         if not output4channels:
             self.sample_unpack = Instance("SAMPLE_UNPACK",
                 # Clk/Reset.
@@ -383,16 +464,21 @@ class TXPathTop(LiteXModule):
                 i_S_AXIS_TLAST  = fifo_smpl_buff.source.last,
 
                 # AXI Stream Master
-                o_M_AXIS_TDATA  = self.source.data,
-                i_M_AXIS_TREADY = self.source.ready,
-                o_M_AXIS_TVALID = self.source.valid,
+                o_M_AXIS_TDATA  = unpack_source.data,
+                i_M_AXIS_TREADY = unpack_source.ready,
+                o_M_AXIS_TVALID = unpack_source.valid,
 
                 # Mode Settings.
                 i_CH_EN         = ch_en,
             )
         else:
-            from gateware.LimeDFB.tx_path_top.src.sample_unpack128 import sample_unpack128
-            sample_unpack128_inst = ResetInserter()(ClockDomainsRenamer(m_clk_domain)(sample_unpack128()))
+            from gateware.LimeDFB.tx_path_top.src.sample_unpack128 import sample_unpack128, sample_unpack128_shared
+            # runtime_ch_switch: a ch_en change applies from the next packet (TLAST), without reset.
+            if shared_unpacker:
+                unpacker = sample_unpack128_shared(runtime_switch=runtime_ch_switch)
+            else:
+                unpacker = sample_unpack128(runtime_switch=runtime_ch_switch)
+            sample_unpack128_inst = ResetInserter()(ClockDomainsRenamer(m_clk_domain)(unpacker))
             self.sample_unpack = sample_unpack128_inst
             # Connect IO
             self.comb += [
@@ -402,11 +488,12 @@ class TXPathTop(LiteXModule):
                 # Input data
                 self.sample_unpack.sink.data.eq(fifo_smpl_buff.source.data),
                 self.sample_unpack.sink.valid.eq(fifo_smpl_buff.source.valid),
+                self.sample_unpack.sink.last.eq(fifo_smpl_buff.source.last),
                 self.fifo_smpl_buff.source.ready.eq(self.sample_unpack.sink.ready),
                 # Output data
-                self.source.data.eq(self.sample_unpack.source.data),
-                self.source.valid.eq(self.sample_unpack.source.valid),
-                self.sample_unpack.source.ready.eq(self.source.ready),
+                unpack_source.data.eq(self.sample_unpack.source.data),
+                unpack_source.valid.eq(self.sample_unpack.source.valid),
+                self.sample_unpack.source.ready.eq(unpack_source.ready),
             ]
 
         if platform.name.startswith("limesdr_mini"):
@@ -441,19 +528,20 @@ class TXPathTop(LiteXModule):
             self.source.last.eq(0),
         ]
 
-        self.pct2data_buf_wr_conv = add_vhd2v_converter(self.platform,
-            instance = self.pct2data_buf_wr,
-            files    = ["gateware/LimeDFB/tx_path_top/src/pct2data_buf_wr.vhd"],
-        )
-        # Removed Instance to avoid multiple definition
-        self._fragment.specials.remove(self.pct2data_buf_wr)
+        if not packet_pool:
+            self.pct2data_buf_wr_conv = add_vhd2v_converter(self.platform,
+                instance = self.pct2data_buf_wr,
+                files    = ["gateware/LimeDFB/tx_path_top/src/pct2data_buf_wr.vhd"],
+            )
+            # Removed Instance to avoid multiple definition
+            self._fragment.specials.remove(self.pct2data_buf_wr)
 
-        self.pct2data_buf_rd_conv = add_vhd2v_converter(self.platform,
-            instance = self.pct2data_buf_rd,
-            files    = ["gateware/LimeDFB/tx_path_top/src/pct2data_buf_rd.vhd"],
-        )
-        # Removed Instance to avoid multiple definition
-        self._fragment.specials.remove(self.pct2data_buf_rd)
+            self.pct2data_buf_rd_conv = add_vhd2v_converter(self.platform,
+                instance = self.pct2data_buf_rd,
+                files    = ["gateware/LimeDFB/tx_path_top/src/pct2data_buf_rd.vhd"],
+            )
+            # Removed Instance to avoid multiple definition
+            self._fragment.specials.remove(self.pct2data_buf_rd)
 
         self.sample_padder_conv = add_vhd2v_converter(self.platform,
             instance = self.sample_padder,
@@ -515,3 +603,407 @@ class TXPathTop(LiteXModule):
             smpl_nr_fifo.sink.valid,
             smpl_nr_fifo.sink.ready,
         ]
+
+        # Packet Timing Buffer Status. --------------------------------------------------------------
+        if with_pkt_timing:
+            if packet_pool:
+                self.comb += [
+                    self.packet_timing.buf_clr.eq(  self.packet_pool.drop),
+                    self.packet_timing.all_empty.eq(self.packet_pool.empty),
+                    self.packet_timing.all_full.eq( self.packet_pool.full),
+                ]
+            else:
+                self.comb += [
+                    self.packet_timing.buf_clr.eq(  m_reset_n & self.ext_reset_n & (p2d_rd_resetn != (2**BUFF_COUNT - 1))),
+                    self.packet_timing.all_empty.eq(p2d_wr_buf_empty == (2**BUFF_COUNT - 1)),
+                    self.packet_timing.all_full.eq( p2d_wr_buf_empty == 0),
+                ]
+
+        # Performance Counters. --------------------------------------------------------------------
+        if with_counters:
+            self.counters = StreamPerfCounters()
+            self.counters.add_probe("sink",
+                valid        = self.sink.valid,
+                ready        = self.sink.ready,
+                clock_domain = s_clk_domain,
+            )
+            # ClockDomainCrossing has no level output, count the handshake with PCT2DATA_BUF_WR.
+            self.counters.add_probe("input_buff",
+                valid        = input_buff.source.valid,
+                ready        = self.packet_timing.sink.ready if with_pkt_timing else p2d_wr_sink_ready,
+                clock_domain = m_clk_domain,
+            )
+            self.counters.add_probe("pct2data_buf_rd",
+                valid        = data_pad_tvalid,
+                ready        = data_pad_tready,
+                clock_domain = m_clk_domain,
+            )
+            self.counters.add_probe("fifo_smpl_buff",
+                valid        = fifo_smpl_buff.source.valid,
+                ready        = fifo_smpl_buff.source.ready,
+                level        = fifo_smpl_buff.level,
+                clock_domain = m_clk_domain,
+            )
+            self.counters.add_probe("source",
+                valid        = self.source.valid,
+                ready        = self.source.ready,
+                clock_domain = m_clk_domain,
+            )
+
+# TX Packet Pool -----------------------------------------------------------------------------------
+
+class TXPacketPool(LiteXModule):
+    """
+    Shared memory TX packet buffer, in place of PCT2DATA_BUF_WR, the BUFF_COUNT axis_fifo buffers
+    and PCT2DATA_BUF_RD.
+
+    Packets (header word + size/16 payload words, as decoded by PCT2DATA_BUF_WR) are stored in one
+    memory of pool_words 128-bit words, each payload in a slot of its own size. The header is not
+    stored: the slot address and length, the timestamp and the sync disable bit go to a descriptor
+    FIFO of desc_depth entries. Slots are released in packet order, so the free space is always
+    one contiguous region of the ring and the free list reduces to the allocation and release
+    pointers: a packet is accepted as soon as its payload fits, so small packets no longer take a
+    PCT_MAX_SIZE buffer each and up to desc_depth packets are queued in the same memory.
+
+    The reader follows the PCT2DATA_BUF_RD timestamp rules: a packet is sent when sample_nr equals
+    its timestamp (immediately with synch_dis or header bit 4 set) and released unread, setting
+    pct_loss_flg and pulsing drop, when its timestamp already passed. The source carries the
+    payload, with last on the last word of each packet. Header-only packets (payload size below
+    16 bytes) carry no samples and are consumed without a descriptor.
+    All internal logic runs in the clock domain this module is instantiated in.
+    """
+    def __init__(self, pool_words=1024, desc_depth=16):
+        self.sink             = stream.Endpoint([("data", 128)])
+        self.source           = stream.Endpoint([("data", 128)])
+
+        self.sample_nr        = Signal(64)
+        self.synch_dis        = Signal()
+        self.pct_loss_flg     = Signal()
+        self.pct_loss_flg_clr = Signal()
+        self.drop             = Signal() # Packet released for an outdated timestamp.
+        self.empty            = Signal() # No packet stored.
+        self.full             = Signal() # The next packet waits for space or a descriptor.
+        self.level            = Signal(max=pool_words + 1) # Words allocated.
+
+        # # #
+
+        mem     = Memory(128, pool_words)
+        wr_port = mem.get_port(write_capable=True)
+        rd_port = mem.get_port(has_re=True)
+        self.specials += mem, wr_port, rd_port
+
+        desc_layout = [("addr", len(wr_port.adr)), ("length", 12), ("timestamp", 64), ("synch_dis", 1)]
+        self.desc_fifo = desc_fifo = stream.SyncFIFO(desc_layout, desc_depth)
+
+        # Allocation.
+        alloc   = Signal(12)
+        release = Signal(12)
+        self.sync += self.level.eq(self.level + alloc - release)
+        self.comb += self.empty.eq(self.level == 0)
+
+        # Writer: header -> slot allocation, payload -> memory, descriptor on the last word.
+        length    = Signal(12)
+        wr_addr   = Signal(len(wr_port.adr))
+        remaining = Signal(12)
+        slot      = Signal(len(wr_port.adr))
+        slot_len  = Signal(12)
+        timestamp = Signal(64)
+        synch_dis = Signal()
+        self.comb += length.eq(self.sink.data[8:24] >> 4)
+
+        self.wr_fsm = wr_fsm = FSM(reset_state="HEADER")
+        wr_fsm.act("HEADER",
+            If(self.sink.valid,
+                If(desc_fifo.sink.ready & (length <= pool_words - self.level),
+                    self.sink.ready.eq(1),
+                    alloc.eq(length),
+                    NextValue(slot,      wr_addr),
+                    NextValue(slot_len,  length),
+                    NextValue(remaining, length),
+                    NextValue(timestamp, self.sink.data[64:128]),
+                    NextValue(synch_dis, self.sink.data[4]),
+                    If(length != 0,
+                        NextState("DATA"),
+                    )
+                ).Else(
+                    self.full.eq(1),
+                )
+            )
+        )
+        wr_fsm.act("DATA",
+            self.sink.ready.eq(1),
+            wr_port.we.eq(self.sink.valid),
+            If(self.sink.valid,
+                NextValue(wr_addr,   Mux(wr_addr == pool_words - 1, 0, wr_addr + 1)),
+                NextValue(remaining, remaining - 1),
+                If(remaining == 1,
+                    desc_fifo.sink.valid.eq(1),
+                    NextState("HEADER"),
+                )
+            )
+        )
+        self.comb += [
+            wr_port.adr.eq(wr_addr),
+            wr_port.dat_w.eq(self.sink.data),
+            desc_fifo.sink.addr.eq(slot),
+            desc_fifo.sink.length.eq(slot_len),
+            desc_fifo.sink.timestamp.eq(timestamp),
+            desc_fifo.sink.synch_dis.eq(synch_dis),
+        ]
+
+        # Reader: timestamp sync, payload -> output buffer, slot release on the last read.
+        desc     = desc_fifo.source
+        less     = Signal()
+        equal    = Signal()
+        rd_addr  = Signal(len(rd_port.adr))
+        rd_count = Signal(12)
+        rd_len   = Signal(12)
+        rd       = Signal()
+        rd_last  = Signal()
+        rd_valid = Signal()
+        rd_eop   = Signal()
+
+        self.out_fifo = out_fifo = stream.SyncFIFO([("data", 128)], 4)
+
+        self.rd_fsm = rd_fsm = FSM(reset_state="WAIT")
+        # Timestamp compare registered as in PCT2DATA_BUF_RD (cleared while a descriptor is popped).
+        self.sync += [
+            less.eq(0),
+            equal.eq(0),
+            If(rd_fsm.ongoing("WAIT") & desc.valid & ~desc.ready,
+                less.eq( desc.timestamp <  self.sample_nr),
+                equal.eq(desc.timestamp == self.sample_nr),
+            )
+        ]
+        rd_fsm.act("WAIT",
+            If(desc.valid,
+                If(self.synch_dis | desc.synch_dis | equal,
+                    desc.ready.eq(1),
+                    NextValue(rd_addr,  desc.addr),
+                    NextValue(rd_count, desc.length),
+                    NextValue(rd_len,   desc.length),
+                    NextState("READ"),
+                ).Elif(less,
+                    desc.ready.eq(1),
+                    release.eq(desc.length),
+                    self.drop.eq(1),
+                )
+            )
+        )
+        # One read in flight: keep room for it in the output buffer.
+        rd_fsm.act("READ",
+            rd.eq(out_fifo.level < 3),
+            If(rd,
+                NextValue(rd_addr,  Mux(rd_addr == pool_words - 1, 0, rd_addr + 1)),
+                NextValue(rd_count, rd_count - 1),
+                If(rd_count == 1,
+                    rd_last.eq(1),
+                    release.eq(rd_len),
+                    NextState("WAIT"),
+                )
+            )
+        )
+        self.sync += [
+            rd_valid.eq(rd),
+            rd_eop.eq(rd_last),
+        ]
+        self.comb += [
+            rd_port.adr.eq(rd_addr),
+            rd_port.re.eq(rd),
+            out_fifo.sink.valid.eq(rd_valid),
+            out_fifo.sink.data.eq(rd_port.dat_r),
+            out_fifo.sink.last.eq(rd_eop),
+            out_fifo.source.connect(self.source),
+        ]
+
+        # Packet loss flag (sticky until pct_loss_flg_clr, as PCT2DATA_BUF_RD).
+        self.sync += [
+            If(self.drop,
+                self.pct_loss_flg.eq(1),
+            ).Elif(self.pct_loss_flg_clr,
+                self.pct_loss_flg.eq(0),
+            )
+        ]
+
+# TX Packet Timing ---------------------------------------------------------------------------------
+
+class TXPacketTiming(LiteXModule):
+    """
+    Timestamp accounting and early drop of late TX packets, ahead of PCT2DATA_BUF_WR.
+
+    The stage follows the packet framing of PCT2DATA_BUF_WR on the 128-bit input stream (header
+    word with the payload size in bytes 1-2, the timestamp in bytes 8-15 and the per packet sync
+    disable in bit 4, then size/16 payload words). For every synchronised header it computes the
+    lead time (timestamp - sample_nr) and, with control.drop_en set, discards the whole packet
+    when it is more than max_lateness samples late: it would only be cleared by PCT2DATA_BUF_RD
+    after waiting for a free buffer.
+
+    Counters (in clock_domain, copied to the status registers on control.snapshot):
+        - late_packets : packets cleared by PCT2DATA_BUF_RD for an outdated timestamp (buf_clr).
+        - early_drops  : packets discarded by this stage.
+        - underruns    : times the output ran dry with all the buffers empty (all_empty) after
+                         samples were sent.
+        - full_stalls  : cycles a packet waited with all the buffers full (all_full).
+        - min_lead     : minimum lead time seen in samples (signed, saturated to 32-bit).
+
+    Usage (host):
+        control = 0b011 (| 0b100 to keep drop_en) # snapshot the counters and clear them.
+        ... wait for the measurement interval ...
+        control = 0b011
+        read late_packets, early_drops, underruns, full_stalls, min_lead
+    """
+    def __init__(self, clock_domain="sys", width=32):
+        self.sink       = stream.Endpoint([("data", 128)])
+        self.source     = stream.Endpoint([("data", 128)])
+
+        self.rst        = Signal()              # Packet framing reset (TX path reset).
+        self.sample_nr  = Signal(64)
+        self.synch_dis  = Signal()
+        self.buf_clr    = Signal()              # PCT2DATA_BUF_RD clears a buffer (S_AXIS_BUF_RESET_N).
+        self.all_empty  = Signal()              # No packet buffered.
+        self.all_full   = Signal()              # No free buffer for the next packet.
+        self.out_valid  = Signal()
+        self.out_ready  = Signal()
+
+        self.control = CSRStorage(name="control", fields=[
+            CSRField("snapshot", size=1, offset=0, pulse=True,
+                description="Write 1 to copy the running counters to the status registers."),
+            CSRField("clear",    size=1, offset=1, pulse=True,
+                description="Write 1 to clear the running counters (after the snapshot when both are set)."),
+            CSRField("drop_en",  size=1, offset=2,
+                description="Discard the packets more than max_lateness samples late."),
+        ])
+        self.max_lateness = CSRStorage(32, reset=0, name="max_lateness",
+            description="Lateness (samples) above which packets are discarded when drop_en is set."
+        )
+        self.late_packets = CSRStatus(width, name="late_packets", description="Packets cleared for an outdated timestamp.")
+        self.early_drops  = CSRStatus(width, name="early_drops",  description="Packets discarded for max_lateness.")
+        self.underruns    = CSRStatus(width, name="underruns",    description="Output underruns with all the buffers empty.")
+        self.full_stalls  = CSRStatus(width, name="full_stalls",  description="Cycles a packet waited for a free buffer.")
+        self.min_lead     = CSRStatus(32,    name="min_lead",     description="Minimum packet lead time (samples, signed).")
+
+        # # #
+
+        # Control CDC.
+        snapshot     = Signal()
+        clear        = Signal()
+        drop_en      = Signal()
+        max_lateness = Signal(32)
+        if clock_domain == "sys":
+            self.comb += [
+                snapshot.eq(    self.control.fields.snapshot),
+                clear.eq(       self.control.fields.clear),
+                drop_en.eq(     self.control.fields.drop_en),
+                max_lateness.eq(self.max_lateness.storage),
+            ]
+        else:
+            self.ps_snapshot = PulseSynchronizer("sys", clock_domain)
+            self.ps_clear    = PulseSynchronizer("sys", clock_domain)
+            self.comb += [
+                self.ps_snapshot.i.eq(self.control.fields.snapshot),
+                self.ps_clear.i.eq(   self.control.fields.clear),
+                snapshot.eq(self.ps_snapshot.o),
+                clear.eq(   self.ps_clear.o),
+            ]
+            self.specials += [
+                MultiReg(self.control.fields.drop_en, drop_en,      odomain=clock_domain),
+                MultiReg(self.max_lateness.storage,   max_lateness, odomain=clock_domain),
+            ]
+
+        sync = getattr(self.sync, clock_domain)
+
+        # Packet Framing / Early Drop.
+        header    = Signal(reset=1)
+        remaining = Signal(12)
+        dropping  = Signal()
+        drop      = Signal()
+        synced    = Signal()
+        lead      = Signal((65, True))
+        lead_sat  = Signal((32, True))
+        is_header = Signal()
+        self.comb += [
+            is_header.eq(self.sink.valid & header),
+            synced.eq(~self.synch_dis & ~self.sink.data[4]),
+            lead.eq(self.sink.data[64:128] - self.sample_nr),
+            If(lead > (2**31 - 1),
+                lead_sat.eq(2**31 - 1),
+            ).Elif(lead < -2**31,
+                lead_sat.eq(-2**31),
+            ).Else(
+                lead_sat.eq(lead),
+            ),
+            drop.eq(Mux(header, is_header & synced & drop_en & (-lead > max_lateness), dropping)),
+            self.sink.connect(self.source, omit=["valid", "ready"]),
+            If(drop,
+                self.sink.ready.eq(1),
+            ).Else(
+                self.source.valid.eq(self.sink.valid),
+                self.sink.ready.eq(self.source.ready),
+            )
+        ]
+        sync += [
+            If(self.rst,
+                header.eq(1),
+                dropping.eq(0),
+            ).Elif(self.sink.valid & self.sink.ready,
+                If(header,
+                    remaining.eq(self.sink.data[8:24] >> 4),
+                    header.eq(   self.sink.data[8:24] < 16),
+                    dropping.eq( drop),
+                ).Else(
+                    remaining.eq(remaining - 1),
+                    header.eq(   remaining == 1),
+                )
+            )
+        ]
+
+        # Counters.
+        late_packets = Signal(width)
+        early_drops  = Signal(width)
+        underruns    = Signal(width)
+        full_stalls  = Signal(width)
+        min_lead     = Signal((32, True), reset=2**31 - 1)
+        buf_clr_d    = Signal()
+        underrun     = Signal()
+        underrun_d   = Signal()
+        armed        = Signal()
+        self.comb += underrun.eq(armed & self.out_ready & ~self.out_valid & self.all_empty)
+        sync += [
+            buf_clr_d.eq(self.buf_clr),
+            underrun_d.eq(underrun),
+            If(self.rst,
+                armed.eq(0),
+            ).Elif(self.out_valid & self.out_ready,
+                armed.eq(1),
+            ),
+            If(snapshot,
+                self.late_packets.status.eq(late_packets),
+                self.early_drops.status.eq( early_drops),
+                self.underruns.status.eq(   underruns),
+                self.full_stalls.status.eq( full_stalls),
+                self.min_lead.status.eq(    min_lead),
+            ),
+            If(clear,
+                late_packets.eq(0),
+                early_drops.eq( 0),
+                underruns.eq(   0),
+                full_stalls.eq( 0),
+                min_lead.eq(2**31 - 1),
+            ).Else(
+                If(self.buf_clr & ~buf_clr_d,
+                    late_packets.eq(late_packets + 1),
+                ),
+                If(is_header & drop & self.sink.ready,
+                    early_drops.eq(early_drops + 1),
+                ),
+                If(underrun & ~underrun_d,
+                    underruns.eq(underruns + 1),
+                ),
+                If(self.source.valid & ~self.source.ready & self.all_full,
+                    full_stalls.eq(full_stalls + 1),
+                ),
+                If(is_header & self.sink.ready & synced & (lead_sat < min_lead),
+                    min_lead.eq(lead_sat),
+                ),
+            )
+        ]